@@ -15,7 +15,7 @@
         - FAQ / Q&A for appointment types
         - Email notifications and reminders
     """,
-    "version": "18.0.2.8.0",
+    "version": "18.0.2.15.0",
     "category": "Services/Appointment",
     "author": "WoowTech",
     "website": "https://aiot.woowtech.io/",
@@ -43,6 +43,7 @@
         "views/appointment_booking_views.xml",
         "views/sale_order_views.xml",
         "views/resource_views.xml",
+        "views/appointment_slot_cache_views.xml",
         "views/appointment_menus.xml",
         # Website
         "views/appointment_templates.xml",
@@ -1,252 +1,40 @@
 # -*- coding: utf-8 -*-
 
 from odoo import http, fields, _
+from odoo.exceptions import UserError
 from odoo.http import request
+from odoo.tools import LRU
 from odoo.addons.portal.controllers.portal import CustomerPortal, pager as portal_pager
-from datetime import datetime, timedelta
+from psycopg2 import errors as pg_errors
+from ..tools.intervals import IntervalIndex, to_epoch
+from ..tools.labels import get_labels
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 import calendar
+import hashlib
 import logging
 import pytz
 import re
 
 _logger = logging.getLogger(__name__)
 
+# Upper bound of days computed by a single /slots_range call
+MAX_SLOT_RANGE_DAYS = 62
 
-class AppointmentController(http.Controller):
-
-    def _get_translations(self):
-        """Get translated labels for templates
-
-        Uses a simple dictionary approach for reliable bilingual support.
-        Checks current language and returns appropriate translations.
-        """
-        # Get current language - try multiple sources for reliability
-        lang = None
+# Rendered public pages kept per worker for anonymous visitors
+PAGE_CACHE_SIZE = 512
 
-        # Method 1: Check request.env.lang (Odoo 18 standard)
-        if hasattr(request, 'env') and request.env:
-            lang = request.env.lang
+# Stands for the visitor's CSRF token in the cached page bodies
+CSRF_PLACEHOLDER = '__appointment_csrf_token__'
 
-        # Method 2: Check request.env.context
-        if not lang and hasattr(request, 'env') and request.env:
-            lang = request.env.context.get('lang')
+_page_cache = LRU(PAGE_CACHE_SIZE)
 
-        # Method 3: Check website's current language via frontend_lang cookie
-        if not lang:
-            try:
-                frontend_lang = request.httprequest.cookies.get('frontend_lang')
-                if frontend_lang:
-                    lang = frontend_lang
-            except Exception:
-                pass
-
-        # Method 4: Check website's default language
-        if not lang:
-            try:
-                website = request.env['website'].get_current_website()
-                if website and website.default_lang_id:
-                    lang = website.default_lang_id.code
-            except Exception:
-                pass
 
-        # Default fallback
-        if not lang:
-            lang = 'en_US'
-
-        # Chinese translations (zh_TW)
-        zh_tw = {
-            'book_an_appointment': '預約服務',
-            'book_now': '立即預約',
-            'hours': '小時',
-            'no_appointment_types': '目前沒有可用的預約類型。',
-            'appointments': '預約',
-            'select_date_time': '選擇日期與時間',
-            'select_location': '選擇場地',
-            'select_staff': '選擇員工',
-            'seats': '座位',
-            'loading_slots': '正在載入可用時段...',
-            'available_times': '可用時段',
-            'book': '預約',
-            'complete_booking': '完成您的預約',
-            'name': '姓名',
-            'email': '電子郵件',
-            'phone': '電話',
-            'number_of_guests': '訪客人數',
-            'select_option': '-- 請選擇 --',
-            'notes': '備註',
-            'payment_of': '付款金額',
-            'per_person': '每人',
-            'payment_required': '需要付款才能確認您的預約。',
-            'continue_to_payment': '繼續付款',
-            'confirm_booking': '確認預約',
-            'booking_confirmed': '預約已確認！',
-            'booking_reference': '您的預約編號是：',
-            'appointment_label': '預約項目：',
-            'date_time': '日期與時間：',
-            'location_label': '場地：',
-            'staff_label': '員工：',
-            'guests_label': '訪客人數：',
-            'confirmation_email_sent': '確認郵件已發送至',
-            'book_another': '預約另一個時段',
-            'booking': '預約',
-            'appointment_details': '預約詳情',
-            'type_label': '類型：',
-            'guest_information': '訪客資訊',
-            'name_label': '姓名：',
-            'email_label': '電子郵件：',
-            'phone_label': '電話：',
-            'guests_count_label': '訪客人數：',
-            'cancel_booking': '取消預約',
-            'cancel_booking_question': '取消預約？',
-            'cancel_confirm_msg': '您確定要取消您的預約嗎？',
-            'booking_reference_label': '預約編號：',
-            'yes_cancel': '是的，取消預約',
-            'no_keep': '不，保留預約',
-            'booking_cancelled': '預約已取消',
-            'your_booking': '您的預約',
-            'has_been_cancelled': '已被取消。',
-            'book_new_appointment': '預約新時段',
-            'payment': '付款',
-            'booking_summary': '預約摘要',
-            'amount_due': '應付金額',
-            'select_payment_method': '選擇付款方式以完成預約。',
-            'pay_with': '使用付款',
-            'no_payment_methods': '沒有可用的付款方式。請聯繫我們完成您的預約。',
-            'faq_title': '常見問題',
-            'auto_assign': '自動分配',
-            'special_event': '特殊活動',
-            'scheduled_appointment': '排程預約',
-            'join_meeting': '加入會議',
-            'online_meeting': '線上會議',
-            'online_meeting_label': '這是一場線上會議，請在預約時間使用以下連結加入：',
-            'meeting_link_available': '會議連結將在預約確認後提供。',
-            'pending_payment': '待付款',
-            'pending_payment_msg': '您的預約正在等待付款確認。',
-            'go_to_payment': '前往付款',
-            # Portal booking list
-            'my_bookings': '我的預約',
-            'view_my_bookings': '查看我的預約',
-            'booking_info_sent_email': '相關預約資訊已傳送到您的電子信箱',
-            'meeting_link_in_email': '（會議連結已包含在郵件中）',
-            'upcoming_bookings': '即將到來的預約',
-            'completed_bookings': '已完成的預約',
-            'all_bookings': '進行中',
-            'no_bookings_yet': '您還沒有任何預約',
-            'booking_status': '狀態',
-            'view_details': '查看詳情',
-            'status_confirmed': '已確認',
-            'status_done': '已完成',
-            'status_cancelled': '已取消',
-            'status_draft': '草稿',
-            'status_pending_payment': '待付款',
-            'incl_tax': '（含稅）',
-            # Portal detail page (wt-* card design)
-            'booking_info': '預約資訊',
-            'meeting_info': '會議',
-            'notes_label': '備註',
-            'payment_paid': '已付款',
-            'comments': '留言與討論',
-        }
-
-        # English translations (en_US) - default
-        en_us = {
-            'book_an_appointment': 'Book an Appointment',
-            'book_now': 'Book Now',
-            'hours': 'hour(s)',
-            'no_appointment_types': 'No appointment types available at the moment.',
-            'appointments': 'Appointments',
-            'select_date_time': 'Select Date & Time',
-            'select_location': 'Select Location',
-            'select_staff': 'Select Staff',
-            'seats': 'seats',
-            'loading_slots': 'Loading available slots...',
-            'available_times': 'Available Times',
-            'book': 'Book',
-            'complete_booking': 'Complete Your Booking',
-            'name': 'Name',
-            'email': 'Email',
-            'phone': 'Phone',
-            'number_of_guests': 'Number of Guests',
-            'select_option': '-- Select --',
-            'notes': 'Notes',
-            'payment_of': 'Payment of',
-            'per_person': 'per person',
-            'payment_required': 'will be required to confirm your booking.',
-            'continue_to_payment': 'Continue to Payment',
-            'confirm_booking': 'Confirm Booking',
-            'booking_confirmed': 'Booking Confirmed!',
-            'booking_reference': 'Your booking reference is:',
-            'appointment_label': 'Appointment:',
-            'date_time': 'Date & Time:',
-            'location_label': 'Location:',
-            'staff_label': 'Staff:',
-            'guests_label': 'Guests:',
-            'confirmation_email_sent': 'A confirmation email has been sent to',
-            'book_another': 'Book Another Appointment',
-            'booking': 'Booking',
-            'appointment_details': 'Appointment Details',
-            'type_label': 'Type:',
-            'guest_information': 'Guest Information',
-            'name_label': 'Name:',
-            'email_label': 'Email:',
-            'phone_label': 'Phone:',
-            'guests_count_label': 'Number of Guests:',
-            'cancel_booking': 'Cancel Booking',
-            'cancel_booking_question': 'Cancel Booking?',
-            'cancel_confirm_msg': 'Are you sure you want to cancel your booking?',
-            'booking_reference_label': 'Booking Reference:',
-            'yes_cancel': 'Yes, Cancel Booking',
-            'no_keep': 'No, Keep Booking',
-            'booking_cancelled': 'Booking Cancelled',
-            'your_booking': 'Your booking',
-            'has_been_cancelled': 'has been cancelled.',
-            'book_new_appointment': 'Book a New Appointment',
-            'payment': 'Payment',
-            'booking_summary': 'Booking Summary',
-            'amount_due': 'Amount Due',
-            'select_payment_method': 'Select a payment method to complete your booking.',
-            'pay_with': 'Pay with',
-            'no_payment_methods': 'No payment methods available. Please contact us to complete your booking.',
-            'faq_title': 'Frequently Asked Questions',
-            'auto_assign': 'Auto-Assign',
-            'special_event': 'Special Event',
-            'scheduled_appointment': 'Scheduled Appointment',
-            'join_meeting': 'Join Meeting',
-            'online_meeting': 'Online Meeting',
-            'online_meeting_label': 'This is an online meeting. Use the link below to join at the scheduled time:',
-            'meeting_link_available': 'Meeting link will be available after booking confirmation.',
-            'pending_payment': 'Pending Payment',
-            'pending_payment_msg': 'Your booking is waiting for payment confirmation.',
-            'go_to_payment': 'Go to Payment',
-            # Portal booking list
-            'my_bookings': 'My Bookings',
-            'view_my_bookings': 'View My Bookings',
-            'booking_info_sent_email': 'Booking confirmation details have been sent to your email',
-            'meeting_link_in_email': '(The meeting link is included in the email)',
-            'upcoming_bookings': 'Upcoming Bookings',
-            'completed_bookings': 'Completed Bookings',
-            'all_bookings': 'Active',
-            'no_bookings_yet': 'You have no bookings yet',
-            'booking_status': 'Status',
-            'view_details': 'View Details',
-            'status_confirmed': 'Confirmed',
-            'status_done': 'Completed',
-            'status_cancelled': 'Cancelled',
-            'status_draft': 'Draft',
-            'status_pending_payment': 'Pending Payment',
-            'incl_tax': '(incl. tax)',
-            # Portal detail page (wt-* card design)
-            'booking_info': 'Booking Information',
-            'meeting_info': 'Meeting',
-            'notes_label': 'Notes',
-            'payment_paid': 'Paid',
-            'comments': 'Comments & Discussion',
-        }
+class AppointmentController(http.Controller):
 
-        # Return appropriate translation based on language
-        if lang and lang.startswith('zh'):
-            return zh_tw
-        return en_us
+    def _get_translations(self):
+        """Labels for the templates, from the catalogs compiled at module load"""
+        return get_labels(request.env.lang)
 
     @staticmethod
     def _safe_int(value, default=None):
@@ -258,6 +46,114 @@ class AppointmentController(http.Controller):
         except (ValueError, TypeError):
             return default
 
+    def _get_page_fingerprint(self, appointment_types):
+        """ETag and Last-Modified of a public page showing these types.
+
+        The content part is the latest write_date and the row count of the
+        types, their availability lines, closing days, FAQ, locations, staff
+        members and payment products (the count catches deletions). The ETag
+        also covers the URL, language, website, user, day and the registry
+        cache generations. It is the same for every anonymous visitor: the
+        only per-session content, the CSRF token, is kept apart from the
+        cached body, and ``Vary: Cookie`` stops a browser from revalidating
+        a copy made under another session.
+        """
+        request.env.cr.execute("""
+            SELECT MAX(write_date), COUNT(*) FROM (
+                SELECT write_date FROM appointment_type WHERE id = ANY(%(ids)s)
+                UNION ALL
+                SELECT write_date FROM appointment_availability WHERE appointment_type_id = ANY(%(ids)s)
+                UNION ALL
+                SELECT write_date FROM appointment_closing_day WHERE appointment_type_id = ANY(%(ids)s)
+                UNION ALL
+                SELECT write_date FROM appointment_question WHERE appointment_type_id = ANY(%(ids)s)
+                UNION ALL
+                SELECT r.write_date
+                  FROM resource_resource r
+                  JOIN appointment_type_resource_rel rel ON rel.resource_id = r.id
+                 WHERE rel.appointment_type_id = ANY(%(ids)s)
+                UNION ALL
+                SELECT GREATEST(u.write_date, p.write_date)
+                  FROM res_users u
+                  JOIN res_partner p ON p.id = u.partner_id
+                  JOIN appointment_type_user_rel rel ON rel.user_id = u.id
+                 WHERE rel.appointment_type_id = ANY(%(ids)s)
+                UNION ALL
+                SELECT t.write_date
+                  FROM product_template t
+                  JOIN product_product p ON p.product_tmpl_id = t.id
+                  JOIN appointment_type_product_rel rel ON rel.product_id = p.id
+                 WHERE rel.appointment_type_id = ANY(%(ids)s)
+            ) AS changes
+        """, {'ids': appointment_types.ids})
+        last_modified, row_count = request.env.cr.fetchone()
+        key = repr((
+            request.httprequest.full_path,
+            appointment_types.ids,
+            last_modified,
+            row_count,
+            request.env.lang,
+            request.website.id,
+            request.env.uid,
+            fields.Date.context_today(request.env['appointment.type']),
+            sorted(request.env.registry.cache_sequences.items()),
+        ))
+        return hashlib.sha256(key.encode()).hexdigest()[:32], last_modified
+
+    def _render_cacheable(self, appointment_types, template, get_values):
+        """Render a public page with conditional GET and a per-worker page cache.
+
+        The fingerprint is checked first: a browser revalidating a page that
+        did not change gets a 304, and ``get_values`` is only called when the
+        page has to be rendered. Pages of anonymous visitors are cached by
+        route, types, language, website and fingerprint, their CSRF token
+        swapped for a placeholder that each hit fills in with the visitor's
+        own. A change of any record in the fingerprint gives a new key, the
+        old entry ages out of the LRU. Pages embed the CSRF token, so they
+        are private: shared caches must not store them, browsers revalidate.
+        """
+        etag, last_modified = self._get_page_fingerprint(appointment_types)
+        headers = [('Cache-Control', 'private, no-cache'), ('Vary', 'Cookie')]
+        if request.httprequest.if_none_match.contains(etag):
+            response = request.make_response('', headers=headers, status=304)
+        elif not request.env.user._is_public():
+            response = request.render(template, get_values(), headers=headers)
+        else:
+            cache_key = (
+                request.env.cr.dbname,
+                request.httprequest.full_path,
+                tuple(appointment_types.ids),
+                request.env.lang,
+                request.website.id,
+                request.geoip.country_code,
+                etag,
+            )
+            csrf_token = request.csrf_token()
+            body = _page_cache.get(cache_key)
+            if body is None:
+                body = request.render(template, get_values(), lazy=False).get_data(as_text=True)
+                body = body.replace(csrf_token, CSRF_PLACEHOLDER)
+                _page_cache[cache_key] = body
+            response = request.make_response(body.replace(CSRF_PLACEHOLDER, csrf_token), headers=headers)
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return response
+
+    def _is_rate_limited(self, key, scope=None, limit=None):
+        """Count a public request against ``key``; True when over its limit.
+
+        The limit is the system-wide one of ``scope`` or ``limit``, a
+        (hits, window minutes) pair.
+        """
+        RateLimit = request.env['appointment.rate.limit'].sudo()
+        hits, minutes = limit or RateLimit._get_limit(scope)
+        return not RateLimit._hit(key, hits, minutes)
+
+    def _json_rate_limited(self):
+        """Per-IP throttle of the slot/date JSON endpoints"""
+        return self._is_rate_limited(f'json:ip:{request.httprequest.remote_addr}', scope='json_ip')
+
     @http.route('/appointment', type='http', auth='public', website=True)
     def appointment_list(self, **kwargs):
         """Display list of available appointment types"""
@@ -265,7 +161,7 @@ class AppointmentController(http.Controller):
             ('is_published', '=', True),
             ('active', '=', True),
         ])
-        return request.render('reservation_module.appointment_list', {
+        return self._render_cacheable(appointment_types, 'reservation_module.appointment_list', lambda: {
             'appointment_types': appointment_types,
             't': self._get_translations(),
         })
@@ -277,7 +173,7 @@ class AppointmentController(http.Controller):
         if not appointment_type.exists() or not appointment_type.is_published:
             return request.redirect('/appointment')
 
-        return request.render('reservation_module.appointment_type_page', {
+        return self._render_cacheable(appointment_type, 'reservation_module.appointment_type_page', lambda: {
             'appointment_type': appointment_type,
             't': self._get_translations(),
         })
@@ -289,6 +185,13 @@ class AppointmentController(http.Controller):
         if not appointment_type.exists() or not appointment_type.is_published:
             return request.redirect('/appointment')
 
+        return self._render_cacheable(
+            appointment_type, 'reservation_module.appointment_schedule_page',
+            lambda: self._get_schedule_values(appointment_type, resource_id, staff_id),
+        )
+
+    def _get_schedule_values(self, appointment_type, resource_id, staff_id):
+        """Rendering values of the schedule page"""
         # Determine which panels to show
         show_staff_panel = (
             appointment_type.assign_staff
@@ -309,7 +212,7 @@ class AppointmentController(http.Controller):
         start_date = fields.Date.context_today(request.env['appointment.type'])
         end_date = start_date + timedelta(days=appointment_type.max_booking_days)
 
-        return request.render('reservation_module.appointment_schedule_page', {
+        return {
             'appointment_type': appointment_type,
             'resources': resources,
             'staff': staff,
@@ -321,11 +224,13 @@ class AppointmentController(http.Controller):
             'selected_staff_id': self._safe_int(staff_id),
             'timezone': appointment_type.timezone or 'UTC',
             't': self._get_translations(),
-        })
+        }
 
     @http.route('/appointment/<int:appointment_type_id>/slots', type='json', auth='public')
     def get_slots(self, appointment_type_id, date, resource_id=None, staff_id=None, **kwargs):
         """Get available slots for a specific date (AJAX endpoint)"""
+        if self._json_rate_limited():
+            return {'error': 'Too many requests'}
         appointment_type = request.env['appointment.type'].sudo().browse(appointment_type_id)
         if not appointment_type.exists():
             return {'error': 'Appointment type not found'}
@@ -335,22 +240,146 @@ class AppointmentController(http.Controller):
         except ValueError:
             return {'error': 'Invalid date format'}
 
-        # Check closing days — block slots on closed dates
-        closing = request.env['appointment.closing.day'].sudo().search([
-            ('appointment_type_id', '=', appointment_type.id),
-            ('date', '=', selected_date),
-        ], limit=1)
-        if closing:
-            return {'slots': [], 'closing_reason': closing.name or ''}
+        days = self._get_slots_for_range(appointment_type, selected_date, selected_date, resource_id, staff_id)
+        return days[selected_date.strftime('%Y-%m-%d')]
+
+    @http.route('/appointment/<int:appointment_type_id>/slots_range', type='json', auth='public')
+    def get_slots_range(self, appointment_type_id, date_from, date_to, resource_id=None, staff_id=None, **kwargs):
+        """Get available slots for every date of a range in one call (AJAX endpoint)
+
+        Returns {'days': {'YYYY-MM-DD': {'slots': [...], 'closing_reason'?: str}}},
+        each day shaped exactly like the /slots response.
+        """
+        if self._json_rate_limited():
+            return {'error': 'Too many requests'}
+        appointment_type = request.env['appointment.type'].sudo().browse(appointment_type_id)
+        if not appointment_type.exists():
+            return {'error': 'Appointment type not found'}
+
+        try:
+            first_date = datetime.strptime(date_from, '%Y-%m-%d').date()
+            last_date = datetime.strptime(date_to, '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            return {'error': 'Invalid date format'}
+        if last_date < first_date:
+            return {'error': 'Invalid date range'}
+
+        # Bound the work a single anonymous call can trigger
+        last_date = min(last_date, first_date + timedelta(days=MAX_SLOT_RANGE_DAYS - 1))
 
-        if appointment_type.is_scheduled:
-            return self._get_scheduled_slots(appointment_type, selected_date, resource_id, staff_id)
+        return {
+            'days': self._get_slots_for_range(appointment_type, first_date, last_date, resource_id, staff_id),
+        }
+
+    def _get_slots_for_range(self, appointment_type, date_from, date_to, resource_id, staff_id):
+        """Compute the slots of every date in [date_from, date_to].
+
+        Days are served from the per-worker slot cache when their key, which
+        includes the booking version counters of the location and staff
+        member, still matches. Candidates, closing days and bookings are
+        only loaded, once for the whole range, when some day misses. The
+        candidates come from the slot inventory when it covers the range,
+        else from appointment.slot._get_range_candidates, which also
+        generated the inventory.
+        """
+        resource_id = self._safe_int(resource_id)
+        staff_id = self._safe_int(staff_id)
+        SlotVersion = request.env['appointment.slot.version'].sudo()
+        keys = self._get_slot_cache_keys(appointment_type, date_from, date_to, resource_id, staff_id)
+        cached = {day: SlotVersion._cache_get(key) for day, key in keys.items()}
+        missing = [day for day, result in cached.items() if result is None]
+        if missing:
+            ctx = self._get_availability_and_bookings(
+                appointment_type, missing[0], missing[-1], resource_id, staff_id)
+            # Cached results must not depend on the time of the request
+            min_booking_time, ctx['min_booking_time'] = ctx['min_booking_time'], datetime.min
+            candidates = self._get_inventory_candidates(appointment_type, missing[0], missing[-1], resource_id, staff_id)
+            if candidates is None:
+                candidates = request.env['appointment.slot'].sudo()._get_range_candidates(
+                    appointment_type, missing[0], missing[-1], resource_id, staff_id)
+            for current_date in missing:
+                # Check closing days — block slots on closed dates
+                if current_date in ctx['closed_dates']:
+                    result = {'slots': [], 'closing_reason': ctx['closed_dates'][current_date]}
+                else:
+                    result = {'slots': self._build_slots(
+                        candidates.get(current_date, []), ctx, resource_id, staff_id)}
+                SlotVersion._cache_set(keys[current_date], result)
+                cached[current_date] = result
         else:
-            return self._get_event_slots(appointment_type, selected_date, resource_id, staff_id)
+            min_booking_time = fields.Datetime.now() + timedelta(hours=appointment_type.min_booking_hours)
+
+        min_start = min_booking_time.strftime('%Y-%m-%d %H:%M:%S')
+        days = {}
+        for current_date, result in cached.items():
+            days[current_date.strftime('%Y-%m-%d')] = dict(
+                result, slots=[slot for slot in result['slots'] if slot['start'] >= min_start])
+        return days
+
+    def _get_slot_cache_keys(self, appointment_type, date_from, date_to, resource_id, staff_id):
+        """Slot cache key of every date in [date_from, date_to], in date order.
+
+        The worker cache is shared by every database it serves, so keys
+        start with the database name. A local day spans up to three UTC
+        days, so each key holds the booking versions of the day before and
+        after as well. The write dates cover the type settings and location
+        capacity, the registry cache sequence the weekly availability and
+        closing days.
+        """
+        versions = request.env['appointment.slot.version'].sudo()._get_versions(
+            resource_id, staff_id, date_from - timedelta(days=1), date_to + timedelta(days=1))
+        resource_write_date = resource_id and request.env['resource.resource'].sudo().browse(resource_id).write_date
+        base_key = (
+            request.env.cr.dbname,
+            appointment_type.id,
+            resource_id,
+            staff_id,
+            appointment_type.write_date,
+            resource_write_date,
+            request.env.registry.cache_sequences.get('default'),
+        )
+        keys = {}
+        current_date = date_from
+        while current_date <= date_to:
+            keys[current_date] = base_key + (current_date, tuple(
+                (versions.get(('resource', day), 0), versions.get(('staff', day), 0))
+                for day in (current_date - timedelta(days=1), current_date, current_date + timedelta(days=1))
+            ))
+            current_date += timedelta(days=1)
+        return keys
+
+    def _get_inventory_candidates(self, appointment_type, date_from, date_to, resource_id, staff_id):
+        """Precomputed slot candidates of [date_from, date_to] as {date: [(start, end)]}.
+
+        Returns None when the live computation must be used: inventory mode
+        off, range past the generated horizon, or a staff filter (staff slots
+        are not materialized). Conflicts are still checked by _build_slots.
+        """
+        horizon = appointment_type.slot_inventory_until
+        if not appointment_type.slot_inventory or staff_id or not horizon or date_to > horizon:
+            return None
+        resource_id = self._safe_int(resource_id)
+        if resource_id and resource_id not in appointment_type.resource_ids.ids:
+            return None
+        slots = request.env['appointment.slot'].sudo().get_available_slots(
+            appointment_type.id,
+            datetime.combine(date_from, datetime.min.time()),
+            datetime.combine(date_to + timedelta(days=1), datetime.min.time()),
+            resource_id=resource_id or False,
+            exact=True,
+        )
+        candidates = defaultdict(list)
+        for slot in slots:
+            candidates[slot.start_datetime.date()].append((slot.start_datetime, slot.end_datetime))
+        return candidates
 
-    def _get_availability_and_bookings(self, appointment_type, selected_date, resource_id, staff_id):
+    def _get_availability_and_bookings(self, appointment_type, date_from, date_to, resource_id, staff_id):
         """Common setup for both scheduled and event slot generation.
 
+        Loads everything needed to check the slots of [date_from, date_to]
+        in one pass: closing days and the confirmed staff/resource bookings overlapping the range, indexed
+        once as epoch-second intervals so the generators never touch the ORM.
+
         Availability hours (hour_from/hour_to) are in the appointment type's timezone.
         We convert them to UTC for conflict checking against stored datetimes.
         """
@@ -359,40 +388,23 @@ class AppointmentController(http.Controller):
             tz = pytz.timezone(tz_name)
         except pytz.UnknownTimeZoneError:
             tz = pytz.UTC
-        start_datetime = datetime.combine(selected_date, datetime.min.time())
-        end_datetime = datetime.combine(selected_date, datetime.max.time())
-
-        # Query weekly schedule availability for this day of week
-        day_of_week = str(selected_date.weekday())
-        availability_domain = [
-            ('appointment_type_id', '=', appointment_type.id),
-            ('dayofweek', '=', day_of_week),
-        ]
-        if resource_id:
-            availability_domain += [
-                '|',
-                ('resource_id', '=', int(resource_id)),
-                ('resource_id', '=', False),
-            ]
-        if staff_id:
-            availability_domain += [
-                '|',
-                ('user_id', '=', int(staff_id)),
-                ('user_id', '=', False),
-            ]
-        availabilities = request.env['appointment.availability'].sudo().search(availability_domain)
+        start_datetime = datetime.combine(date_from, datetime.min.time())
+        end_datetime = datetime.combine(date_to, datetime.max.time())
+
+        # Upcoming closing days: {date: reason}, cached per appointment type
+        closed_dates = request.env['appointment.closing.day'].sudo()._get_closed_dates(appointment_type.id)
 
         min_booking_time = fields.Datetime.now() + timedelta(hours=appointment_type.min_booking_hours)
 
         # Batch fetch bookings for conflict detection
         Booking = request.env['appointment.booking'].sudo()
-        day_conflict_domain = [
+        range_conflict_domain = [
             ('state', 'in', ['confirmed', 'done']),
             ('start_datetime', '<', end_datetime),
             ('end_datetime', '>', start_datetime),
         ]
-        staff_bookings = Booking.search(day_conflict_domain + [('staff_user_id', '=', int(staff_id))]) if staff_id else Booking
-        resource_bookings = Booking.search(day_conflict_domain + [('resource_id', '=', int(resource_id))]) if resource_id else Booking
+        staff_bookings = Booking.search(range_conflict_domain + [('staff_user_id', '=', int(staff_id))]) if staff_id else Booking
+        resource_bookings = Booking.search(range_conflict_domain + [('resource_id', '=', int(resource_id))]) if resource_id else Booking
 
         capacity = 1
         if resource_id:
@@ -400,92 +412,37 @@ class AppointmentController(http.Controller):
             capacity = resource.capacity or 1
 
         return {
-            'start_datetime': start_datetime,
-            'availabilities': availabilities,
+            'closed_dates': closed_dates,
             'min_booking_time': min_booking_time,
-            'staff_bookings': staff_bookings,
-            'resource_bookings': resource_bookings,
+            'staff_index': IntervalIndex(
+                (to_epoch(b.start_datetime), to_epoch(b.end_datetime), 1)
+                for b in staff_bookings
+            ),
+            'resource_index': IntervalIndex(
+                (to_epoch(b.start_datetime), to_epoch(b.end_datetime), b.guest_count)
+                for b in resource_bookings
+            ),
             'capacity': capacity,
         }
 
-    def _get_scheduled_slots(self, appointment_type, selected_date, resource_id, staff_id):
-        """Generate subdivided time slots from availability windows"""
-        ctx = self._get_availability_and_bookings(appointment_type, selected_date, resource_id, staff_id)
+    def _build_slots(self, candidates, ctx, resource_id, staff_id):
+        """Turn candidate (start, end) datetimes into the slot dicts sent to the widget.
 
-        if not ctx['availabilities']:
-            return {'slots': []}
+        Candidates are sorted and swept once against the staff and resource
+        booking indexes, instead of scanning every booking for every slot.
+        """
+        candidates = sorted(c for c in candidates if c[0] >= ctx['min_booking_time'])
+        if not candidates:
+            return []
 
-        slots = []
-        slot_duration = timedelta(hours=appointment_type.slot_duration)
-        slot_interval = timedelta(hours=appointment_type.slot_interval or appointment_type.slot_duration)
-        start_datetime = ctx['start_datetime']
-
-        for avail in ctx['availabilities']:
-            hour_from_int = int(avail.hour_from)
-            min_from = int(round((avail.hour_from % 1) * 60))
-            hour_to_int = int(avail.hour_to)
-            min_to = int(round((avail.hour_to % 1) * 60))
-
-            current_time = start_datetime.replace(hour=hour_from_int, minute=min_from, second=0, microsecond=0)
-            end_time = start_datetime.replace(hour=hour_to_int, minute=min_to, second=0, microsecond=0)
-
-            while current_time + slot_duration <= end_time:
-                if current_time >= ctx['min_booking_time']:
-                    slot_end = current_time + slot_duration
-
-                    staff_conflict = staff_id and any(
-                        b.start_datetime < slot_end and b.end_datetime > current_time
-                        for b in ctx['staff_bookings']
-                    )
-                    resource_overlap = sum(
-                        1 for b in ctx['resource_bookings']
-                        if b.start_datetime < slot_end and b.end_datetime > current_time
-                    ) if resource_id else 0
-
-                    if not staff_conflict and resource_overlap < ctx['capacity']:
-                        slots.append({
-                            'start': current_time.strftime('%Y-%m-%d %H:%M:%S'),
-                            'end': slot_end.strftime('%Y-%m-%d %H:%M:%S'),
-                            'start_time': current_time.strftime('%H:%M'),
-                            'end_time': slot_end.strftime('%H:%M'),
-                            'available': ctx['capacity'] - resource_overlap if resource_id else 1,
-                        })
-
-                current_time += slot_interval
-
-        slots.sort(key=lambda s: s['start'])
-        return {'slots': slots}
-
-    def _get_event_slots(self, appointment_type, selected_date, resource_id, staff_id):
-        """Generate one slot per availability window (special event mode)"""
-        ctx = self._get_availability_and_bookings(appointment_type, selected_date, resource_id, staff_id)
-
-        if not ctx['availabilities']:
-            return {'slots': []}
+        epoch_slots = [(to_epoch(start), to_epoch(end)) for start, end in candidates]
+        staff_overlaps = ctx['staff_index'].sweep(epoch_slots) if staff_id else None
+        resource_overlaps = ctx['resource_index'].sweep(epoch_slots) if resource_id else None
 
         slots = []
-        start_datetime = ctx['start_datetime']
-
-        for avail in ctx['availabilities']:
-            hour_from_int = int(avail.hour_from)
-            min_from = int(round((avail.hour_from % 1) * 60))
-            hour_to_int = int(avail.hour_to)
-            min_to = int(round((avail.hour_to % 1) * 60))
-
-            slot_start = start_datetime.replace(hour=hour_from_int, minute=min_from, second=0, microsecond=0)
-            slot_end = start_datetime.replace(hour=hour_to_int, minute=min_to, second=0, microsecond=0)
-
-            if slot_start < ctx['min_booking_time']:
-                continue
-
-            staff_conflict = staff_id and any(
-                b.start_datetime < slot_end and b.end_datetime > slot_start
-                for b in ctx['staff_bookings']
-            )
-            resource_overlap = sum(
-                1 for b in ctx['resource_bookings']
-                if b.start_datetime < slot_end and b.end_datetime > slot_start
-            ) if resource_id else 0
+        for i, (slot_start, slot_end) in enumerate(candidates):
+            staff_conflict = staff_id and staff_overlaps[i][0] > 0
+            resource_overlap = resource_overlaps[i][0] if resource_id else 0
 
             if not staff_conflict and resource_overlap < ctx['capacity']:
                 slots.append({
@@ -495,13 +452,13 @@ class AppointmentController(http.Controller):
                     'end_time': slot_end.strftime('%H:%M'),
                     'available': ctx['capacity'] - resource_overlap if resource_id else 1,
                 })
-
-        slots.sort(key=lambda s: s['start'])
-        return {'slots': slots}
+        return slots
 
     @http.route('/appointment/<int:appointment_type_id>/event_dates', type='json', auth='public')
     def get_event_dates(self, appointment_type_id, year, month, **kwargs):
         """Get dates with events for a given month (special event mode)"""
+        if self._json_rate_limited():
+            return {'dates': [], 'error': 'Too many requests'}
         appointment_type = request.env['appointment.type'].sudo().browse(appointment_type_id)
         if not appointment_type.exists():
             return {'dates': []}
@@ -510,21 +467,13 @@ class AppointmentController(http.Controller):
         month = int(month)
         _, num_days = calendar.monthrange(year, month)
 
-        # Get all availability dayofweek values for this appointment type
-        availabilities = request.env['appointment.availability'].sudo().search([
-            ('appointment_type_id', '=', appointment_type_id),
-        ])
-        available_days = set(int(a.dayofweek) for a in availabilities)
-
-        # L4: Fetch closing days for this month to exclude them
-        month_start = datetime(year, month, 1).date()
-        month_end = datetime(year, month, num_days).date()
-        closing_days = request.env['appointment.closing.day'].sudo().search([
-            ('appointment_type_id', '=', appointment_type_id),
-            ('date', '>=', month_start),
-            ('date', '<=', month_end),
-        ])
-        closed_dates = set(c.date for c in closing_days)
+        # Weekdays with at least one availability window for this appointment type
+        windows_by_weekday = request.env['appointment.availability'].sudo()._get_availability_windows(
+            appointment_type_id)
+        available_days = {weekday for weekday, windows in enumerate(windows_by_weekday) if windows}
+
+        # L4: Exclude closing days
+        closed_dates = request.env['appointment.closing.day'].sudo()._get_closed_dates(appointment_type_id)
 
         dates = []
         today = fields.Date.context_today(request.env['appointment.type'])
@@ -699,14 +648,11 @@ class AppointmentController(http.Controller):
             end_dt = start_dt + timedelta(hours=appointment_type.slot_duration)
 
         # H6: Validate closing days server-side
-        closing = request.env['appointment.closing.day'].sudo().search([
-            ('appointment_type_id', '=', appointment_type.id),
-            ('date', '=', start_dt.date()),
-        ], limit=1)
-        if closing:
+        closed_dates = request.env['appointment.closing.day'].sudo()._get_closed_dates(appointment_type.id)
+        if start_dt.date() in closed_dates:
             return self._render_booking_form_error(
                 appointment_type, data,
-                _('This date is closed: %s', closing.name or _('Closed')))
+                _('This date is closed: %s', closed_dates[start_dt.date()] or _('Closed')))
 
         # M8: Server-side max_booking_days validation
         max_date = fields.Date.today() + timedelta(days=appointment_type.max_booking_days)
@@ -715,21 +661,17 @@ class AppointmentController(http.Controller):
                 appointment_type, data, _('Cannot book beyond %d days in advance.', appointment_type.max_booking_days))
 
         # L7: Validate selected time falls within an availability window
-        day_of_week = str(start_dt.weekday())
-        avail_domain = [
-            ('appointment_type_id', '=', appointment_type.id),
-            ('dayofweek', '=', day_of_week),
-        ]
-        availabilities = request.env['appointment.availability'].sudo().search(avail_domain)
-        if not availabilities:
+        windows = request.env['appointment.availability'].sudo()._get_availability_windows(
+            appointment_type.id)[start_dt.weekday()]
+        if not windows:
             return self._render_booking_form_error(
                 appointment_type, data, _('No availability on the selected day.'))
 
-        slot_hour = start_dt.hour + start_dt.minute / 60.0
-        slot_end_hour = (end_dt.hour + end_dt.minute / 60.0) if end_dt.date() == start_dt.date() else 24.0
+        slot_minute = start_dt.hour * 60 + start_dt.minute
+        slot_end_minute = (end_dt.hour * 60 + end_dt.minute) if end_dt.date() == start_dt.date() else 24 * 60
         in_window = any(
-            avail.hour_from <= slot_hour and slot_end_hour <= avail.hour_to
-            for avail in availabilities
+            minute_from <= slot_minute and slot_end_minute <= minute_to
+            for minute_from, minute_to in windows
         )
         if not in_window:
             return self._render_booking_form_error(
@@ -767,13 +709,14 @@ class AppointmentController(http.Controller):
 
         Booking = request.env['appointment.booking'].sudo()
 
-        # M1: Basic rate limiting — max 5 bookings per email per hour
-        one_hour_ago = fields.Datetime.now() - timedelta(hours=1)
-        recent_count = Booking.search_count([
-            ('guest_email', '=', email),
-            ('create_date', '>=', one_hour_ago),
-        ])
-        if recent_count >= 5:
+        # M1: Rate limiting of submission attempts, per email for this type and per IP
+        email_limited = self._is_rate_limited(
+            f'booking:{appointment_type.id}:email:{email.lower()}',
+            limit=(appointment_type.booking_rate_limit, 60),
+        ) if appointment_type.booking_rate_limit else False
+        ip_limited = self._is_rate_limited(
+            f'booking:ip:{request.httprequest.remote_addr}', scope='booking_ip')
+        if email_limited or ip_limited:
             return self._render_booking_form_error(
                 appointment_type, data, _('Too many booking attempts. Please try again later.'))
 
@@ -799,52 +742,59 @@ class AppointmentController(http.Controller):
             booking_vals['guest_email'] = partner.email or email
         else:
             booking_vals['guest_email'] = email
-            partner = request.env['res.partner'].sudo().search([
-                ('email', '=', email)
-            ], limit=1)
-            if not partner:
-                partner = request.env['res.partner'].sudo().create({
-                    'name': guest_name,
-                    'email': email,
-                    'phone': guest_phone,
-                })
+            partner = request.env['res.partner'].sudo()._appointment_get_guest_partner(
+                email, guest_name, guest_phone)
         booking_vals['partner_id'] = partner.id
 
         # Payment status is computed automatically from SO state
 
         # C3 fix: 衝突檢查 + 建立在同一 savepoint 內，確保鎖定不會提前釋放
-        with request.env.cr.savepoint():
-            conflict = Booking._check_booking_conflict(
-                start_dt=start_dt,
-                end_dt=end_dt,
-                staff_user_id=staff_id or False,
-                resource_id=resource_id or False,
-                lock=True,
-            )
-            if conflict.get('staff_conflict'):
-                return self._render_booking_form_error(
-                    appointment_type, data, _('This staff member is no longer available for the selected time. Please choose another time.'))
-            if conflict.get('resource_conflict'):
-                return self._render_booking_form_error(
-                    appointment_type, data, _('This location is no longer available for the selected time. Please choose another time.'))
-
-            booking = Booking.create(booking_vals)
-
-        # Auto-assign staff/location if not customer-chosen
-        if appointment_type.assign_staff and not booking.staff_user_id:
-            booking._auto_assign_staff()
-        if appointment_type.assign_location and not booking.resource_id:
-            booking._auto_assign_location()
+        # The savepoint also covers assignment and auto-confirmation: with the
+        # staff exclusion constraint active, a concurrent booking of the same
+        # staff member is rejected by the database when the confirmed state is
+        # flushed, which rolls the whole booking back.
+        auto_confirm = appointment_type.auto_confirm and not appointment_type.require_payment
+        try:
+            with request.env.cr.savepoint():
+                conflict = Booking._check_booking_conflict(
+                    start_dt=start_dt,
+                    end_dt=end_dt,
+                    staff_user_id=staff_id or False,
+                    resource_id=resource_id or False,
+                    lock=True,
+                )
+                if conflict.get('staff_conflict'):
+                    return self._render_booking_form_error(
+                        appointment_type, data, _('This staff member is no longer available for the selected time. Please choose another time.'))
+                if conflict.get('resource_conflict'):
+                    return self._render_booking_form_error(
+                        appointment_type, data, _('This location is no longer available for the selected time. Please choose another time.'))
+
+                booking = Booking.create(booking_vals)
+
+                # Auto-assign staff/location if not customer-chosen
+                if appointment_type.assign_staff and not booking.staff_user_id:
+                    booking._auto_assign_staff()
+                if appointment_type.assign_location and not booking.resource_id:
+                    booking._auto_assign_location()
+
+                # Auto confirm if enabled and no payment required. Only the
+                # state change happens here, channel/event/email are queued.
+                if auto_confirm:
+                    booking.with_context(defer_booking_side_effects=True).action_confirm()
+                    booking.flush_recordset(['state'])
+        except pg_errors.ExclusionViolation:
+            return self._render_booking_form_error(
+                appointment_type, data, _('This staff member is no longer available for the selected time. Please choose another time.'))
+        except UserError as e:
+            # Auto-confirmation refused, a concurrent booking came first
+            return self._render_booking_form_error(appointment_type, data, e.args[0])
 
-        # Auto confirm if enabled and no payment required
-        if appointment_type.auto_confirm and not appointment_type.require_payment:
-            booking.action_confirm()
-            # action_confirm already sends confirmation email
-        else:
+        if not auto_confirm:
             # Send "booking created" email for:
             # 1. Payment-required bookings (draft + payment pending)
             # 2. Non-auto-confirm bookings (draft, awaiting manual confirmation)
-            booking._send_booking_created_email()
+            booking._enqueue_job('created_email')
 
         # Redirect to appropriate page
         if appointment_type.require_payment:
@@ -918,11 +868,8 @@ class AppointmentController(http.Controller):
         # Get partner (create if needed)
         partner = booking.partner_id
         if not partner:
-            partner = request.env['res.partner'].sudo().create({
-                'name': booking.guest_name,
-                'email': booking.guest_email,
-                'phone': booking.guest_phone,
-            })
+            partner = request.env['res.partner'].sudo()._appointment_get_guest_partner(
+                booking.guest_email, booking.guest_name, booking.guest_phone)
             booking.partner_id = partner
 
         # Get payment context
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Post-migration: fill the new capacity ledger from existing bookings."""
+    if not version:
+        return
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['appointment.capacity.ledger']._rebuild()
+
+    _logger.info("Post-migration 18.0.2.10.0 completed successfully")
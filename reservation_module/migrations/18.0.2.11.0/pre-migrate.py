@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Pre-migration: fill appointment_booking.reminder_due_at in SQL.
+
+    Creating the column here keeps the ORM from recomputing the stored field
+    booking by booking. The hourly reminder scan becomes a daily safety net:
+    the cron is now triggered at each due time.
+    """
+    if not version:
+        return
+
+    cr.execute("""
+        ALTER TABLE appointment_booking
+        ADD COLUMN IF NOT EXISTS reminder_due_at timestamp without time zone
+    """)
+    cr.execute("""
+        UPDATE appointment_booking b
+           SET reminder_due_at = b.start_datetime
+               - make_interval(secs => COALESCE(NULLIF(t.reminder_hours, 0), 24) * 3600)
+          FROM appointment_type t
+         WHERE t.id = b.appointment_type_id
+           AND b.start_datetime IS NOT NULL
+    """)
+    _logger.info("Filled reminder_due_at of %d bookings", cr.rowcount)
+
+    # Replaced by appointment_booking_reminder_due_index
+    cr.execute("DROP INDEX IF EXISTS appointment_booking_reminder_index")
+
+    # The cron record is noupdate, switch it to the daily safety net here
+    cr.execute("""
+        UPDATE ir_cron
+           SET interval_number = 1, interval_type = 'days'
+         WHERE id = (
+                SELECT res_id FROM ir_model_data
+                 WHERE module = 'reservation_module'
+                   AND name = 'ir_cron_send_booking_reminders'
+         )
+    """)
+
+    _logger.info("Pre-migration 18.0.2.11.0 completed successfully")
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo.addons.reservation_module.tools.migration import create_indexes
+
+_logger = logging.getLogger(__name__)
+
+# Same definition as AppointmentBooking._auto_init
+INDEXES = [
+    ('appointment_booking_type_start_index', "(appointment_type_id, start_datetime, state)"),
+]
+
+
+def migrate(cr, version):
+    """Pre-migration: build the per-type booking index if missing."""
+    if not version:
+        return
+
+    create_indexes(cr, 'appointment_booking', INDEXES)
+    _logger.info("Pre-migration 18.0.2.12.0 completed successfully")
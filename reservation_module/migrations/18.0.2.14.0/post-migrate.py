@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Post-migration: drop the index of the former per-email rate limit.
+
+    Booking form attempts are now counted in appointment_rate_limit, nothing
+    queries appointment_booking by (guest_email, create_date) anymore.
+    """
+    if not version:
+        return
+
+    cr.execute("DROP INDEX IF EXISTS appointment_booking_guest_email_create_date_index")
+    _logger.info("Post-migration 18.0.2.14.0 completed successfully")
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo.addons.reservation_module.tools.migration import create_indexes
+
+_logger = logging.getLogger(__name__)
+
+# Same definition as ResPartner._auto_init
+INDEXES = [
+    ('res_partner_email_normalized_index', "(email_normalized) WHERE email_normalized IS NOT NULL"),
+]
+
+
+def migrate(cr, version):
+    """Pre-migration: build the partner email index if missing."""
+    if not version:
+        return
+
+    create_indexes(cr, 'res_partner', INDEXES)
+    _logger.info("Pre-migration 18.0.2.15.0 completed successfully")
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo.addons.reservation_module.tools.migration import create_indexes
+
+_logger = logging.getLogger(__name__)
+
+# Same definitions as the conflict indexes of AppointmentBooking._auto_init
+# and the indexed fields, so the ORM finds them already present and does not
+# rebuild them. Indexes dropped again by later migrations of this release
+# (per-email rate limit, reminder scan) are left out.
+BOOKING_INDEXES = [
+    ('appointment_booking_staff_period_index',
+     "(staff_user_id, start_datetime, end_datetime) "
+     "WHERE state IN ('confirmed', 'done') AND staff_user_id IS NOT NULL"),
+    ('appointment_booking_resource_period_index',
+     "(resource_id, start_datetime, end_datetime) "
+     "WHERE state IN ('confirmed', 'done') AND resource_id IS NOT NULL"),
+    ('appointment_booking__partner_id_index',
+     "(partner_id)"),
+    ('appointment_booking__sale_order_id_index',
+     "(sale_order_id) WHERE sale_order_id IS NOT NULL"),
+]
+
+
+def migrate(cr, version):
+    """Pre-migration: build the booking conflict indexes if missing."""
+    if not version:
+        return
+
+    create_indexes(cr, 'appointment_booking', BOOKING_INDEXES)
+    _logger.info("Pre-migration 18.0.2.9.0 completed successfully")
@@ -5,8 +5,15 @@ from . import appointment_closing_day
 from . import appointment_availability
 from . import appointment_slot
 from . import appointment_booking
+from . import appointment_capacity_ledger
+from . import appointment_booking_job
+from . import appointment_rate_limit
+from . import appointment_slot_cache
+from . import appointment_guest_claim
 from . import appointment_question
 from . import resource_resource
+from . import res_partner
 from . import payment_transaction
 from . import sale_order
 from . import ir_http
+from . import ir_module_module
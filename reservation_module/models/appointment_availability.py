@@ -1,9 +1,21 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
 
+def _merge_windows(windows):
+    """Merge sorted (from, to) minute windows that overlap or touch."""
+    merged = []
+    for start, end in windows:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
 class AppointmentAvailability(models.Model):
     _name = 'appointment.availability'
     _description = 'Appointment Availability'
@@ -51,6 +63,76 @@ class AppointmentAvailability(models.Model):
         help='Leave empty to apply to all staff',
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        records.appointment_type_id._reset_slot_inventory()
+        return records
+
+    def write(self, vals):
+        types = self.appointment_type_id
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        (types | self.appointment_type_id)._reset_slot_inventory()
+        return res
+
+    def unlink(self):
+        types = self.appointment_type_id
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        types._reset_slot_inventory()
+        return res
+
+    @api.model
+    @tools.ormcache('appointment_type_id')
+    def _get_compiled_availability(self, appointment_type_id):
+        """Weekly schedule of an appointment type, compiled to minute windows.
+
+        Returns {(resource_id, user_id): 7-tuple indexed by weekday of sorted
+        ((from, to), ...) minute-of-day windows}, ids being False when the
+        line applies to every location or staff member. Cached per registry,
+        other workers are invalidated through the registry cache signaling.
+        """
+        # Pending writes must reach the table before it is read and cached
+        self.flush_model(['appointment_type_id', 'resource_id', 'user_id', 'dayofweek', 'hour_from', 'hour_to'])
+        self.env.cr.execute("""
+            SELECT resource_id, user_id, dayofweek, hour_from, hour_to
+              FROM appointment_availability
+             WHERE appointment_type_id = %s
+        """, [appointment_type_id])
+        compiled = {}
+        for resource_id, user_id, dayofweek, hour_from, hour_to in self.env.cr.fetchall():
+            week = compiled.setdefault((resource_id or False, user_id or False), [[] for _day in range(7)])
+            week[int(dayofweek)].append((int(round(hour_from * 60)), int(round(hour_to * 60))))
+        return tools.frozendict({
+            key: tuple(tuple(sorted(windows)) for windows in week)
+            for key, week in compiled.items()
+        })
+
+    @api.model
+    def _get_availability_windows(self, appointment_type_id, resource_id=False, staff_id=False, merge=True):
+        """Minute windows of every weekday, for a location and/or staff member.
+
+        Lines of other locations/staff members are left out when one is given.
+        With ``merge`` overlapping and adjacent windows are joined (slot grid);
+        without, each line stays a window of its own (one event per line).
+        Returns a 7-tuple indexed by weekday.
+        """
+        compiled = self._get_compiled_availability(appointment_type_id)
+        resource_id = int(resource_id) if resource_id else False
+        staff_id = int(staff_id) if staff_id else False
+        weeks = [
+            week for (line_resource_id, line_user_id), week in compiled.items()
+            if (not resource_id or line_resource_id in (resource_id, False))
+            and (not staff_id or line_user_id in (staff_id, False))
+        ]
+        days = []
+        for weekday in range(7):
+            windows = sorted(window for week in weeks for window in week[weekday])
+            days.append(_merge_windows(windows) if merge else tuple(windows))
+        return tuple(days)
+
     @api.constrains('hour_from', 'hour_to')
     def _check_hours(self):
         for record in self:
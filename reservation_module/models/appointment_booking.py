@@ -1,14 +1,39 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import str2bool
+from collections import Counter, defaultdict
 from datetime import timedelta, datetime
 import logging
+import psycopg2
+from psycopg2 import errors as pg_errors
 import secrets
 import uuid
 
+from markupsafe import Markup
+
+from .appointment_capacity_ledger import LEDGER_BUCKET_MINUTES
+
 _logger = logging.getLogger(__name__)
 
+STAFF_EXCLUSION_CONSTRAINT = 'appointment_booking_staff_no_overlap'
+
+# Reminders claimed and rendered per cron call
+REMINDER_BATCH_SIZE = 200
+
+# Fields that move the reminder of a booking
+REMINDER_FIELDS = {'state', 'start_datetime', 'appointment_type_id', 'reminder_sent'}
+
+# Fields that decide the generated inventory slot of a booking
+SLOT_LINK_FIELDS = {'appointment_type_id', 'resource_id', 'start_datetime', 'end_datetime'}
+
+# Fields that decide whether and how a booking holds location capacity
+CAPACITY_LEDGER_FIELDS = {'state', 'resource_id', 'start_datetime', 'end_datetime', 'guest_count'}
+
+# Fields that change the public slots of the booked location or staff member
+SLOT_CACHE_FIELDS = CAPACITY_LEDGER_FIELDS | {'staff_user_id'}
+
 
 class AppointmentBooking(models.Model):
     _name = 'appointment.booking'
@@ -34,6 +59,7 @@ class AppointmentBooking(models.Model):
         'appointment.slot',
         string='Slot',
         ondelete='set null',
+        index='btree_not_null',
     )
 
     # Booker Information
@@ -42,6 +68,7 @@ class AppointmentBooking(models.Model):
         string='Contact',
         tracking=True,
         ondelete='set null',
+        index=True,
     )
     guest_name = fields.Char('Guest Name', required=True, tracking=True)
     guest_email = fields.Char('Guest Email', required=True)
@@ -84,6 +111,7 @@ class AppointmentBooking(models.Model):
         string='Sales Order',
         ondelete='set null',
         copy=False,
+        index='btree_not_null',
     )
 
     # Payment
@@ -127,10 +155,23 @@ class AppointmentBooking(models.Model):
 
     # Reminder tracking
     reminder_sent = fields.Boolean('Reminder Sent', default=False, copy=False)
+    reminder_due_at = fields.Datetime(
+        'Reminder Due At',
+        compute='_compute_reminder_due_at',
+        store=True,
+        copy=False,
+        help='When the reminder email is sent: start time minus the reminder hours of the type',
+    )
 
     # Payment failure tracking
     payment_failure_count = fields.Integer('Payment Failures', default=0, copy=False)
 
+    # Side effects run out of band
+    job_ids = fields.One2many(
+        'appointment.booking.job', 'booking_id',
+        string='Follow-up Jobs',
+    )
+
     # Discuss channel integration
     discuss_channel_id = fields.Many2one(
         'discuss.channel', string='Discussion Channel',
@@ -144,6 +185,108 @@ class AppointmentBooking(models.Model):
         default=lambda self: self.env.company,
     )
 
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Conflict checks only ever look at confirmed/done rows of one staff
+        # member or one resource; keep those indexes partial and small.
+        # migrations/18.0.2.9.0 builds the same indexes before the update on
+        # existing databases, keep both in sync.
+        tools.create_index(
+            self.env.cr, 'appointment_booking_staff_period_index', self._table,
+            ['staff_user_id', 'start_datetime', 'end_datetime'],
+            where="state IN ('confirmed', 'done') AND staff_user_id IS NOT NULL",
+        )
+        tools.create_index(
+            self.env.cr, 'appointment_booking_resource_period_index', self._table,
+            ['resource_id', 'start_datetime', 'end_datetime'],
+            where="state IN ('confirmed', 'done') AND resource_id IS NOT NULL",
+        )
+        # Booking counters and per-type listings by date
+        tools.create_index(
+            self.env.cr, 'appointment_booking_type_start_index', self._table,
+            ['appointment_type_id', 'start_datetime', 'state'],
+        )
+        # Reminder cron: pending reminders by due time
+        tools.create_index(
+            self.env.cr, 'appointment_booking_reminder_due_index', self._table,
+            ['reminder_due_at'],
+            where="state = 'confirmed' AND reminder_sent IS NOT TRUE",
+        )
+        self._sync_staff_exclusion_constraint()
+        return res
+
+    @api.model
+    def _sync_staff_exclusion_constraint(self):
+        """Install or remove the staff double-booking exclusion constraint.
+
+        Enabled by the system parameter
+        ``reservation_module.staff_exclusion_constraint`` and applied when the
+        module is installed or upgraded. The constraint rejects any second
+        confirmed/done booking of the same staff member over an overlapping
+        period, including concurrent inserts into an empty window, so staff
+        conflict checks no longer need to lock rows.
+
+        Stored datetimes are naive UTC, hence a ``tsrange`` generated column.
+        """
+        cr = self.env.cr
+        enabled = str2bool(self.env['ir.config_parameter'].sudo().get_param(
+            'reservation_module.staff_exclusion_constraint', 'False'), False)
+        cr.execute(
+            "SELECT 1 FROM pg_constraint WHERE conname = %s",
+            [STAFF_EXCLUSION_CONSTRAINT],
+        )
+        installed = bool(cr.fetchone())
+
+        if enabled and not installed:
+            try:
+                with cr.savepoint(flush=False):
+                    # GiST needs btree_gist for the equality on staff_user_id
+                    cr.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+                    cr.execute(f"""
+                        ALTER TABLE {self._table}
+                        ADD COLUMN IF NOT EXISTS booking_period tsrange
+                        GENERATED ALWAYS AS (tsrange(start_datetime, end_datetime, '[)')) STORED
+                    """)
+                    cr.execute(f"""
+                        ALTER TABLE {self._table}
+                        ADD CONSTRAINT {STAFF_EXCLUSION_CONSTRAINT}
+                        EXCLUDE USING gist (staff_user_id WITH =, booking_period WITH &&)
+                        WHERE (state IN ('confirmed', 'done') AND staff_user_id IS NOT NULL)
+                    """)
+            except psycopg2.Error as e:
+                _logger.warning(
+                    "Could not install the staff exclusion constraint, "
+                    "falling back to locking conflict checks: %s", e,
+                )
+            else:
+                _logger.info("Installed staff exclusion constraint on %s", self._table)
+        elif installed and not enabled:
+            cr.execute(f"ALTER TABLE {self._table} DROP CONSTRAINT {STAFF_EXCLUSION_CONSTRAINT}")
+            cr.execute(f"ALTER TABLE {self._table} DROP COLUMN IF EXISTS booking_period")
+            _logger.info("Removed staff exclusion constraint from %s", self._table)
+        self.env.registry.clear_cache()
+
+    @api.model
+    @tools.ormcache()
+    def _staff_exclusion_active(self):
+        """Whether the database enforces staff double-booking by itself."""
+        self.env.cr.execute(
+            "SELECT 1 FROM pg_constraint WHERE conname = %s",
+            [STAFF_EXCLUSION_CONSTRAINT],
+        )
+        return bool(self.env.cr.fetchone())
+
+    # appointment_type_id.reminder_hours is left out on purpose: a change of
+    # the type only moves the pending reminders, see AppointmentType.write
+    @api.depends('start_datetime', 'appointment_type_id')
+    def _compute_reminder_due_at(self):
+        for booking in self:
+            if booking.start_datetime:
+                reminder_hours = booking.appointment_type_id.reminder_hours or 24
+                booking.reminder_due_at = booking.start_datetime - timedelta(hours=reminder_hours)
+            else:
+                booking.reminder_due_at = False
+
     @api.depends('start_datetime', 'end_datetime')
     def _compute_duration(self):
         for booking in self:
@@ -215,7 +358,13 @@ class AppointmentBooking(models.Model):
                 vals['name'] = self.env['ir.sequence'].next_by_code('appointment.booking') or 'New'
             if not vals.get('access_token'):
                 vals['access_token'] = secrets.token_urlsafe(32)
-        return super().create(vals_list)
+        bookings = super().create(vals_list)
+        bookings._link_inventory_slots()
+        bookings._update_capacity_ledger([], bookings._capacity_ledger_entries())
+        SlotVersion = self.env['appointment.slot.version'].sudo()
+        SlotVersion._bump(SlotVersion._booking_keys(bookings))
+        bookings._schedule_reminders()
+        return bookings
 
     @api.model
     def _check_booking_conflict(self, start_dt, end_dt, staff_user_id=False, resource_id=False, exclude_booking_id=False, lock=False):
@@ -224,6 +373,10 @@ class AppointmentBooking(models.Model):
         Args:
             lock: If True, uses SELECT FOR UPDATE to prevent race conditions
                   during booking creation. Only use inside a write transaction.
+                  For locations the capacity ledger buckets of the period
+                  are locked, so an empty period is protected as well.
+                  Staff rows are not locked when the staff exclusion
+                  constraint is active: the database rejects the overlap.
 
         Returns dict: {'staff_conflict': bool, 'resource_conflict': bool, 'resource_remaining': int}
         """
@@ -238,7 +391,13 @@ class AppointmentBooking(models.Model):
         lock_clause = " FOR UPDATE" if lock else ""
 
         if staff_user_id:
-            query = f"SELECT COUNT(*) FROM appointment_booking WHERE {base_where} AND staff_user_id = %s{lock_clause}"
+            staff_lock_clause = "" if self._staff_exclusion_active() else lock_clause
+            # Row locks are taken in a sub-select: PostgreSQL refuses
+            # FOR UPDATE on an aggregate.
+            query = (
+                f"SELECT COUNT(*) FROM (SELECT id FROM appointment_booking "
+                f"WHERE {base_where} AND staff_user_id = %s{staff_lock_clause}) AS overlapping"
+            )
             self.env.cr.execute(query, base_params + [staff_user_id])
             staff_count = self.env.cr.fetchone()[0]
             result['staff_conflict'] = staff_count > 0
@@ -246,21 +405,97 @@ class AppointmentBooking(models.Model):
         if resource_id:
             resource = self.env['resource.resource'].browse(resource_id)
             capacity = resource.capacity or 1
-            # C4 fix: 用 SUM(guest_count) 取代 COUNT(*) 正確計算人數容量
-            query = (
-                f"SELECT COALESCE(SUM(guest_count), 0) "
-                f"FROM appointment_booking WHERE {base_where} AND resource_id = %s{lock_clause}"
-            )
-            self.env.cr.execute(query, base_params + [resource_id])
-            total_guests = self.env.cr.fetchone()[0]
+            # C4 fix: 以人數 (guest_count) 計算容量，取時段內的尖峰人數
+            Ledger = self.env['appointment.capacity.ledger']
+            booked = Ledger._get_booked_by_bucket(resource_id, start_dt, end_dt, lock=lock)
+            if exclude_booking_id:
+                for entry in self.browse(exclude_booking_id)._capacity_ledger_entries():
+                    if entry[0] != resource_id:
+                        continue
+                    first, last = Ledger._bucket_bounds(entry[1], entry[2])
+                    for bucket in booked:
+                        if first <= bucket <= last:
+                            booked[bucket] -= entry[3]
+            total_guests = max(booked.values(), default=0)
             result['resource_conflict'] = total_guests >= capacity
             result['resource_remaining'] = max(0, capacity - total_guests)
 
         return result
 
+    def _link_inventory_slots(self):
+        """Attach these bookings to their generated inventory slot.
+
+        A booking of a location is linked to the slot row of that location
+        with the same times, so the stored slot occupancy follows its
+        bookings. The rows of the type as a whole hold no booking: the live
+        slot search does not limit them either.
+        """
+        bookings = self.filtered(lambda b: b.appointment_type_id.slot_inventory)
+        if not bookings:
+            return
+        self.flush_model(['appointment_type_id', 'resource_id', 'start_datetime', 'end_datetime'])
+        self.env['appointment.slot'].flush_model(
+            ['appointment_type_id', 'resource_id', 'staff_user_id', 'start_datetime', 'end_datetime'])
+        self.env.cr.execute("""
+            SELECT b.id, s.id
+              FROM appointment_booking b
+              LEFT JOIN appointment_slot s
+                ON s.appointment_type_id = b.appointment_type_id
+               AND s.resource_id = b.resource_id
+               AND s.staff_user_id IS NULL
+               AND s.start_datetime = b.start_datetime
+               AND s.end_datetime = b.end_datetime
+             WHERE b.id IN %s
+        """, [tuple(bookings.ids)])
+        by_slot = defaultdict(list)
+        for booking_id, slot_id in self.env.cr.fetchall():
+            by_slot[slot_id or False].append(booking_id)
+        for slot_id, booking_ids in by_slot.items():
+            to_link = self.browse(booking_ids).filtered(lambda b: b.slot_id.id != slot_id)
+            if to_link:
+                to_link.write({'slot_id': slot_id})
+
+    def _capacity_ledger_entries(self):
+        """(resource_id, start, end, guests) of the bookings holding location capacity."""
+        return [
+            (booking.resource_id.id, booking.start_datetime, booking.end_datetime, booking.guest_count)
+            for booking in self
+            if booking.state in ('confirmed', 'done') and booking.resource_id
+            and booking.start_datetime and booking.end_datetime
+        ]
+
+    def _update_capacity_ledger(self, old_entries, new_entries):
+        """Move the capacity ledger from ``old_entries`` to ``new_entries``."""
+        removed = Counter(old_entries)
+        added = Counter(new_entries)
+        removed, added = removed - added, added - removed
+        Ledger = self.env['appointment.capacity.ledger']
+        for (resource_id, start_dt, end_dt, guests), count in removed.items():
+            Ledger._add(resource_id, start_dt, end_dt, -guests * count)
+        for (resource_id, start_dt, end_dt, guests), count in added.items():
+            Ledger._add(resource_id, start_dt, end_dt, guests * count)
+
     def write(self, vals):
         """M6 fix: 修改預約時間時同步更新關聯的 calendar event。"""
+        if 'start_datetime' in vals and 'reminder_sent' not in vals:
+            # Rescheduled: remind again relative to the new start
+            vals = dict(vals, reminder_sent=False)
+        ledger_entries = None
+        if CAPACITY_LEDGER_FIELDS.intersection(vals):
+            ledger_entries = self._capacity_ledger_entries()
+        SlotVersion = self.env['appointment.slot.version'].sudo()
+        slot_keys = None
+        if SLOT_CACHE_FIELDS.intersection(vals):
+            slot_keys = SlotVersion._booking_keys(self)
         result = super().write(vals)
+        if SLOT_LINK_FIELDS.intersection(vals):
+            self._link_inventory_slots()
+        if ledger_entries is not None:
+            self._update_capacity_ledger(ledger_entries, self._capacity_ledger_entries())
+        if slot_keys is not None:
+            SlotVersion._bump(slot_keys | SlotVersion._booking_keys(self))
+        if REMINDER_FIELDS.intersection(vals):
+            self._schedule_reminders()
         if ('start_datetime' in vals or 'end_datetime' in vals) and not self.env.context.get('_skip_calendar_sync'):
             for booking in self:
                 if booking.calendar_event_id:
@@ -273,6 +508,15 @@ class AppointmentBooking(models.Model):
                         booking.calendar_event_id.write(event_vals)
         return result
 
+    def unlink(self):
+        ledger_entries = self._capacity_ledger_entries()
+        SlotVersion = self.env['appointment.slot.version'].sudo()
+        slot_keys = SlotVersion._booking_keys(self)
+        result = super().unlink()
+        self._update_capacity_ledger(ledger_entries, [])
+        SlotVersion._bump(slot_keys)
+        return result
+
     @api.constrains('start_datetime', 'end_datetime')
     def _check_dates(self):
         for booking in self:
@@ -286,41 +530,214 @@ class AppointmentBooking(models.Model):
                 raise ValidationError(_('Number of guests must be at least 1.'))
 
     def action_confirm(self):
-        """Confirm the booking"""
-        for booking in self:
-            if booking.state not in ('draft', 'pending_payment'):
-                continue
+        """Confirm the bookings.
 
-            # Check payment if required
-            appointment_type = booking.appointment_type_id
-            if appointment_type.require_payment and booking.payment_status != 'paid':
-                raise UserError(_('Payment is required before confirming this booking.'))
-
-            # Cross-type conflict check (safety net for race conditions)
-            conflict = self.env['appointment.booking']._check_booking_conflict(
-                start_dt=booking.start_datetime,
-                end_dt=booking.end_datetime,
-                staff_user_id=booking.staff_user_id.id if booking.staff_user_id else False,
-                resource_id=booking.resource_id.id if booking.resource_id else False,
-                exclude_booking_id=booking.id,
-            )
-            if conflict['staff_conflict']:
-                raise UserError(_('Staff member is already booked for this time slot.'))
-            if conflict['resource_conflict']:
-                raise UserError(_('Location is fully booked for this time slot.'))
+        A single booking that cannot be confirmed raises a UserError. When
+        several bookings are confirmed at once, the blocked ones are skipped
+        and the others are confirmed.
+        """
+        report = self._confirm_batch()
+        if len(self) == 1 and report['skipped']:
+            raise UserError(report['skipped'][0][1])
+        return True
 
-            # Create Discuss channel (soft-coupled: only if cs_portal_discuss installed)
-            booking._create_discuss_channel()
+    def action_mass_confirm(self):
+        """Confirm the selected bookings and report the skipped ones"""
+        report = self._confirm_batch()
+        return self._batch_report_notification(
+            _('Bookings Confirmed'),
+            _('%d booking(s) confirmed.', len(report['done'])),
+            report['skipped'],
+        )
 
-            # Create calendar event
-            booking._create_calendar_event()
+    def _batch_report_notification(self, title, summary, skipped):
+        """Notification summarizing a batch action and listing the skipped bookings."""
+        lines = [summary]
+        if skipped:
+            lines.append(_('%d booking(s) skipped:', len(skipped)))
+            lines += [f"{booking.name}: {reason}" for booking, reason in skipped]
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': title,
+                'message': '\n'.join(lines),
+                'sticky': bool(skipped),
+                'type': 'warning' if skipped else 'success',
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }
 
-            booking.write({'state': 'confirmed'})
+    def _confirm_batch(self):
+        """Confirm these bookings as one set operation.
 
-            # Send confirmation email
-            booking._send_confirmation_email()
+        Conflicts are detected for the whole recordset at once: staff overlaps
+        with existing bookings in one query, location capacity from the
+        capacity ledger, and conflicts between the bookings being confirmed
+        by accepting them in start order. Channels and calendar events are
+        multi-created, the state is written once and the confirmation mails
+        are rendered in one batch.
 
-        return True
+        Returns {'done': confirmed bookings, 'skipped': [(booking, reason)]}.
+        Bookings that are not draft or pending payment are left out silently.
+        """
+        skipped = []
+        candidates = self.browse()
+        for booking in self.filtered(lambda b: b.state in ('draft', 'pending_payment')):
+            # Check payment if required
+            if booking.appointment_type_id.require_payment and booking.payment_status != 'paid':
+                skipped.append((booking, _('Payment is required before confirming this booking.')))
+            else:
+                candidates |= booking
+        conflicts = candidates._get_batch_conflicts()
+        skipped += [(booking, conflicts[booking.id]) for booking in candidates if booking.id in conflicts]
+        bookings = candidates.filtered(lambda b: b.id not in conflicts)
+        refused = bookings._write_confirmed_state()
+        skipped += [(booking, _('Staff member is already booked for this time slot.')) for booking in refused]
+        bookings -= refused
+        if not bookings:
+            return {'done': bookings, 'skipped': skipped}
+
+        if self.env.context.get('defer_booking_side_effects'):
+            # Public flow: reserve now, channel/event/email run in a job
+            bookings._enqueue_job('confirm')
+            return {'done': bookings, 'skipped': skipped}
+
+        # Create Discuss channels (soft-coupled: only if cs_portal_discuss installed)
+        bookings._create_discuss_channels()
+
+        # Create calendar events
+        bookings._create_calendar_events()
+
+        # Send confirmation emails
+        bookings._send_confirmation_emails()
+
+        return {'done': bookings, 'skipped': skipped}
+
+    def _write_confirmed_state(self):
+        """Write the confirmed state, return the bookings the database refused.
+
+        With the staff exclusion constraint active, an overlap committed by
+        a concurrent transaction after the conflict check is only detected
+        here. The set is written in one savepoint; when it is refused, each
+        booking is written in a savepoint of its own to find the overlapping
+        ones, the others are confirmed.
+        """
+        if not self or not self._staff_exclusion_active():
+            self.write({'state': 'confirmed'})
+            return self.browse()
+        try:
+            with self.env.cr.savepoint():
+                self.write({'state': 'confirmed'})
+            return self.browse()
+        except pg_errors.ExclusionViolation:
+            pass
+        refused = self.browse()
+        for booking in self:
+            try:
+                with self.env.cr.savepoint():
+                    booking.write({'state': 'confirmed'})
+            except pg_errors.ExclusionViolation:
+                refused |= booking
+        return refused
+
+    def _get_batch_conflicts(self):
+        """Cross-type conflicts of these unconfirmed bookings, {booking_id: reason}.
+
+        Bookings are accepted in start order: each accepted booking holds its
+        staff member and location capacity against the following ones.
+
+        Without the staff exclusion constraint, the bookings being confirmed
+        and every open booking overlapping them for the same staff member
+        are locked first, drafts included: a concurrent confirmation of any
+        of them makes this one wait, then retry on the serialization
+        failure, instead of both confirming.
+        """
+        if not self:
+            return {}
+        Ledger = self.env['appointment.capacity.ledger']
+        self.flush_model(['state', 'staff_user_id', 'start_datetime', 'end_datetime'])
+        candidates = [
+            self.ids,
+            [b.staff_user_id.id or None for b in self],
+            [b.start_datetime for b in self],
+            [b.end_datetime for b in self],
+        ]
+        if not self._staff_exclusion_active():
+            self.env.cr.execute("""
+                SELECT b.id
+                  FROM appointment_booking b
+                  JOIN unnest(%s::int[], %s::int[], %s::timestamp[], %s::timestamp[])
+                       AS c(id, staff_user_id, start_datetime, end_datetime)
+                    ON b.id = c.id
+                    OR (b.staff_user_id = c.staff_user_id
+                        AND b.state != 'cancelled'
+                        AND b.start_datetime < c.end_datetime
+                        AND b.end_datetime > c.start_datetime)
+                 ORDER BY b.id
+                   FOR UPDATE OF b
+            """, candidates)
+        self.env.cr.execute("""
+            SELECT DISTINCT c.id
+              FROM unnest(%s::int[], %s::int[], %s::timestamp[], %s::timestamp[])
+                   AS c(id, staff_user_id, start_datetime, end_datetime)
+              JOIN appointment_booking b
+                ON b.staff_user_id = c.staff_user_id
+               AND b.state IN ('confirmed', 'done')
+               AND b.start_datetime < c.end_datetime
+               AND b.end_datetime > c.start_datetime
+               AND b.id != c.id
+        """, candidates)
+        staff_busy = {row[0] for row in self.env.cr.fetchall()}
+
+        # Location occupancy over the span of the batch, one locked read per location
+        booked = {}
+        for resource, resource_bookings in self.filtered('resource_id').grouped('resource_id').items():
+            booked[resource.id] = Ledger._get_booked_by_bucket(
+                resource.id,
+                min(resource_bookings.mapped('start_datetime')),
+                max(resource_bookings.mapped('end_datetime')),
+                lock=True,
+            )
+
+        conflicts = {}
+        accepted_staff = defaultdict(list)
+        bucket_step = timedelta(minutes=LEDGER_BUCKET_MINUTES)
+        for booking in self.sorted(lambda b: (b.start_datetime, b.id)):
+            staff_id = booking.staff_user_id.id
+            start_dt, end_dt = booking.start_datetime, booking.end_datetime
+            if staff_id and (booking.id in staff_busy or any(
+                s < end_dt and e > start_dt for s, e in accepted_staff[staff_id]
+            )):
+                conflicts[booking.id] = _('Staff member is already booked for this time slot.')
+                continue
+            buckets = []
+            if booking.resource_id:
+                first, last = Ledger._bucket_bounds(start_dt, end_dt)
+                while first <= last:
+                    buckets.append(first)
+                    first += bucket_step
+                resource_booked = booked[booking.resource_id.id]
+                peak = max(resource_booked.get(bucket, 0) for bucket in buckets)
+                if peak >= (booking.resource_id.capacity or 1):
+                    conflicts[booking.id] = _('Location is fully booked for this time slot.')
+                    continue
+                for bucket in buckets:
+                    resource_booked[bucket] = resource_booked.get(bucket, 0) + booking.guest_count
+            if staff_id:
+                accepted_staff[staff_id].append((start_dt, end_dt))
+        return conflicts
+
+    def _run_confirm_side_effects(self):
+        """Deferred part of action_confirm: Discuss channel, calendar event and email."""
+        bookings = self.filtered(lambda b: b.state == 'confirmed')  # Not cancelled meanwhile
+        bookings._create_discuss_channels()
+        bookings._create_calendar_events()
+        bookings._send_confirmation_emails()
+
+    def _enqueue_job(self, job_type):
+        """Queue a side effect of these bookings for the job worker."""
+        return self.env['appointment.booking.job']._enqueue(self, job_type)
 
     def action_done(self):
         """Mark booking as done"""
@@ -331,48 +748,98 @@ class AppointmentBooking(models.Model):
         return True
 
     def action_cancel(self):
-        """Cancel the booking"""
-        for booking in self:
-            if booking.state in ['draft', 'pending_payment', 'confirmed']:
-                # Check cancellation deadline
-                appointment_type = booking.appointment_type_id
-                if appointment_type.cancel_before_hours > 0:
-                    cancel_deadline = booking.start_datetime - timedelta(hours=appointment_type.cancel_before_hours)
-                    if fields.Datetime.now() > cancel_deadline:
-                        raise UserError(_(
-                            'Cancellation is only allowed until %s hours before the appointment.',
-                            appointment_type.cancel_before_hours
-                        ))
-
-                # Cancel calendar event
-                if booking.calendar_event_id:
-                    booking.calendar_event_id.unlink()
-
-                # Cancel linked sale order (if no paid invoice)
-                if booking.sale_order_id and booking.sale_order_id.state in ('draft', 'sent', 'sale'):
-                    has_paid_invoice = any(
-                        inv.payment_state in ('paid', 'in_payment')
-                        for inv in booking.sale_order_id.invoice_ids
-                    )
-                    if not has_paid_invoice:
-                        booking.sale_order_id.sudo()._action_cancel()
-
-                # Archive Discuss channel
-                if booking.discuss_channel_id and booking.discuss_channel_id.active:
-                    booking.discuss_channel_id.message_post(
-                        body=_("This booking has been cancelled. The discussion is now archived."),
-                        message_type='notification',
-                        subtype_xmlid='mail.mt_comment',
-                    )
-                    booking.discuss_channel_id.sudo().write({'active': False})
-
-                booking.write({'state': 'cancelled'})
-
-                # Send cancellation email
-                booking._send_cancellation_email()
+        """Cancel the bookings.
 
+        A single booking that cannot be cancelled raises a UserError. When
+        several bookings are cancelled at once, the blocked ones are skipped.
+        """
+        report = self._cancel_batch()
+        if len(self) == 1 and report['skipped']:
+            raise UserError(report['skipped'][0][1])
         return True
 
+    def action_mass_cancel(self):
+        """Cancel the selected bookings and report the skipped ones"""
+        report = self._cancel_batch()
+        return self._batch_report_notification(
+            _('Bookings Cancelled'),
+            _('%d booking(s) cancelled.', len(report['done'])),
+            report['skipped'],
+        )
+
+    def _cancel_batch(self, check_deadline=True):
+        """Cancel these bookings as one set operation.
+
+        Every teardown step runs once for the whole recordset: calendar events
+        are unlinked together, unpaid sale orders cancelled together, Discuss
+        channels notified and archived together, the state written once and
+        the cancellation mails rendered in one batch. The outcome of each
+        booking is logged in its chatter.
+
+        ``check_deadline=False`` bypasses the cancellation deadline, for
+        cancellations decided by the business (e.g. a closing day).
+
+        Returns {'done': cancelled bookings, 'skipped': [(booking, reason)]}.
+        Bookings that are already done or cancelled are left out silently.
+        """
+        skipped = []
+        bookings = self.browse()
+        now = fields.Datetime.now()
+        for booking in self.filtered(lambda b: b.state in ('draft', 'pending_payment', 'confirmed')):
+            # Check cancellation deadline
+            appointment_type = booking.appointment_type_id
+            if (check_deadline and appointment_type.cancel_before_hours > 0
+                    and now > booking.start_datetime - timedelta(hours=appointment_type.cancel_before_hours)):
+                skipped.append((booking, _(
+                    'Cancellation is only allowed until %s hours before the appointment.',
+                    appointment_type.cancel_before_hours
+                )))
+            else:
+                bookings |= booking
+        if not bookings:
+            return {'done': bookings, 'skipped': skipped}
+
+        outcomes = {booking.id: [_('Booking cancelled.')] for booking in bookings}
+
+        # Cancel calendar events
+        events = bookings.calendar_event_id
+        if events:
+            events.unlink()
+
+        # Cancel linked sale orders (if no paid invoice)
+        orders = bookings.sale_order_id.filtered(lambda o: o.state in ('draft', 'sent', 'sale'))
+        paid_orders = orders.filtered(lambda o: any(
+            inv.payment_state in ('paid', 'in_payment') for inv in o.invoice_ids
+        ))
+        if orders - paid_orders:
+            (orders - paid_orders).sudo()._action_cancel()
+        for booking in bookings.filtered('sale_order_id'):
+            if booking.sale_order_id in paid_orders:
+                outcomes[booking.id].append(_('Sale order %s kept: it has a paid invoice.', booking.sale_order_id.name))
+            elif booking.sale_order_id in orders:
+                outcomes[booking.id].append(_('Sale order %s cancelled.', booking.sale_order_id.name))
+
+        # Archive Discuss channels
+        channels = bookings.discuss_channel_id.filtered('active')
+        if channels:
+            for channel in channels.sudo():
+                channel.message_post(
+                    body=_("This booking has been cancelled. The discussion is now archived."),
+                    message_type='notification',
+                    subtype_xmlid='mail.mt_comment',
+                )
+            channels.sudo().write({'active': False})
+
+        bookings.write({'state': 'cancelled'})
+        bookings._message_log_batch({
+            booking_id: Markup('<br/>').join(lines) for booking_id, lines in outcomes.items()
+        })
+
+        # Send cancellation emails
+        bookings._send_cancellation_emails()
+
+        return {'done': bookings, 'skipped': skipped}
+
     def action_draft(self):
         """Reset to draft (only from cancelled state)"""
         for booking in self:
@@ -399,54 +866,61 @@ class AppointmentBooking(models.Model):
         self.ensure_one()
         if self.discuss_channel_id:
             return self.discuss_channel_id
+        self._create_discuss_channels()
+        return self.discuss_channel_id
 
-        # Only create channels for online appointments
-        if self.appointment_type_id.location_type != 'online':
-            return self.env['discuss.channel']
+    def _create_discuss_channels(self):
+        """Create the missing Discuss channels of these bookings in one batch.
 
-        # Soft-couple: only create if cs_portal_discuss is installed
-        installed = self.env['ir.module.module'].sudo().search([
-            ('name', '=', 'cs_portal_discuss'),
-            ('state', '=', 'installed'),
-        ], limit=1)
-        if not installed:
+        Only online appointments get a channel, and only when cs_portal_discuss
+        is installed (checked against the cached module capabilities).
+        """
+        if not self.env['ir.module.module']._has_appointment_capability('portal_discuss'):
+            return self.env['discuss.channel']
+        bookings = self.filtered(
+            lambda b: not b.discuss_channel_id and b.appointment_type_id.location_type == 'online'
+        )
+        if not bookings:
             return self.env['discuss.channel']
-
-        # Determine members: staff + guest
-        member_ids = []
-        staff_partner = self.staff_user_id.partner_id if self.staff_user_id else self.env.user.partner_id
-        member_ids.append(staff_partner.id)
-        if self.partner_id and self.partner_id.id != staff_partner.id:
-            member_ids.append(self.partner_id.id)
 
         # group_public_id = portal group so cs_portal_discuss includes it in /my/discussions
         portal_group = self.env.ref('base.group_portal', raise_if_not_found=False)
-        channel_vals = {
-            'name': f"{self.appointment_type_id.name} - {self.guest_name} ({self.name})",
-            'channel_type': 'channel',
-            'channel_member_ids': [
-                (0, 0, {'partner_id': pid}) for pid in member_ids
-            ],
-        }
-        if portal_group:
-            channel_vals['group_public_id'] = portal_group.id
-        channel = self.env['discuss.channel'].sudo().create(channel_vals)
-
-        # Post welcome message
-        start_dt = fields.Datetime.context_timestamp(self, self.start_datetime)
-        channel.message_post(
-            body=_(
-                "Appointment scheduled for %(date)s at %(time)s.\n"
-                "Use the call button above to start your video meeting.",
-                date=start_dt.strftime('%Y-%m-%d'),
-                time=start_dt.strftime('%H:%M'),
-            ),
-            message_type='notification',
-            subtype_xmlid='mail.mt_comment',
-        )
-
-        self.discuss_channel_id = channel
-        return channel
+        vals_list = []
+        for booking in bookings:
+            # Determine members: staff + guest
+            member_ids = []
+            staff_partner = booking.staff_user_id.partner_id if booking.staff_user_id else self.env.user.partner_id
+            member_ids.append(staff_partner.id)
+            if booking.partner_id and booking.partner_id.id != staff_partner.id:
+                member_ids.append(booking.partner_id.id)
+
+            channel_vals = {
+                'name': f"{booking.appointment_type_id.name} - {booking.guest_name} ({booking.name})",
+                'channel_type': 'channel',
+                'channel_member_ids': [
+                    (0, 0, {'partner_id': pid}) for pid in member_ids
+                ],
+            }
+            if portal_group:
+                channel_vals['group_public_id'] = portal_group.id
+            vals_list.append(channel_vals)
+        channels = self.env['discuss.channel'].sudo().create(vals_list)
+
+        for booking, channel in zip(bookings, channels):
+            # Post welcome message
+            start_dt = fields.Datetime.context_timestamp(booking, booking.start_datetime)
+            channel.message_post(
+                body=_(
+                    "Appointment scheduled for %(date)s at %(time)s.\n"
+                    "Use the call button above to start your video meeting.",
+                    date=start_dt.strftime('%Y-%m-%d'),
+                    time=start_dt.strftime('%H:%M'),
+                ),
+                message_type='notification',
+                subtype_xmlid='mail.mt_comment',
+            )
+            booking.discuss_channel_id = channel
+        return channels
 
     def _create_calendar_event(self):
         """Create a calendar event for this booking.
@@ -458,7 +932,22 @@ class AppointmentBooking(models.Model):
         self.ensure_one()
         if self.calendar_event_id:
             return self.calendar_event_id
+        return self._create_calendar_events()
+
+    def _create_calendar_events(self):
+        """Create the missing calendar events of these bookings in one batch."""
+        bookings = self.filtered(lambda b: not b.calendar_event_id)
+        if not bookings:
+            return self.env['calendar.event']
+        events = self.env['calendar.event'].create([
+            booking._prepare_calendar_event_vals() for booking in bookings
+        ])
+        for booking, event in zip(bookings, events):
+            booking.calendar_event_id = event
+        return events
 
+    def _prepare_calendar_event_vals(self):
+        self.ensure_one()
         event_vals = {
             'name': f'{self.appointment_type_id.name} - {self.guest_name}',
             'start': self.start_datetime,
@@ -481,10 +970,7 @@ class AppointmentBooking(models.Model):
                 event_vals['access_token'] = access_token
                 base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
                 event_vals['videocall_location'] = f"{base_url}/calendar/join_videocall/{access_token}"
-
-        event = self.env['calendar.event'].create(event_vals)
-        self.calendar_event_id = event
-        return event
+        return event_vals
 
     def _get_event_description(self):
         """Generate event description"""
@@ -509,6 +995,20 @@ class AppointmentBooking(models.Model):
         if template and self.guest_email:
             template.send_mail(self.id, force_send=False)
 
+    def _send_confirmation_emails(self):
+        """Queue the confirmation emails of these bookings, rendered in one batch"""
+        template = self.env.ref('reservation_module.email_template_booking_confirmed', raise_if_not_found=False)
+        recipients = self.filtered('guest_email')
+        if template and recipients:
+            template.send_mail_batch(recipients.ids, force_send=False)
+
+    def _send_cancellation_emails(self):
+        """Queue the cancellation emails of these bookings, rendered in one batch"""
+        template = self.env.ref('reservation_module.email_template_booking_cancelled', raise_if_not_found=False)
+        recipients = self.filtered('guest_email')
+        if template and recipients:
+            template.send_mail_batch(recipients.ids, force_send=False)
+
     def _send_cancellation_email(self):
         """Send cancellation email to the guest"""
         self.ensure_one()
@@ -573,56 +1073,90 @@ class AppointmentBooking(models.Model):
             subtype_xmlid='mail.mt_note',
         )
 
+    def _schedule_reminders(self):
+        """Wake the reminder cron up when the earliest pending reminder of these bookings is due."""
+        now = fields.Datetime.now()
+        due_times = [
+            booking.reminder_due_at for booking in self
+            if booking.state == 'confirmed' and not booking.reminder_sent
+            and booking.reminder_due_at and booking.start_datetime > now
+        ]
+        if due_times:
+            cron = self.env.ref('reservation_module.ir_cron_send_booking_reminders', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger(at=max(min(due_times), now))
+
     @api.model
-    def _cron_send_reminders(self):
+    def _cron_send_reminders(self, batch_size=REMINDER_BATCH_SIZE):
         """Cron job: send reminder emails for upcoming confirmed bookings.
 
-        Looks for confirmed bookings starting within the next reminder_hours window
-        that haven't been reminded yet (reminder_sent=False).
+        Claims up to ``batch_size`` confirmed bookings whose reminder_due_at
+        has passed and that haven't been reminded yet, in a single
+        UPDATE ... RETURNING, and renders the reminders in one batch.
 
-        M7 fix: 使用 SELECT FOR UPDATE SKIP LOCKED 確保並發 cron 不會重複發送，
-        並在每筆提醒後 commit 避免大批量回滾。
+        M7 fix: 以 FOR UPDATE SKIP LOCKED 認領，並發 cron 不會重複發送。
+        The remaining backlog is reported to ir.cron, which commits and calls
+        again until it is drained. Once drained the cron is triggered again
+        at the next due time; its own interval is only a daily safety net.
+        """
+        self.flush_model(['state', 'reminder_sent', 'start_datetime', 'reminder_due_at'])
+        due_where = """
+            state = 'confirmed'
+            AND reminder_sent IS NOT TRUE
+            AND reminder_due_at <= %(now)s
+            AND start_datetime > %(now)s
         """
         now = fields.Datetime.now()
-        bookings = self.search([
-            ('state', '=', 'confirmed'),
-            ('reminder_sent', '=', False),
-            ('start_datetime', '>', now),
-        ])
-        for booking in bookings:
-            reminder_hours = booking.appointment_type_id.reminder_hours or 24
-            reminder_threshold = booking.start_datetime - timedelta(hours=reminder_hours)
-            if now >= reminder_threshold:
-                # Atomic lock: skip if another cron worker already locked this row
-                self.env.cr.execute(
-                    "SELECT id FROM appointment_booking "
-                    "WHERE id = %s AND reminder_sent = FALSE "
-                    "FOR UPDATE SKIP LOCKED",
-                    [booking.id],
-                )
-                if not self.env.cr.fetchone():
-                    continue  # Already being processed by another worker
-                booking._send_reminder_email()
-                booking.reminder_sent = True
+        params = {'now': now, 'limit': batch_size}
+        self.env.cr.execute(f"""
+            UPDATE appointment_booking
+               SET reminder_sent = TRUE
+             WHERE id IN (
+                    SELECT id
+                      FROM appointment_booking
+                     WHERE {due_where}
+                     ORDER BY reminder_due_at
+                     LIMIT %(limit)s
+                       FOR UPDATE SKIP LOCKED
+             )
+         RETURNING id
+        """, params)
+        bookings = self.browse([row[0] for row in self.env.cr.fetchall()])
+        bookings.invalidate_recordset(['reminder_sent'])
+
+        template = self.env.ref('reservation_module.email_template_booking_reminder', raise_if_not_found=False)
+        recipients = bookings.filtered('guest_email')
+        if template and recipients:
+            template.send_mail_batch(recipients.ids, force_send=False)
+
+        self.env.cr.execute(f"SELECT COUNT(*) FROM appointment_booking WHERE {due_where}", params)
+        remaining = self.env.cr.fetchone()[0]
+        self.env['ir.cron']._notify_progress(done=len(bookings), remaining=remaining)
+
+        if not remaining:
+            self.env.cr.execute("""
+                SELECT MIN(reminder_due_at)
+                  FROM appointment_booking
+                 WHERE state = 'confirmed'
+                   AND reminder_sent IS NOT TRUE
+                   AND reminder_due_at > %(now)s
+            """, params)
+            next_due = self.env.cr.fetchone()[0]
+            cron = self.env.ref('reservation_module.ir_cron_send_booking_reminders', raise_if_not_found=False)
+            if next_due and cron:
+                cron._trigger(at=next_due)
 
     def _auto_assign_staff(self):
-        """Auto-assign staff with least bookings this month, filtering out conflicting staff first"""
+        """Auto-assign a free staff member following the type's assignment policy"""
         self.ensure_one()
         appointment_type = self.appointment_type_id
         if not appointment_type.staff_user_ids:
             return
 
+        staff_ids = appointment_type.staff_user_ids.ids
+        stats = self._get_staff_assignment_stats(staff_ids)
         # Filter to staff who are NOT conflicting at this exact time slot (cross-type check)
-        available_staff_ids = []
-        for staff in appointment_type.staff_user_ids:
-            conflict = self.env['appointment.booking']._check_booking_conflict(
-                start_dt=self.start_datetime,
-                end_dt=self.end_datetime,
-                staff_user_id=staff.id,
-                exclude_booking_id=self.id,
-            )
-            if not conflict['staff_conflict']:
-                available_staff_ids.append(staff.id)
+        available_staff_ids = [uid for uid in staff_ids if not stats[uid]['conflicts']]
 
         if not available_staff_ids:
             _logger.warning(
@@ -630,77 +1164,181 @@ class AppointmentBooking(models.Model):
                 "All %d staff members have conflicts.",
                 self.name, appointment_type.name,
                 self.start_datetime, self.end_datetime,
-                len(appointment_type.staff_user_ids),
+                len(staff_ids),
             )
             return
 
-        # Among available staff, pick the one with fewest bookings this month
-        month_start = self.start_datetime.replace(day=1, hour=0, minute=0, second=0)
+        policy = appointment_type.staff_assignment_policy or 'least_loaded_month'
+        self.staff_user_id = min(
+            available_staff_ids,
+            key=lambda uid: self._staff_assignment_key(policy, stats[uid]),
+        )
+
+    def _assignment_periods(self):
+        """(month_start, month_end, week_start, week_end) around the booking start"""
+        month_start = self.start_datetime.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         if month_start.month == 12:
             month_end = month_start.replace(year=month_start.year + 1, month=1)
         else:
             month_end = month_start.replace(month=month_start.month + 1)
+        day_start = self.start_datetime.replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = day_start - timedelta(days=day_start.weekday())
+        return month_start, month_end, week_start, week_start + timedelta(days=7)
 
-        bookings = self.env['appointment.booking'].search([
-            ('start_datetime', '>=', month_start),
-            ('start_datetime', '<', month_end),
-            ('state', 'in', ['confirmed', 'done']),
-            ('staff_user_id', 'in', available_staff_ids),
-        ])
+    def _get_staff_assignment_stats(self, staff_ids):
+        """Conflicts and load of every candidate staff member in one query.
 
-        staff_counts = {uid: 0 for uid in available_staff_ids}
-        for booking in bookings:
-            if booking.staff_user_id:
-                staff_counts[booking.staff_user_id.id] = staff_counts.get(booking.staff_user_id.id, 0) + 1
+        Returns {staff_id: {'conflicts', 'month_load', 'week_load', 'last_assigned'}}.
+        Only confirmed/done bookings are counted, across all appointment types;
+        ``last_assigned`` is the latest such booking of this appointment type.
+        """
+        self.ensure_one()
+        month_start, month_end, week_start, week_end = self._assignment_periods()
+        round_robin = self.appointment_type_id.staff_assignment_policy == 'round_robin'
+        self.env.cr.execute("""
+            SELECT staff.id,
+                   COUNT(b.id) FILTER (WHERE b.start_datetime < %(end)s AND b.end_datetime > %(start)s),
+                   COUNT(b.id) FILTER (WHERE b.start_datetime >= %(month_start)s AND b.start_datetime < %(month_end)s),
+                   COUNT(b.id) FILTER (WHERE b.start_datetime >= %(week_start)s AND b.start_datetime < %(week_end)s),
+                   MAX(b.create_date) FILTER (WHERE b.appointment_type_id = %(type_id)s)
+              FROM unnest(%(staff_ids)s) AS staff(id)
+              LEFT JOIN appointment_booking b
+                ON b.staff_user_id = staff.id
+               AND b.state IN ('confirmed', 'done')
+               AND b.id != %(booking_id)s
+               AND (
+                    (b.start_datetime < %(end)s AND b.end_datetime > %(start)s)
+                    OR (b.start_datetime >= %(range_start)s AND b.start_datetime < %(range_end)s)
+                    OR (%(round_robin)s AND b.appointment_type_id = %(type_id)s)
+               )
+             GROUP BY staff.id
+        """, {
+            'staff_ids': list(staff_ids),
+            'booking_id': self.id or 0,
+            'type_id': self.appointment_type_id.id,
+            'start': self.start_datetime,
+            'end': self.end_datetime,
+            'month_start': month_start,
+            'month_end': month_end,
+            'week_start': week_start,
+            'week_end': week_end,
+            'range_start': min(month_start, week_start),
+            'range_end': max(month_end, week_end),
+            'round_robin': round_robin,
+        })
+        return {
+            staff_id: {
+                'conflicts': conflicts,
+                'month_load': month_load,
+                'week_load': week_load,
+                'last_assigned': last_assigned,
+            }
+            for staff_id, conflicts, month_load, week_load, last_assigned in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _staff_assignment_key(self, policy, stats):
+        """Sort key of a free staff member, the lowest is assigned.
 
-        # Pick staff with fewest bookings
-        best_staff_id = min(staff_counts, key=staff_counts.get)
-        self.staff_user_id = best_staff_id
+        Override to add policies; ties go to the first staff member of the type.
+        """
+        if policy == 'round_robin':
+            # Never assigned first, then the longest since the last assignment
+            return (stats['last_assigned'] or datetime.min,)
+        if policy == 'least_loaded_week':
+            return (stats['week_load'], stats['month_load'])
+        return (stats['month_load'],)
 
     def _auto_assign_location(self):
-        """Auto-assign location with least bookings this month, filtering out full locations first"""
+        """Auto-assign a location with remaining capacity following the type's assignment policy"""
         self.ensure_one()
         appointment_type = self.appointment_type_id
         if not appointment_type.resource_ids:
             return
 
+        resource_ids = appointment_type.resource_ids.ids
+        stats = self._get_location_assignment_stats(resource_ids)
         # Filter to resources with remaining capacity at this time slot (cross-type check)
-        available_resource_ids = []
-        for resource in appointment_type.resource_ids:
-            conflict = self.env['appointment.booking']._check_booking_conflict(
-                start_dt=self.start_datetime,
-                end_dt=self.end_datetime,
-                resource_id=resource.id,
-                exclude_booking_id=self.id,
-            )
-            if not conflict['resource_conflict']:
-                available_resource_ids.append(resource.id)
+        available_resource_ids = [rid for rid in resource_ids if stats[rid]['remaining'] > 0]
 
         if not available_resource_ids:
             return  # No available locations for this time slot
 
-        # Among available resources, pick the one with fewest bookings this month
-        month_start = self.start_datetime.replace(day=1, hour=0, minute=0, second=0)
-        if month_start.month == 12:
-            month_end = month_start.replace(year=month_start.year + 1, month=1)
-        else:
-            month_end = month_start.replace(month=month_start.month + 1)
+        policy = appointment_type.location_assignment_policy or 'least_loaded_month'
+        self.resource_id = min(
+            available_resource_ids,
+            key=lambda rid: self._location_assignment_key(policy, stats[rid]),
+        )
 
-        bookings = self.env['appointment.booking'].search([
-            ('start_datetime', '>=', month_start),
-            ('start_datetime', '<', month_end),
-            ('state', 'in', ['confirmed', 'done']),
-            ('resource_id', 'in', available_resource_ids),
-        ])
+    def _get_location_assignment_stats(self, resource_ids):
+        """Remaining capacity and load of every candidate location in one query.
 
-        resource_counts = {rid: 0 for rid in available_resource_ids}
-        for booking in bookings:
-            if booking.resource_id:
-                resource_counts[booking.resource_id.id] = resource_counts.get(booking.resource_id.id, 0) + 1
+        Returns {resource_id: {'capacity', 'remaining', 'month_load', 'guest_count'}}. The
+        remaining capacity is read from the capacity ledger, without this
+        booking's own share, and ``month_load`` counts the confirmed/done
+        bookings starting this month.
+        """
+        self.ensure_one()
+        Ledger = self.env['appointment.capacity.ledger']
+        first, last = Ledger._bucket_bounds(self.start_datetime, self.end_datetime)
+        own_resource_id, own_first, own_last, own_guests = 0, first, last, 0
+        for resource_id, start_dt, end_dt, guests in self._capacity_ledger_entries():
+            own_first, own_last = Ledger._bucket_bounds(start_dt, end_dt)
+            own_resource_id, own_guests = resource_id, guests
+        month_start, month_end = self._assignment_periods()[:2]
+        self.env.cr.execute("""
+            SELECT r.id,
+                   COALESCE(NULLIF(r.capacity, 0), 1),
+                   (SELECT COALESCE(MAX(l.booked_guests - CASE
+                               WHEN l.resource_id = %(own_resource_id)s
+                                AND l.bucket_start BETWEEN %(own_first)s AND %(own_last)s
+                               THEN %(own_guests)s ELSE 0 END), 0)
+                      FROM appointment_capacity_ledger l
+                     WHERE l.resource_id = r.id
+                       AND l.bucket_start BETWEEN %(first)s AND %(last)s),
+                   (SELECT COUNT(*)
+                      FROM appointment_booking b
+                     WHERE b.resource_id = r.id
+                       AND b.state IN ('confirmed', 'done')
+                       AND b.start_datetime >= %(month_start)s AND b.start_datetime < %(month_end)s
+                       AND b.id != %(booking_id)s)
+              FROM resource_resource r
+             WHERE r.id = ANY(%(resource_ids)s)
+        """, {
+            'resource_ids': list(resource_ids),
+            'booking_id': self.id or 0,
+            'first': first,
+            'last': last,
+            'own_resource_id': own_resource_id,
+            'own_first': own_first,
+            'own_last': own_last,
+            'own_guests': own_guests,
+            'month_start': month_start,
+            'month_end': month_end,
+        })
+        return {
+            resource_id: {
+                'capacity': capacity,
+                'remaining': max(0, capacity - booked),
+                'month_load': month_load,
+                'guest_count': self.guest_count,
+            }
+            for resource_id, capacity, booked, month_load in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _location_assignment_key(self, policy, stats):
+        """Sort key of a location with remaining capacity, the lowest is assigned.
 
-        # Pick resource with fewest bookings
-        best_resource_id = min(resource_counts, key=resource_counts.get)
-        self.resource_id = best_resource_id
+        Override to add policies; ties go to the first location of the type.
+        """
+        if policy == 'best_fit':
+            if stats['remaining'] >= stats['guest_count']:
+                # Smallest remaining space that still seats the whole party
+                return (0, stats['remaining'], stats['capacity'], stats['month_load'])
+            # Nothing fits: keep the party as together as possible
+            return (1, -stats['remaining'], stats['month_load'])
+        return (stats['month_load'],)
 
     def get_portal_url(self):
         """Get the portal URL for this booking"""
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models, tools
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Booking method run by each job type
+JOB_METHODS = {
+    'confirm': '_run_confirm_side_effects',
+    'created_email': '_send_booking_created_email',
+}
+
+# Jobs run per cron call
+JOB_BATCH_SIZE = 50
+
+# Delay before the n-th retry, the last value repeats
+JOB_RETRY_MINUTES = [1, 5, 15, 60, 240]
+
+
+class AppointmentBookingJob(models.Model):
+    """Side effect of a booking run out of band by a cron worker.
+
+    The public booking flow only reserves the slot; Discuss channel, calendar
+    event and emails are queued here and retried with backoff when they fail.
+    """
+    _name = 'appointment.booking.job'
+    _description = 'Appointment Booking Job'
+    _order = 'id desc'
+
+    booking_id = fields.Many2one(
+        'appointment.booking',
+        string='Booking',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    job_type = fields.Selection([
+        ('confirm', 'Confirmation Follow-up'),
+        ('created_email', 'Booking Received Email'),
+    ], string='Job', required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True)
+    attempts = fields.Integer('Attempts', default=0)
+    max_attempts = fields.Integer('Max Attempts', default=5)
+    next_run_at = fields.Datetime('Next Run', default=fields.Datetime.now)
+    done_at = fields.Datetime('Done At')
+    last_error = fields.Text('Last Error')
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Cron worker: pending jobs by due time
+        tools.create_index(
+            self.env.cr, 'appointment_booking_job_pending_index', self._table,
+            ['next_run_at'],
+            where="state = 'pending'",
+        )
+        return res
+
+    @api.model
+    def _enqueue(self, bookings, job_type):
+        """Queue a ``job_type`` job for each booking and wake the worker up."""
+        jobs = self.sudo().create([
+            {'booking_id': booking.id, 'job_type': job_type}
+            for booking in bookings
+        ])
+        jobs._trigger_worker()
+        return jobs
+
+    def _trigger_worker(self, at=None):
+        cron = self.env.ref('reservation_module.ir_cron_run_booking_jobs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger(at=at)
+
+    def _run(self):
+        self.ensure_one()
+        getattr(self.booking_id, JOB_METHODS[self.job_type])()
+
+    @api.model
+    def _cron_run_jobs(self, batch_size=JOB_BATCH_SIZE):
+        """Cron job: run the due pending jobs, retrying failures with backoff.
+
+        Each job runs in its own savepoint, so a failing side effect leaves
+        nothing half done. The remaining backlog is reported to ir.cron,
+        which commits and calls again until it is drained.
+        """
+        self.flush_model(['state', 'next_run_at'])
+        now = fields.Datetime.now()
+        self.env.cr.execute(f"""
+            SELECT id FROM {self._table}
+             WHERE state = 'pending' AND next_run_at <= %s
+             ORDER BY next_run_at, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [now, batch_size])
+        jobs = self.browse([row[0] for row in self.env.cr.fetchall()])
+
+        for job in jobs:
+            attempts = job.attempts + 1
+            try:
+                with self.env.cr.savepoint():
+                    job._run()
+            except Exception as e:
+                _logger.warning(
+                    "Booking job %s (%s, booking %s) failed, attempt %d/%d: %s",
+                    job.id, job.job_type, job.booking_id.id, attempts, job.max_attempts, e,
+                )
+                vals = {'attempts': attempts, 'last_error': str(e)}
+                if attempts >= job.max_attempts:
+                    vals['state'] = 'failed'
+                else:
+                    delay = JOB_RETRY_MINUTES[min(attempts, len(JOB_RETRY_MINUTES)) - 1]
+                    vals['next_run_at'] = now + timedelta(minutes=delay)
+                job.write(vals)
+            else:
+                job.write({
+                    'state': 'done',
+                    'attempts': attempts,
+                    'done_at': fields.Datetime.now(),
+                    'last_error': False,
+                })
+
+        self.flush_model(['state', 'next_run_at'])
+        self.env.cr.execute(f"""
+            SELECT COUNT(*) FILTER (WHERE next_run_at <= %s), MIN(next_run_at)
+              FROM {self._table}
+             WHERE state = 'pending'
+        """, [now])
+        remaining, next_run_at = self.env.cr.fetchone()
+        self.env['ir.cron']._notify_progress(done=len(jobs), remaining=remaining)
+        if not remaining and next_run_at:
+            self._trigger_worker(at=next_run_at)
+
+    def action_retry(self):
+        """Run failed jobs again"""
+        self.write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_run_at': fields.Datetime.now(),
+        })
+        self._trigger_worker()
+        return True
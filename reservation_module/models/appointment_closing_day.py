@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
 
@@ -29,3 +29,38 @@ class AppointmentClosingDay(models.Model):
         for record in self:
             if record.date < fields.Date.today():
                 raise ValidationError(_('Closing day date cannot be in the past.'))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache('appointment_type_id')
+    def _get_closed_dates(self, appointment_type_id):
+        """Closing days of an appointment type as {date: reason}.
+
+        Loaded once and kept in the ORM cache, so date checks and month masks
+        need no query; changes to closing days clear it on every worker.
+        Past dates are kept: the database date is not the local date of the
+        appointment type, filtering on it could drop the local today.
+        """
+        # Pending writes must reach the table before it is read and cached
+        self.flush_model(['appointment_type_id', 'date', 'name'])
+        self.env.cr.execute("""
+            SELECT date, name
+              FROM appointment_closing_day
+             WHERE appointment_type_id = %s
+        """, [appointment_type_id])
+        return tools.frozendict((date, name or '') for date, name in self.env.cr.fetchall())
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Claims only guard concurrent submissions, they are pruned after this
+GUEST_CLAIM_RETENTION = timedelta(days=1)
+
+
+class AppointmentGuestClaim(models.Model):
+    """Claim of a normalized email address by a guest partner creation.
+
+    Booking requests take the claim of the address before creating its
+    partner. Concurrent requests for the same guest collide on the unique
+    email: under repeatable read, the loser gets a serialization failure and
+    the request is retried with a fresh snapshot, where it finds the partner
+    created by the winner. Claims are only needed while requests overlap,
+    the table is UNLOGGED and pruned daily.
+    """
+    _name = 'appointment.guest.claim'
+    _description = 'Appointment Guest Partner Claim'
+    _log_access = False
+
+    email_normalized = fields.Char('Normalized Email', required=True)
+    claimed_at = fields.Datetime('Claimed At', required=True)
+
+    _sql_constraints = [
+        ('email_normalized_uniq', 'unique(email_normalized)',
+         'Only one claim per email address.'),
+    ]
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        self.env.cr.execute("SELECT relpersistence FROM pg_class WHERE relname = %s", [self._table])
+        row = self.env.cr.fetchone()
+        if row and row[0] != 'u':
+            self.env.cr.execute(f"ALTER TABLE {self._table} SET UNLOGGED")
+        return res
+
+    @api.model
+    def _claim(self, email_normalized):
+        """Claim an address for this transaction, serializing concurrent claimers."""
+        self.env.cr.execute(f"""
+            INSERT INTO {self._table} (email_normalized, claimed_at)
+            VALUES (%s, %s)
+            ON CONFLICT (email_normalized)
+            DO UPDATE SET claimed_at = EXCLUDED.claimed_at
+        """, [email_normalized, fields.Datetime.now()])
+
+    @api.model
+    def _cron_prune(self):
+        """Cron job: drop the claims past the retention period."""
+        self.env.cr.execute(
+            f"DELETE FROM {self._table} WHERE claimed_at < %s",
+            [fields.Datetime.now() - GUEST_CLAIM_RETENTION],
+        )
+        _logger.info("Pruned %d guest partner claims", self.env.cr.rowcount)
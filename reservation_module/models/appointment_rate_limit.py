@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from datetime import timedelta
+import logging
+import random
+
+from ..tools.transaction import autonomous_cursor
+
+_logger = logging.getLogger(__name__)
+
+# Counters older than this are pruned, keep it above the longest window
+RATE_LIMIT_RETENTION = timedelta(days=1)
+
+# Default limits as (hits, window in minutes), overridable by the system
+# parameters ``reservation_module.rate_limit.<scope>`` set to "hits/minutes"
+RATE_LIMIT_DEFAULTS = {
+    'booking_ip': (20, 60),      # Booking form submissions per IP address
+    'json_ip': (120, 1),         # Slot/date JSON calls per IP address
+}
+
+# Counter rows per key and bucket: concurrent hits of one key mostly land
+# on different rows, so they rarely wait for each other
+RATE_LIMIT_SHARDS = 8
+
+
+class AppointmentRateLimit(models.Model):
+    """Hit counters of the public endpoints, per key and time bucket.
+
+    Keys look like ``booking:<type>:email:<address>``, ``booking:ip:<address>``
+    or ``json:ip:<address>``; each attempt upserts its bucket and reads the
+    window back in one statement, so throttling needs no scan of the booking
+    table and the limit holds across every worker. The table is UNLOGGED:
+    counters are cheap to write and losing them on a crash only resets the
+    windows.
+
+    Hits are written in a transaction of their own, committed at once: they
+    count even when the request fails, and concurrent requests of one
+    address never make each other's transaction retry. Each bucket is split
+    over ``RATE_LIMIT_SHARDS`` rows picked at random, summed on read.
+    """
+    _name = 'appointment.rate.limit'
+    _description = 'Appointment Rate Limit Counter'
+    _log_access = False
+
+    key = fields.Char('Key', required=True)
+    bucket_start = fields.Datetime('Bucket Start', required=True)
+    shard = fields.Integer('Shard', required=True, default=0)
+    hits = fields.Integer('Hits', default=0)
+
+    _sql_constraints = [
+        ('key_bucket_uniq', 'unique(key, bucket_start, shard)',
+         'Only one counter per key, time bucket and shard.'),
+    ]
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        self.env.cr.execute("SELECT relpersistence FROM pg_class WHERE relname = %s", [self._table])
+        row = self.env.cr.fetchone()
+        if row and row[0] != 'u':
+            self.env.cr.execute(f"ALTER TABLE {self._table} SET UNLOGGED")
+        return res
+
+    @api.model
+    def _get_limit(self, scope):
+        """(hits, window minutes) of a scope, from the system parameters or the defaults."""
+        value = self.env['ir.config_parameter'].sudo().get_param(f'reservation_module.rate_limit.{scope}')
+        if value:
+            try:
+                hits, minutes = (int(part) for part in value.split('/'))
+                return hits, minutes
+            except ValueError:
+                _logger.warning("Invalid rate limit %r for %s, using the default", value, scope)
+        return RATE_LIMIT_DEFAULTS[scope]
+
+    @api.model
+    def _hit(self, key, limit, window_minutes):
+        """Count an attempt for ``key`` and tell whether it is within the limit.
+
+        Every attempt is counted, successful or not. Returns False when the
+        attempts of the last ``window_minutes`` exceed ``limit``. Attempts are
+        counted in one-minute buckets; the oldest bucket, only partly inside
+        the window, counts for the share of it that is.
+        """
+        now = fields.Datetime.now()
+        bucket = now.replace(second=0, microsecond=0)
+        since = now - timedelta(minutes=window_minutes)
+        with autonomous_cursor(self.env.registry) as cr:
+            # The CTE's insert is not visible to the outer query, whose
+            # snapshot predates it: the row written is counted from RETURNING
+            cr.execute(f"""
+                WITH hit AS (
+                    INSERT INTO {self._table} (key, bucket_start, shard, hits)
+                    VALUES (%(key)s, %(bucket)s, %(shard)s, 1)
+                    ON CONFLICT (key, bucket_start, shard)
+                    DO UPDATE SET hits = {self._table}.hits + 1
+                    RETURNING hits
+                )
+                SELECT (SELECT hits FROM hit) + COALESCE(SUM(CASE
+                           WHEN bucket_start < %(since)s
+                           THEN hits * EXTRACT(EPOCH FROM bucket_start + interval '1 minute' - %(since)s) / 60
+                           ELSE hits END), 0)
+                  FROM {self._table}
+                 WHERE key = %(key)s
+                   AND bucket_start >= %(first_bucket)s
+                   AND NOT (bucket_start = %(bucket)s AND shard = %(shard)s)
+            """, {
+                'key': key,
+                'bucket': bucket,
+                'shard': random.randrange(RATE_LIMIT_SHARDS),
+                'since': since,
+                'first_bucket': since.replace(second=0, microsecond=0),
+            })
+            total = cr.fetchone()[0]
+        return total <= limit
+
+    @api.model
+    def _cron_prune(self):
+        """Cron job: drop the counters past the retention period."""
+        self.env.cr.execute(
+            f"DELETE FROM {self._table} WHERE bucket_start < %s",
+            [fields.Datetime.now() - RATE_LIMIT_RETENTION],
+        )
+        _logger.info("Pruned %d rate limit counters", self.env.cr.rowcount)
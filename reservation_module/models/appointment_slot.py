@@ -1,8 +1,20 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
-from datetime import timedelta
+from odoo.tools import split_every
+from datetime import datetime, timedelta
+import logging
+import pytz
+
+from ..tools.intervals import IntervalIndex, to_epoch
+
+_logger = logging.getLogger(__name__)
+
+# Slots recomputed per chunk by the occupancy rebuild
+SLOT_RECOMPUTE_CHUNK = 1000
+
+OCCUPANCY_FIELDS = ['booked_count', 'available_count', 'state']
 
 
 class AppointmentSlot(models.Model):
@@ -55,13 +67,27 @@ class AppointmentSlot(models.Model):
         string='Bookings',
     )
 
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Slot inventory reads: one type over a date range, by state
+        tools.create_index(
+            self.env.cr, 'appointment_slot_type_start_state_index', self._table,
+            ['appointment_type_id', 'start_datetime', 'state'],
+        )
+        return res
+
     @api.depends('booking_ids', 'booking_ids.state', 'booking_ids.guest_count', 'capacity')
     def _compute_booking_info(self):
-        for slot in self:
-            confirmed_bookings = slot.booking_ids.filtered(
-                lambda b: b.state in ['confirmed', 'done']
+        """Occupancy of all touched slots from one SUM(guest_count) GROUP BY slot_id."""
+        booked = {
+            slot.id: guests
+            for slot, guests in self.env['appointment.booking']._read_group(
+                [('slot_id', 'in', self._origin.ids), ('state', 'in', ['confirmed', 'done'])],
+                ['slot_id'], ['guest_count:sum'],
             )
-            slot.booked_count = sum(confirmed_bookings.mapped('guest_count'))
+        }
+        for slot in self:
+            slot.booked_count = booked.get(slot._origin.id, 0)
             slot.available_count = max(0, slot.capacity - slot.booked_count)
 
             if slot.available_count == 0:
@@ -71,6 +97,22 @@ class AppointmentSlot(models.Model):
             else:
                 slot.state = 'available'
 
+    @api.model
+    def _recompute_occupancy(self, domain=None, chunk_size=SLOT_RECOMPUTE_CHUNK):
+        """Recompute the stored occupancy of the matching slots, chunk by chunk.
+
+        Each chunk is one grouped query and one batched write; the cache is
+        dropped between chunks so memory stays flat on large tables.
+        """
+        slot_ids = self.search(domain or []).ids
+        for ids in split_every(chunk_size, slot_ids):
+            slots = self.browse(ids)
+            for fname in OCCUPANCY_FIELDS:
+                self.env.add_to_compute(self._fields[fname], slots)
+            slots.flush_recordset(OCCUPANCY_FIELDS)
+            self.env.invalidate_all()
+        return len(slot_ids)
+
     @api.constrains('start_datetime', 'end_datetime')
     def _check_dates(self):
         for slot in self:
@@ -93,13 +135,16 @@ class AppointmentSlot(models.Model):
         """
         Generate available slots for an appointment type within a date range.
         Returns a list of slot data dictionaries.
+
+        Working hours are computed once for the whole range and each
+        candidate slot is checked against them with the interval engine.
         """
         slots = []
         slot_duration = timedelta(hours=appointment_type.slot_duration)
         slot_interval = timedelta(hours=appointment_type.slot_interval or appointment_type.slot_duration)
 
-        current_datetime = fields.Datetime.to_datetime(start_date)
-        end_datetime = fields.Datetime.to_datetime(end_date)
+        range_start = fields.Datetime.to_datetime(start_date)
+        range_end = fields.Datetime.to_datetime(end_date)
 
         # Get working hours from resource calendar if available
         if resource and resource.calendar_id:
@@ -109,45 +154,165 @@ class AppointmentSlot(models.Model):
         else:
             calendar = self.env.company.resource_calendar_id
 
-        while current_datetime < end_datetime:
-            slot_end = current_datetime + slot_duration
-
-            # Check if this time is within working hours
-            if calendar:
-                intervals = calendar._work_intervals_batch(
-                    current_datetime,
-                    slot_end,
-                    resources=resource or (staff.resource_id if staff else None),
-                )
-                # Check if slot falls within work intervals
-                is_working = any(intervals.values())
-            else:
-                is_working = True
-
-            if is_working:
-                slot_data = {
-                    'appointment_type_id': appointment_type.id,
-                    'start_datetime': current_datetime,
-                    'end_datetime': slot_end,
-                    'capacity': 1,  # Default capacity
-                }
-                if resource:
-                    slot_data['resource_id'] = resource.id
-                    slot_data['capacity'] = resource.capacity if hasattr(resource, 'capacity') else 1
-                if staff:
-                    slot_data['staff_user_id'] = staff.id
-
-                slots.append(slot_data)
-
+        candidates = []
+        current_datetime = range_start
+        while current_datetime < range_end:
+            candidates.append((current_datetime, current_datetime + slot_duration))
             current_datetime += slot_interval
 
+        if calendar and candidates:
+            resources = resource or (staff.resource_id if staff else self.env['resource.resource'])
+            work_intervals = calendar._work_intervals_batch(
+                pytz.utc.localize(range_start),
+                pytz.utc.localize(candidates[-1][1]),
+                resources=resources,
+            )
+            work_index = IntervalIndex(
+                (to_epoch(start), to_epoch(stop), 1)
+                for start, stop, _meta in work_intervals[resources.id]
+            )
+            overlaps = work_index.sweep(
+                (to_epoch(start), to_epoch(end)) for start, end in candidates
+            )
+            # Check if slot falls within work intervals
+            candidates = [
+                candidate for candidate, (count, _weight) in zip(candidates, overlaps) if count
+            ]
+
+        for current_datetime, slot_end in candidates:
+            slot_data = {
+                'appointment_type_id': appointment_type.id,
+                'start_datetime': current_datetime,
+                'end_datetime': slot_end,
+                'capacity': 1,  # Default capacity
+            }
+            if resource:
+                slot_data['resource_id'] = resource.id
+                slot_data['capacity'] = resource.capacity if hasattr(resource, 'capacity') else 1
+            if staff:
+                slot_data['staff_user_id'] = staff.id
+
+            slots.append(slot_data)
+
         return slots
 
     @api.model
-    def get_available_slots(self, appointment_type_id, start_date, end_date, resource_id=None, staff_user_id=None):
+    def _get_day_candidates(self, appointment_type, day, windows):
+        """(start, end) datetimes of a day from its availability minute windows.
+
+        Scheduled types slice each window by slot duration and interval,
+        event types offer each window as one slot.
+        """
+        day_start = datetime.combine(day, datetime.min.time())
+        if not appointment_type.is_scheduled:
+            return [
+                (day_start + timedelta(minutes=minute_from), day_start + timedelta(minutes=minute_to))
+                for minute_from, minute_to in windows
+            ]
+        candidates = []
+        slot_duration = timedelta(hours=appointment_type.slot_duration)
+        slot_interval = timedelta(hours=appointment_type.slot_interval or appointment_type.slot_duration)
+        for minute_from, minute_to in windows:
+            current_time = day_start + timedelta(minutes=minute_from)
+            end_time = day_start + timedelta(minutes=minute_to)
+            while current_time + slot_duration <= end_time:
+                candidates.append((current_time, current_time + slot_duration))
+                current_time += slot_interval
+        return candidates
+
+    @api.model
+    def _get_range_candidates(self, appointment_type, date_from, date_to, resource_id=False, staff_id=False):
+        """Slot candidates of [date_from, date_to] as {date: [(start, end)]}.
+
+        The single source of slot times: the live slot search and the
+        inventory generator both call it. Availability windows are resolved
+        once for the location/staff member, then sliced day by day.
+        """
+        windows_by_weekday = self.env['appointment.availability']._get_availability_windows(
+            appointment_type.id, resource_id, staff_id, merge=appointment_type.is_scheduled)
+        candidates = {}
+        day = date_from
+        while day <= date_to:
+            windows = windows_by_weekday[day.weekday()]
+            if windows:
+                candidates[day] = self._get_day_candidates(appointment_type, day, windows)
+            day += timedelta(days=1)
+        return candidates
+
+    @api.model
+    def _generate_inventory(self, appointment_type, date_from, date_to):
+        """Persist the slots of [date_from, date_to] for an appointment type.
+
+        One row set for the type as a whole and one per location, from the
+        same candidates as the live slot search. Closing days get their rows
+        too: they are checked at read time, so adding, moving or removing one
+        never leaves the inventory with a hole. Bookings already made in the
+        range are linked to their new slots. Returns the created slots.
+        """
+        locations = [(False, 1)] + [
+            (resource.id, resource.capacity or 1) for resource in appointment_type.resource_ids
+        ]
+        vals_list = []
+        for resource_id, capacity in locations:
+            candidates = self._get_range_candidates(appointment_type, date_from, date_to, resource_id)
+            vals_list += [{
+                'appointment_type_id': appointment_type.id,
+                'resource_id': resource_id,
+                'start_datetime': start,
+                'end_datetime': end,
+                'capacity': capacity,
+            } for day_candidates in candidates.values() for start, end in day_candidates]
+        slots = self.create(vals_list)
+        self.env['appointment.booking'].search([
+            ('appointment_type_id', '=', appointment_type.id),
+            ('resource_id', '!=', False),
+            ('start_datetime', '>=', datetime.combine(date_from, datetime.min.time())),
+            ('start_datetime', '<', datetime.combine(date_to + timedelta(days=1), datetime.min.time())),
+        ])._link_inventory_slots()
+        return slots
+
+    @api.model
+    def _cron_generate_inventory(self):
+        """Cron job: extend the slot inventory of each type to its booking horizon.
+
+        Only the days past the generated horizon are added, so a daily run
+        creates one day per location. Past slots and capacity ledger buckets
+        are pruned.
+        """
+        today = fields.Date.context_today(self)
+        types = self.env['appointment.type'].search([('slot_inventory', '=', True)])
+        for appointment_type in types:
+            horizon = today + timedelta(days=appointment_type.max_booking_days)
+            generated_until = appointment_type.slot_inventory_until
+            date_from = max(today, generated_until + timedelta(days=1)) if generated_until else today
+            if date_from <= horizon:
+                self._generate_inventory(appointment_type, date_from, horizon)
+                appointment_type.slot_inventory_until = horizon
+                _logger.info("Slot inventory of appointment type %s generated until %s",
+                             appointment_type.id, horizon)
+        self._prune_inventory()
+        self.env['appointment.capacity.ledger']._prune()
+
+    @api.model
+    def _prune_inventory(self):
+        """Drop the slots that are over; linked bookings keep their data."""
+        self.env.cr.execute(f"DELETE FROM {self._table} WHERE end_datetime < %s",
+                            [fields.Datetime.now()])
+        if self.env.cr.rowcount:
+            _logger.info("Pruned %d past appointment slots", self.env.cr.rowcount)
+            self.env.invalidate_all()
+
+    @api.model
+    def get_available_slots(self, appointment_type_id, start_date, end_date, resource_id=None, staff_user_id=None,
+                            exact=False):
         """
         Get available slots for booking.
         This method can be called from the website controller.
+
+        With ``exact``, an empty ``resource_id`` or ``staff_user_id`` only
+        matches the slots without location or staff member: the generated
+        inventory has one row set for the type as a whole and one per
+        location.
         """
         appointment_type = self.env['appointment.type'].browse(appointment_type_id)
         if not appointment_type.exists():
@@ -159,9 +324,9 @@ class AppointmentSlot(models.Model):
             ('start_datetime', '<', end_date),
             ('state', 'in', ['available', 'partial']),
         ]
-        if resource_id:
-            domain.append(('resource_id', '=', resource_id))
-        if staff_user_id:
-            domain.append(('staff_user_id', '=', staff_user_id))
+        if resource_id or exact:
+            domain.append(('resource_id', '=', resource_id or False))
+        if staff_user_id or exact:
+            domain.append(('staff_user_id', '=', staff_user_id or False))
 
         return self.search(domain)
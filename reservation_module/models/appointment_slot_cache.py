@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from odoo.tools import LRU
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from ..tools.transaction import autonomous_cursor
+
+_logger = logging.getLogger(__name__)
+
+# Day results of the public slot search kept per worker
+SLOT_CACHE_SIZE = 8192
+
+# Hit/miss counts are written to the database at most this often per worker
+SLOT_CACHE_STATS_FLUSH_SECONDS = 60
+
+# Version counters of past days are pruned after this many days
+SLOT_VERSION_RETENTION_DAYS = 7
+
+# Key of the version counters awaiting the commit, in cr.postcommit.data
+PENDING_BUMPS = 'appointment.slot.version.bumps'
+
+# Shared by every database the worker serves: keys start with the dbname
+_slot_cache = LRU(SLOT_CACHE_SIZE)
+_stats_lock = threading.Lock()
+_pending_stats = {'hits': 0, 'misses': 0, 'flushed_at': time.monotonic(), 'flushing': False}
+
+
+class AppointmentSlotVersion(models.Model):
+    """Version counter of the slots of a location or staff member on a day.
+
+    Bumped whenever a booking holding that location or staff member on
+    that day is created, confirmed, moved or cancelled. The public slot
+    search keys its per-worker result cache on these counters, so a bump in
+    any worker changes the key everywhere. Schedule changes (weekly
+    availability, closing days) clear the registry caches, whose sequence
+    is part of the key as well.
+
+    Counters are bumped right after the booking transaction commits, in a
+    transaction of their own: bumping them in the booking transaction made
+    concurrent bookings of one location and day conflict on the counter
+    row and retry, even at distinct times. A day computed between the
+    commit and the bump holds the new bookings already, so it is correct
+    under the old key too; only a crash in between leaves a day stale,
+    until it drops out of the cache or the registry caches are cleared.
+
+    The table is logged on purpose: counters restarting from zero after a
+    crash could match results cached before it.
+    """
+    _name = 'appointment.slot.version'
+    _description = 'Appointment Slot Cache Version'
+    _log_access = False
+
+    scope = fields.Selection([
+        ('resource', 'Location'),
+        ('staff', 'Staff'),
+    ], string='Scope', required=True)
+    ref_id = fields.Integer('Record ID', required=True)
+    day = fields.Date('Day', required=True)
+    version = fields.Integer('Version', default=0)
+
+    _sql_constraints = [
+        ('scope_ref_day_uniq', 'unique(scope, ref_id, day)',
+         'Only one version counter per location/staff member and day.'),
+    ]
+
+    @api.model
+    def _booking_keys(self, bookings):
+        """(scope, ref_id, day) of every day held by these bookings."""
+        keys = set()
+        for booking in bookings:
+            if booking.state not in ('confirmed', 'done') or not booking.start_datetime or not booking.end_datetime:
+                continue
+            day = booking.start_datetime.date()
+            last_day = (booking.end_datetime - timedelta(microseconds=1)).date()
+            while day <= last_day:
+                if booking.resource_id:
+                    keys.add(('resource', booking.resource_id.id, day))
+                if booking.staff_user_id:
+                    keys.add(('staff', booking.staff_user_id.id, day))
+                day += timedelta(days=1)
+        return keys
+
+    @api.model
+    def _bump(self, keys):
+        """Increment the counters of ``keys`` once the transaction is committed."""
+        if not keys:
+            return
+        pending = self.env.cr.postcommit.data.setdefault(PENDING_BUMPS, set())
+        if not pending:
+            registry = self.env.registry
+
+            @self.env.cr.postcommit.add
+            def bump_versions():
+                with autonomous_cursor(registry) as cr:
+                    self.with_env(self.env(cr=cr))._increment(pending)
+        pending.update(keys)
+
+    @api.model
+    def _increment(self, keys):
+        """Increment the counters of ``keys`` in one upsert."""
+        if not keys:
+            return
+        scopes, ref_ids, days = zip(*sorted(keys))
+        self.env.cr.execute(f"""
+            INSERT INTO {self._table} (scope, ref_id, day, version)
+            SELECT scope, ref_id, day, 1
+              FROM unnest(%s::varchar[], %s::int[], %s::date[]) AS k(scope, ref_id, day)
+            ON CONFLICT (scope, ref_id, day)
+            DO UPDATE SET version = {self._table}.version + 1
+        """, [list(scopes), list(ref_ids), list(days)])
+
+    @api.model
+    def _get_versions(self, resource_id, staff_id, date_from, date_to):
+        """{(scope, day): version} of a location and staff member over a date range."""
+        if not resource_id and not staff_id:
+            return {}
+        self.env.cr.execute(f"""
+            SELECT scope, day, version
+              FROM {self._table}
+             WHERE day BETWEEN %s AND %s
+               AND ((scope = 'resource' AND ref_id = %s) OR (scope = 'staff' AND ref_id = %s))
+        """, [date_from, date_to, resource_id or 0, staff_id or 0])
+        return {(scope, day): version for scope, day, version in self.env.cr.fetchall()}
+
+    # ── Per-worker result cache ──
+
+    @api.model
+    def _cache_get(self, key):
+        """Cached day result for ``key``, None on a miss; counts the outcome."""
+        result = _slot_cache.get(key)
+        with _stats_lock:
+            _pending_stats['hits' if result is not None else 'misses'] += 1
+        self._flush_stats()
+        return result
+
+    @api.model
+    def _cache_set(self, key, result):
+        _slot_cache[key] = result
+
+    @api.model
+    def _flush_stats(self, force=False):
+        """Add this worker's pending hit/miss counts to today's statistics.
+
+        The shared daily row is written in a transaction of its own, never
+        in the public request's: requests of every worker would otherwise
+        queue on that row. The counts written are only taken off the pending
+        ones once committed, a failed write leaves them for the next flush.
+        """
+        with _stats_lock:
+            now = time.monotonic()
+            if _pending_stats['flushing'] or (
+                    not force and now - _pending_stats['flushed_at'] < SLOT_CACHE_STATS_FLUSH_SECONDS):
+                return
+            hits, misses = _pending_stats['hits'], _pending_stats['misses']
+            _pending_stats['flushed_at'] = now
+            if not hits and not misses:
+                return
+            _pending_stats['flushing'] = True
+        try:
+            with autonomous_cursor(self.env.registry) as cr:
+                self.env(cr=cr)['appointment.slot.cache.stat']._add(hits, misses)
+        except Exception:
+            _logger.warning("Could not save the slot cache statistics, retrying later", exc_info=True)
+        else:
+            with _stats_lock:
+                _pending_stats['hits'] -= hits
+                _pending_stats['misses'] -= misses
+        finally:
+            with _stats_lock:
+                _pending_stats['flushing'] = False
+
+    @api.model
+    def _cron_prune(self):
+        """Cron job: drop the counters of days that are over."""
+        self.env.cr.execute(
+            f"DELETE FROM {self._table} WHERE day < %s",
+            [fields.Date.today() - timedelta(days=SLOT_VERSION_RETENTION_DAYS)],
+        )
+        _logger.info("Pruned %d slot cache version counters", self.env.cr.rowcount)
+
+
+class AppointmentSlotCacheStat(models.Model):
+    """Daily hit/miss counts of the public slot cache, summed over workers."""
+    _name = 'appointment.slot.cache.stat'
+    _description = 'Appointment Slot Cache Statistics'
+    _order = 'day desc'
+    _log_access = False
+
+    day = fields.Date('Day', required=True, readonly=True)
+    hits = fields.Integer('Hits', readonly=True)
+    misses = fields.Integer('Misses', readonly=True)
+    hit_ratio = fields.Float('Hit Ratio (%)', compute='_compute_hit_ratio')
+
+    _sql_constraints = [
+        ('day_uniq', 'unique(day)', 'Only one statistics line per day.'),
+    ]
+
+    @api.depends('hits', 'misses')
+    def _compute_hit_ratio(self):
+        for stat in self:
+            total = stat.hits + stat.misses
+            stat.hit_ratio = 100.0 * stat.hits / total if total else 0.0
+
+    @api.model
+    def _add(self, hits, misses):
+        self.env.cr.execute(f"""
+            INSERT INTO {self._table} (day, hits, misses)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (day)
+            DO UPDATE SET hits = {self._table}.hits + EXCLUDED.hits,
+                          misses = {self._table}.misses + EXCLUDED.misses
+        """, [fields.Date.today(), hits, misses])
@@ -5,6 +5,13 @@ from odoo.exceptions import ValidationError
 import pytz
 
 
+# Fields shaping the generated slots, the inventory is rebuilt when they change
+SLOT_INVENTORY_FIELDS = {
+    'slot_inventory', 'is_scheduled', 'slot_duration', 'slot_interval',
+    'resource_ids', 'availability_ids', 'max_booking_days',
+}
+
+
 class AppointmentType(models.Model):
     _name = 'appointment.type'
     _description = 'Appointment Type'
@@ -68,6 +75,19 @@ class AppointmentType(models.Model):
         default=True,
         help='Let customers pick their preferred staff member',
     )
+    staff_assignment_policy = fields.Selection([
+        ('least_loaded_month', 'Fewest Bookings This Month'),
+        ('least_loaded_week', 'Fewest Bookings This Week'),
+        ('round_robin', 'Round Robin'),
+    ], string='Staff Assignment Policy', default='least_loaded_month', required=True,
+        help='How a free staff member is picked when the customer does not choose one')
+    location_assignment_policy = fields.Selection([
+        ('least_loaded_month', 'Fewest Bookings This Month'),
+        ('best_fit', 'Best Fit'),
+    ], string='Location Assignment Policy', default='least_loaded_month', required=True,
+        help='How a free location is picked when the customer does not choose one. '
+             'Best Fit seats the party at the location with the fewest remaining '
+             'places that still fits it.')
     allow_customer_choose_location = fields.Boolean(
         'Allow Customer to Choose Location',
         default=True,
@@ -122,6 +142,17 @@ class AppointmentType(models.Model):
         help='Time interval between available slots',
     )
 
+    slot_inventory = fields.Boolean(
+        'Precomputed Slots',
+        help='Serve the booking calendar from slots generated in advance by a daily job '
+             'instead of computing them on every request',
+    )
+    slot_inventory_until = fields.Date(
+        'Slots Generated Until',
+        readonly=True,
+        copy=False,
+    )
+
     # Booking Restrictions
     max_booking_days = fields.Integer(
         'Max Booking Days',
@@ -133,6 +164,11 @@ class AppointmentType(models.Model):
         default=1.0,
         help='Minimum advance time for bookings in hours',
     )
+    booking_rate_limit = fields.Integer(
+        'Max Submissions per Email (hour)',
+        default=5,
+        help='Booking form submissions accepted per email address and hour, 0 for no limit',
+    )
     cancel_before_hours = fields.Float(
         'Cancellation Deadline (hours)',
         default=1.0,
@@ -264,11 +300,27 @@ class AppointmentType(models.Model):
 
     @api.depends('booking_ids', 'booking_ids.state', 'booking_ids.start_datetime')
     def _compute_booking_count(self):
-        now = fields.Datetime.now()
+        """Count bookings with two grouped queries for the whole recordset.
+
+        Served by the (appointment_type_id, start_datetime, state) index, so
+        no booking is loaded whatever the history of the type.
+        """
+        Booking = self.env['appointment.booking']
+        domain = [('appointment_type_id', 'in', self._origin.ids), ('state', '!=', 'cancelled')]
+        totals = {
+            appointment_type.id: count
+            for appointment_type, count in Booking._read_group(domain, ['appointment_type_id'], ['__count'])
+        }
+        upcoming = {
+            appointment_type.id: count
+            for appointment_type, count in Booking._read_group(
+                domain + [('start_datetime', '>', fields.Datetime.now())],
+                ['appointment_type_id'], ['__count'],
+            )
+        }
         for record in self:
-            bookings = record.booking_ids.filtered(lambda b: b.state not in ['cancelled'])
-            record.booking_count = len(bookings)
-            record.upcoming_booking_count = len(bookings.filtered(lambda b: b.start_datetime > now))
+            record.booking_count = totals.get(record._origin.id, 0)
+            record.upcoming_booking_count = upcoming.get(record._origin.id, 0)
 
     def _compute_website_url(self):
         for record in self:
@@ -334,6 +386,53 @@ class AppointmentType(models.Model):
                     _('At least one payment product must be selected when payment is required.')
                 )
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'availability_ids' in vals:
+            self.env.registry.clear_cache()
+        if SLOT_INVENTORY_FIELDS.intersection(vals):
+            self._reset_slot_inventory()
+        if 'reminder_hours' in vals:
+            # Only the pending reminders move, past bookings keep their due time
+            Booking = self.env['appointment.booking']
+            bookings = Booking.search([
+                ('appointment_type_id', 'in', self.ids),
+                ('state', '=', 'confirmed'),
+                ('reminder_sent', '=', False),
+                ('start_datetime', '>', fields.Datetime.now()),
+            ])
+            self.env.add_to_compute(Booking._fields['reminder_due_at'], bookings)
+            bookings._schedule_reminders()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        # Availability lines go with the database cascade, drop their compiled schedule
+        self.env.registry.clear_cache()
+        return res
+
+    def _reset_slot_inventory(self):
+        """Drop the upcoming generated slots after a schedule change.
+
+        The live slot search is used until the inventory job has rebuilt them.
+        """
+        types = self.filtered(lambda t: t.slot_inventory or t.slot_inventory_until)
+        if not types:
+            return
+        self.env['appointment.slot'].flush_model()
+        self.env.cr.execute("""
+            DELETE FROM appointment_slot
+             WHERE appointment_type_id IN %s AND end_datetime >= %s
+        """, [tuple(types.ids), fields.Datetime.now()])
+        self.env['appointment.slot'].invalidate_model()
+        # The database cleared the slot of their bookings
+        self.env['appointment.booking'].invalidate_model(['slot_id'])
+        types.write({'slot_inventory_until': False})
+        if any(types.mapped('slot_inventory')):
+            cron = self.env.ref('reservation_module.ir_cron_generate_slot_inventory', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+
     def action_view_bookings(self):
         """Open bookings for this appointment type"""
         self.ensure_one()
@@ -408,7 +507,49 @@ class AppointmentType(models.Model):
             'view_mode': 'form',
             'target': 'new',
             'context': {
-                'default_appointment_type_id': self.id,
+                'default_appointment_type_ids': self.ids,
             },
         }
 
+    def action_cancel_closing_day_bookings(self):
+        """Cancel the open bookings of these types falling on upcoming closing days.
+
+        Bookings are matched on their start date in the type's timezone and
+        cancelled as one batch, regardless of the cancellation deadline.
+        """
+        Booking = self.env['appointment.booking']
+        Booking.flush_model(['appointment_type_id', 'state', 'start_datetime'])
+        self.env['appointment.closing.day'].flush_model(['appointment_type_id', 'date'])
+        self.flush_recordset(['timezone'])
+        self.env.cr.execute("""
+            SELECT b.id
+              FROM appointment_booking b
+              JOIN appointment_type t ON t.id = b.appointment_type_id
+              JOIN appointment_closing_day c
+                ON c.appointment_type_id = b.appointment_type_id
+               AND c.date = (b.start_datetime AT TIME ZONE 'UTC'
+                             AT TIME ZONE COALESCE(t.timezone, 'UTC'))::date
+             WHERE b.appointment_type_id IN %s
+               AND b.state IN ('draft', 'pending_payment', 'confirmed')
+               AND c.date >= CURRENT_DATE
+        """, [tuple(self.ids)])
+        bookings = Booking.browse([row[0] for row in self.env.cr.fetchall()])
+        report = bookings._cancel_batch(check_deadline=False)
+        return bookings._batch_report_notification(
+            _('Closing Day Bookings Cancelled'),
+            _('%d booking(s) on closing days cancelled.', len(report['done'])),
+            report['skipped'],
+        )
+
+    def action_recompute_slot_occupancy(self):
+        """Recompute the stored occupancy of the slots of these types, in chunks"""
+        count = self.env['appointment.slot']._recompute_occupancy([('appointment_type_id', 'in', self.ids)])
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Slot Occupancy Recomputed'),
+                'message': _('%d slot(s) recomputed.', count),
+                'type': 'success',
+            }
+        }
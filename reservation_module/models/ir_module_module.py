@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models, tools
+
+# Soft-coupled modules: capability -> technical module name
+SOFT_DEPENDENCY_MODULES = {
+    'portal_discuss': 'cs_portal_discuss',
+}
+
+
+class IrModuleModule(models.Model):
+    _inherit = 'ir.module.module'
+
+    @api.model
+    @tools.ormcache()
+    def _get_appointment_capabilities(self):
+        """Soft-coupled integrations available to the reservation module.
+
+        - ``portal_discuss``: cs_portal_discuss is installed, bookings get a
+          Discuss channel as meeting room
+        - ``automatic_invoice``: sale invoices paid orders by itself, the
+          payment flow skips its own invoicing
+
+        Computed once per registry: installing or removing a module reloads
+        the registry, and configuration parameter changes clear the cache.
+        """
+        self.env.cr.execute(
+            "SELECT name FROM ir_module_module WHERE state = 'installed' AND name IN %s",
+            [tuple(SOFT_DEPENDENCY_MODULES.values())],
+        )
+        installed = {row[0] for row in self.env.cr.fetchall()}
+        capabilities = {
+            capability for capability, module in SOFT_DEPENDENCY_MODULES.items()
+            if module in installed
+        }
+        if tools.str2bool(self.env['ir.config_parameter'].sudo().get_param('sale.automatic_invoice'), False):
+            capabilities.add('automatic_invoice')
+        return frozenset(capabilities)
+
+    @api.model
+    def _has_appointment_capability(self, capability):
+        return capability in self._get_appointment_capabilities()
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'state' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def _register_hook(self):
+        super()._register_hook()
+        # Resolve the capabilities while the registry loads
+        self._get_appointment_capabilities()
@@ -31,6 +31,9 @@ class PaymentTransaction(models.Model):
         super()._post_process()
 
         Booking = self.env['appointment.booking'].sudo()
+        # With sale.automatic_invoice the sale module invoiced the paid
+        # orders in super() already, so the safety net below is skipped
+        auto_invoice = self.env['ir.module.module']._has_appointment_capability('automatic_invoice')
 
         # Handle payment failures (webhook-triggered)
         for tx in self.filtered(lambda t: t.state in ('error', 'cancel')):
@@ -74,11 +77,10 @@ class PaymentTransaction(models.Model):
                     if not bookings:
                         continue
 
-                    # Ensure invoice is created (safety net — sale module
-                    # may already have done this if sale.automatic_invoice
-                    # is enabled)
+                    # Ensure invoice is created (safety net when the sale
+                    # module does not invoice paid orders by itself)
                     try:
-                        if not so.invoice_ids:
+                        if not auto_invoice and not so.invoice_ids:
                             so.sudo()._create_invoices()
                             for invoice in so.invoice_ids.filtered(
                                 lambda inv: inv.state == 'draft'
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models, tools
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Guest bookings look partners up by normalized email.
+        # migrations/18.0.2.15.0 builds the same index before the update on
+        # existing databases, keep both in sync.
+        tools.create_index(
+            self.env.cr, 'res_partner_email_normalized_index', self._table,
+            ['email_normalized'],
+            where="email_normalized IS NOT NULL",
+        )
+        return res
+
+    @api.model
+    def _appointment_get_guest_partner(self, email, name, phone=False):
+        """Partner of a booking guest, created when the address is unknown.
+
+        Addresses are matched normalized (case, display name), so
+        ``Foo@x.com`` and ``foo@x.com`` share one partner. The creation is
+        guarded by an appointment.guest.claim, so concurrent submissions of
+        the same guest end up on the same partner.
+        """
+        email_normalized = tools.email_normalize(email) or email.strip().lower()
+        partner = self.search([('email_normalized', '=', email_normalized)], order='id', limit=1)
+        if partner:
+            return partner
+        self.env['appointment.guest.claim']._claim(email_normalized)
+        return self.create({
+            'name': name,
+            'email': email,
+            'phone': phone,
+        })
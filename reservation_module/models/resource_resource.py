@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
 from odoo import api, fields, models, _
+from datetime import datetime, time, timedelta
+import pytz
+
+from .appointment_availability import _merge_windows
 
 
 class ResourceResource(models.Model):
@@ -47,17 +51,163 @@ class ResourceResource(models.Model):
         'Upcoming Bookings',
         compute='_compute_booking_count',
     )
+    week_booked_hours = fields.Float(
+        'Booked Hours (Week)',
+        compute='_compute_utilization',
+        help='Hours covered by confirmed bookings this week',
+    )
+    week_utilization = fields.Float(
+        'Occupancy (Week)',
+        compute='_compute_utilization',
+        help='Booked guest-hours over capacity times open hours this week, in percent',
+    )
+    month_booked_hours = fields.Float(
+        'Booked Hours (Month)',
+        compute='_compute_utilization',
+        help='Hours covered by confirmed bookings this month',
+    )
+    month_utilization = fields.Float(
+        'Occupancy (Month)',
+        compute='_compute_utilization',
+        help='Booked guest-hours over capacity times open hours this month, in percent',
+    )
 
     @api.depends('appointment_type_ids')
     def _compute_booking_count(self):
-        now = fields.Datetime.now()
+        """Count bookings with two grouped queries for the whole recordset."""
+        Booking = self.env['appointment.booking']
+        domain = [('resource_id', 'in', self._origin.ids), ('state', '!=', 'cancelled')]
+        totals = {
+            resource.id: count
+            for resource, count in Booking._read_group(domain, ['resource_id'], ['__count'])
+        }
+        upcoming = {
+            resource.id: count
+            for resource, count in Booking._read_group(
+                domain + [('start_datetime', '>', fields.Datetime.now())],
+                ['resource_id'], ['__count'],
+            )
+        }
+        for resource in self:
+            resource.booking_count = totals.get(resource._origin.id, 0)
+            resource.upcoming_booking_count = upcoming.get(resource._origin.id, 0)
+
+    def _get_utilization_periods(self):
+        """Current week and month in the user's timezone.
+
+        Returns {period: (first_date, end_date, utc_start, utc_end)}, end
+        excluded, the UTC bounds being naive like the stored datetimes.
+        """
+        tz = pytz.timezone(self.env.user.tz or 'UTC')
+        today = fields.Date.context_today(self)
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+
+        def to_utc(day):
+            return tz.localize(datetime.combine(day, time.min)).astimezone(pytz.UTC).replace(tzinfo=None)
+        return {
+            'week': (week_start, week_start + timedelta(days=7), to_utc(week_start), to_utc(week_start + timedelta(days=7))),
+            'month': (month_start, next_month, to_utc(month_start), to_utc(next_month)),
+        }
+
+    def _get_open_minutes_by_resource(self):
+        """{resource id: open minutes of each weekday} for the whole recordset.
+
+        Open time comes from the availability of the resources' types. Each
+        type's schedule is compiled once for every resource of the set, so
+        the cost does not grow with the number of resources sharing a type.
+        """
+        Availability = self.env['appointment.availability']
+        compiled = {
+            type_id: Availability._get_compiled_availability(type_id)
+            for type_id in self.appointment_type_ids._origin.ids
+        }
+        open_minutes = {}
         for resource in self:
-            bookings = self.env['appointment.booking'].search([
-                ('resource_id', '=', resource.id),
-                ('state', 'not in', ['cancelled']),
+            resource_id = resource._origin.id
+            weekly = [[] for _day in range(7)]
+            for type_id in resource.appointment_type_ids._origin.ids:
+                for (line_resource_id, _line_user_id), week in compiled[type_id].items():
+                    if line_resource_id in (resource_id, False):
+                        for weekday in range(7):
+                            weekly[weekday] += week[weekday]
+            open_minutes[resource_id] = [
+                sum(end - start for start, end in _merge_windows(sorted(windows)))
+                for windows in weekly
+            ]
+        return open_minutes
+
+    def _compute_utilization(self):
+        """Booked hours and occupancy of the current week and month.
+
+        Booked time is summed in SQL for all resources at once, clipped to
+        each period; open hours come from the cached availability windows,
+        resolved for the whole recordset in one call.
+        """
+        periods = self._get_utilization_periods()
+        stats = {}
+        resource_ids = [rid for rid in self._origin.ids if rid]
+        if resource_ids:
+            self.env['appointment.booking'].flush_model([
+                'resource_id', 'state', 'start_datetime', 'end_datetime', 'guest_count',
             ])
-            resource.booking_count = len(bookings)
-            resource.upcoming_booking_count = len(bookings.filtered(lambda b: b.start_datetime > now))
+            week_start, week_end = periods['week'][2:]
+            month_start, month_end = periods['month'][2:]
+            overlap = "EXTRACT(EPOCH FROM LEAST(end_datetime, {end}) - GREATEST(start_datetime, {start})) / 3600.0"
+            in_period = "start_datetime < {end} AND end_datetime > {start}"
+            selects = []
+            for start, end in (('%(week_start)s', '%(week_end)s'), ('%(month_start)s', '%(month_end)s')):
+                hours = overlap.format(start=start, end=end)
+                where = in_period.format(start=start, end=end)
+                selects.append(f"COALESCE(SUM({hours}) FILTER (WHERE {where}), 0)")
+                selects.append(f"COALESCE(SUM({hours} * guest_count) FILTER (WHERE {where}), 0)")
+            self.env.cr.execute(f"""
+                SELECT resource_id, {', '.join(selects)}
+                  FROM appointment_booking
+                 WHERE resource_id IN %(ids)s
+                   AND state IN ('confirmed', 'done')
+                   AND start_datetime < %(range_end)s
+                   AND end_datetime > %(range_start)s
+                 GROUP BY resource_id
+            """, {
+                'ids': tuple(resource_ids),
+                'week_start': week_start, 'week_end': week_end,
+                'month_start': month_start, 'month_end': month_end,
+                'range_start': min(week_start, month_start),
+                'range_end': max(week_end, month_end),
+            })
+            stats = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+        # Number of times each weekday occurs in each period
+        weekday_counts = {}
+        for period, (first_date, end_date, _utc_start, _utc_end) in periods.items():
+            counts = [0] * 7
+            for offset in range((end_date - first_date).days):
+                counts[(first_date + timedelta(days=offset)).weekday()] += 1
+            weekday_counts[period] = counts
+        open_minutes_by_resource = self._get_open_minutes_by_resource()
+
+        for resource in self:
+            week_hours, week_guest_hours, month_hours, month_guest_hours = stats.get(resource._origin.id, (0, 0, 0, 0))
+            open_minutes = open_minutes_by_resource[resource._origin.id]
+            capacity = resource.capacity or 1
+            for period, booked_hours, guest_hours in (
+                ('week', week_hours, week_guest_hours),
+                ('month', month_hours, month_guest_hours),
+            ):
+                open_hours = sum(
+                    minutes * count for minutes, count in zip(open_minutes, weekday_counts[period])
+                ) / 60.0
+                resource[f'{period}_booked_hours'] = float(booked_hours)
+                resource[f'{period}_utilization'] = (
+                    100.0 * float(guest_hours) / (capacity * open_hours) if open_hours else 0.0
+                )
+
+    def action_rebuild_capacity_ledger(self):
+        """Recompute the capacity ledger of these locations from their bookings"""
+        self.env['appointment.capacity.ledger'].sudo()._rebuild(self.ids)
+        return True
 
     def action_view_bookings(self):
         """Open bookings for this resource"""
@@ -3,6 +3,9 @@
 import publicWidget from "@web/legacy/js/public/public_widget";
 import { _t } from "@web/core/l10n/translation";
 
+// How long (ms) slots fetched through /slots_range are reused client-side
+const SLOT_CACHE_TTL = 5 * 60 * 1000;
+
 /**
  * Appointment Reservation Widget
  * Handles the appointment booking reservation on the frontend
@@ -27,6 +30,8 @@ publicWidget.registry.AppointmentReservation = publicWidget.Widget.extend({
         this.selectedDate = null;
         this.isScheduled = this.el.dataset.isScheduled !== '0';
         this.eventDates = null; // Will be loaded for event mode
+        // Slots cache filled by /slots_range: "resource|staff|YYYY-MM-DD" -> {slots, closingReason, fetchedAt}
+        this.slotCache = new Map();
 
         // Listen for staff/location dropdown changes
         const staffSelect = document.getElementById('staff-select');
@@ -214,23 +219,35 @@ publicWidget.registry.AppointmentReservation = publicWidget.Widget.extend({
         this._loadSlots(dateStr);
     },
 
-    _loadSlots: function (dateStr) {
-        const slotsContainer = document.getElementById('slots-container');
-        const availableSlots = document.getElementById('available-slots');
-
-        if (!slotsContainer || !availableSlots) return;
+    _slotCacheKey: function (dateStr) {
+        return `${this.resourceId || ''}|${this.staffId || ''}|${dateStr}`;
+    },
 
-        // Show loading
-        slotsContainer.innerHTML = `
-            <div class="col-12 text-center py-4">
-                <i class="fa fa-spinner fa-spin fa-2x"></i>
-                <p class="mt-2">${_t("Loading available times...")}</p>
-            </div>
-        `;
-        availableSlots.style.display = 'block';
+    _getCachedSlots: function (dateStr) {
+        const entry = this.slotCache.get(this._slotCacheKey(dateStr));
+        if (entry && Date.now() - entry.fetchedAt < SLOT_CACHE_TTL) {
+            return entry;
+        }
+        return null;
+    },
 
-        // Fetch slots from server
-        fetch(`/appointment/${this.appointmentTypeId}/slots`, {
+    /**
+     * Fetch the slots of the whole month containing dateStr (bounded by the
+     * bookable range) in a single /slots_range call and cache every day.
+     */
+    _fetchSlotsRange: function (dateStr) {
+        const [year, month] = dateStr.split('-').map(Number);
+        const today = new Date();
+        today.setHours(0, 0, 0, 0);
+        let rangeStart = new Date(year, month - 1, 1);
+        let rangeEnd = new Date(year, month, 0);
+        if (rangeStart < today) rangeStart = today;
+        if (rangeEnd > this.endDate) rangeEnd = this.endDate;
+        const dateFrom = rangeStart <= rangeEnd ? this._formatDate(rangeStart) : dateStr;
+        const dateTo = rangeStart <= rangeEnd ? this._formatDate(rangeEnd) : dateStr;
+        const fetchedAt = Date.now();
+
+        return fetch(`/appointment/${this.appointmentTypeId}/slots_range`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -239,7 +256,8 @@ publicWidget.registry.AppointmentReservation = publicWidget.Widget.extend({
                 jsonrpc: '2.0',
                 method: 'call',
                 params: {
-                    date: dateStr,
+                    date_from: dateFrom,
+                    date_to: dateTo,
                     resource_id: this.resourceId,
                     staff_id: this.staffId,
                 },
@@ -247,8 +265,49 @@ publicWidget.registry.AppointmentReservation = publicWidget.Widget.extend({
         })
         .then(response => response.json())
         .then(data => {
-            if (data.result && data.result.slots) {
-                this._renderSlots(data.result.slots);
+            if (data.result && data.result.days) {
+                Object.entries(data.result.days).forEach(([day, dayData]) => {
+                    this.slotCache.set(this._slotCacheKey(day), {
+                        slots: dayData.slots || [],
+                        closingReason: dayData.closing_reason || null,
+                        fetchedAt: fetchedAt,
+                    });
+                });
+            }
+            return data;
+        });
+    },
+
+    _loadSlots: function (dateStr) {
+        const slotsContainer = document.getElementById('slots-container');
+        const availableSlots = document.getElementById('available-slots');
+
+        if (!slotsContainer || !availableSlots) return;
+
+        const cached = this._getCachedSlots(dateStr);
+        if (cached) {
+            availableSlots.style.display = 'block';
+            this._renderSlots(cached.slots, cached.closingReason);
+            return;
+        }
+
+        // Show loading
+        slotsContainer.innerHTML = `
+            <div class="col-12 text-center py-4">
+                <i class="fa fa-spinner fa-spin fa-2x"></i>
+                <p class="mt-2">${_t("Loading available times...")}</p>
+            </div>
+        `;
+        availableSlots.style.display = 'block';
+
+        // Fetch the slots of the surrounding month from server
+        this._fetchSlotsRange(dateStr)
+        .then(data => {
+            // Ignore responses for a date the customer already left
+            if (this.selectedDate !== dateStr) return;
+            const entry = this.slotCache.get(this._slotCacheKey(dateStr));
+            if (entry) {
+                this._renderSlots(entry.slots, entry.closingReason);
             } else if (data.result && data.result.error) {
                 slotsContainer.innerHTML = `
                     <div class="col-12">
@@ -269,10 +328,19 @@ publicWidget.registry.AppointmentReservation = publicWidget.Widget.extend({
         });
     },
 
-    _renderSlots: function (slots) {
+    _renderSlots: function (slots, closingReason) {
         const slotsContainer = document.getElementById('slots-container');
         if (!slotsContainer) return;
 
+        if (closingReason) {
+            slotsContainer.innerHTML = `
+                <div class="col-12">
+                    <div class="alert alert-warning">${_t("Closed on this date:")} ${this._escapeHtml(closingReason)}</div>
+                </div>
+            `;
+            return;
+        }
+
         if (slots.length === 0) {
             slotsContainer.innerHTML = `
                 <div class="col-12">
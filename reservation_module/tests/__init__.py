@@ -1,2 +1,6 @@
 # -*- coding: utf-8 -*-
 from . import test_appointment_booking
+from . import test_interval_engine
+from . import test_appointment_availability
+from . import test_labels
+from . import test_controllers
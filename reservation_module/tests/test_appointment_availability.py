@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+
+class TestAppointmentAvailability(TransactionCase):
+    """Test suite for the compiled weekly availability and closing days."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff_user = cls.env['res.users'].create({
+            'name': 'Availability Staff',
+            'login': 'test_staff_availability',
+        })
+        cls.appointment_type = cls.env['appointment.type'].create({
+            'name': 'Availability Test',
+            'slot_duration': 1.0,
+            'availability_ids': [
+                (0, 0, {'dayofweek': '0', 'hour_from': 9.0, 'hour_to': 12.0}),
+                (0, 0, {'dayofweek': '0', 'hour_from': 12.0, 'hour_to': 13.5}),
+                (0, 0, {'dayofweek': '0', 'hour_from': 15.0, 'hour_to': 24.0}),
+            ],
+        })
+        cls.Availability = cls.env['appointment.availability']
+
+    def test_windows_are_merged_and_in_minutes(self):
+        """Adjacent lines merge into one window, hour_to 24 is end of day."""
+        windows = self.Availability._get_availability_windows(self.appointment_type.id)
+        self.assertEqual(windows[0], ((540, 810), (900, 1440)))
+        self.assertFalse(windows[1])
+
+    def test_unmerged_windows_for_events(self):
+        """Without merging every line stays a window of its own."""
+        windows = self.Availability._get_availability_windows(self.appointment_type.id, merge=False)
+        self.assertEqual(windows[0], ((540, 720), (720, 810), (900, 1440)))
+
+    def test_compiled_schedule_is_read_only(self):
+        """The cached schedule cannot be changed by a caller."""
+        compiled = self.Availability._get_compiled_availability(self.appointment_type.id)
+        with self.assertRaises(NotImplementedError):
+            compiled[(False, False)] = ()
+        week = compiled[(False, False)]
+        self.assertIsInstance(week, tuple)
+        self.assertTrue(all(isinstance(windows, tuple) for windows in week))
+
+    def test_staff_filter(self):
+        """Lines of another staff member are left out."""
+        other_user = self.env['res.users'].create({'name': 'Other Staff', 'login': 'test_staff_availability_2'})
+        self.Availability.create({
+            'appointment_type_id': self.appointment_type.id,
+            'dayofweek': '2', 'hour_from': 8.0, 'hour_to': 10.0,
+            'user_id': other_user.id,
+        })
+        windows = self.Availability._get_availability_windows(
+            self.appointment_type.id, staff_id=self.staff_user.id)
+        self.assertFalse(windows[2])
+        windows = self.Availability._get_availability_windows(
+            self.appointment_type.id, staff_id=other_user.id)
+        self.assertEqual(windows[2], ((480, 600),))
+
+    def test_cache_invalidated_on_changes(self):
+        """Editing or removing lines is visible in the compiled schedule."""
+        line = self.appointment_type.availability_ids.filtered(lambda a: a.hour_from == 15.0)
+        line.hour_to = 18.0
+        windows = self.Availability._get_availability_windows(self.appointment_type.id)
+        self.assertEqual(windows[0], ((540, 810), (900, 1080)))
+
+        line.unlink()
+        windows = self.Availability._get_availability_windows(self.appointment_type.id)
+        self.assertEqual(windows[0], ((540, 810),))
+
+    def test_closed_dates_cache(self):
+        """Closing days are served from the cache and follow changes."""
+        ClosingDay = self.env['appointment.closing.day']
+        day = fields.Date.today() + timedelta(days=3)
+        self.assertNotIn(day, ClosingDay._get_closed_dates(self.appointment_type.id))
+
+        closing = ClosingDay.create({
+            'appointment_type_id': self.appointment_type.id,
+            'date': day,
+            'name': 'Holiday',
+        })
+        self.assertEqual(ClosingDay._get_closed_dates(self.appointment_type.id)[day], 'Holiday')
+
+        # Read before the pending write is flushed
+        closing.name = 'Public Holiday'
+        self.assertEqual(ClosingDay._get_closed_dates(self.appointment_type.id)[day], 'Public Holiday')
+
+        closing.unlink()
+        self.assertNotIn(day, ClosingDay._get_closed_dates(self.appointment_type.id))
+
+    def test_closing_day_wizard_weekdays_batch(self):
+        """Wizard closes chosen weekdays of several types, skipping existing days."""
+        other_type = self.env['appointment.type'].create({'name': 'Availability Test 2'})
+        date_from = fields.Date.today() + timedelta(days=1)
+        date_to = date_from + timedelta(days=13)
+        sundays = [
+            date_from + timedelta(days=offset) for offset in range(14)
+            if (date_from + timedelta(days=offset)).weekday() == 6
+        ]
+        self.env['appointment.closing.day'].create({
+            'appointment_type_id': other_type.id,
+            'date': sundays[0],
+        })
+
+        wizard = self.env['appointment.closing.day.wizard'].create({
+            'appointment_type_ids': [(6, 0, [self.appointment_type.id, other_type.id])],
+            'date_from': date_from,
+            'date_to': date_to,
+            'recurrence': 'weekdays',
+            'sun': True,
+            'reason': 'Weekly rest',
+        })
+        result = wizard.action_confirm()
+        self.assertIn('%d closing day(s) added, 1 already existed' % (2 * len(sundays) - 1),
+                      result['params']['message'])
+
+        for appointment_type in (self.appointment_type, other_type):
+            closed = self.env['appointment.closing.day']._get_closed_dates(appointment_type.id)
+            self.assertEqual(sorted(d for d in closed if date_from <= d <= date_to), sundays)
+
+    def test_slot_inventory_generation_and_reset(self):
+        """The inventory job fills the horizon; schedule changes drop it."""
+        self.appointment_type.write({'slot_inventory': True, 'max_booking_days': 7})
+        Slot = self.env['appointment.slot']
+        Slot._cron_generate_inventory()
+
+        today = fields.Date.context_today(Slot)
+        self.assertEqual(self.appointment_type.slot_inventory_until, today + timedelta(days=7))
+        future_slots = Slot.search([
+            ('appointment_type_id', '=', self.appointment_type.id),
+            ('start_datetime', '>=', fields.Datetime.to_datetime(today + timedelta(days=1))),
+        ])
+        mondays = sum(1 for offset in range(1, 8) if (today + timedelta(days=offset)).weekday() == 0)
+        # 9:00-13:30 gives 4 one-hour slots, 15:00-24:00 gives 9
+        self.assertEqual(len(future_slots), 13 * mondays)
+        self.assertEqual(set(future_slots.mapped('state')), {'available'})
+
+        # A second run has nothing left to generate
+        Slot._cron_generate_inventory()
+        self.assertEqual(Slot.search_count([('id', 'in', future_slots.ids)]), len(future_slots))
+        self.assertEqual(
+            Slot.search_count([('appointment_type_id', '=', self.appointment_type.id),
+                               ('start_datetime', '>=', fields.Datetime.to_datetime(today + timedelta(days=1)))]),
+            len(future_slots))
+
+        # Closing days are checked at read time, the inventory keeps their rows
+        closing = self.env['appointment.closing.day'].create({
+            'appointment_type_id': self.appointment_type.id,
+            'date': today + timedelta(days=1),
+        })
+        closing.unlink()
+        self.assertEqual(self.appointment_type.slot_inventory_until, today + timedelta(days=7))
+        self.assertEqual(Slot.search_count([('id', 'in', future_slots.ids)]), len(future_slots))
+
+        self.appointment_type.availability_ids[:1].hour_from = 10.0
+        self.assertFalse(self.appointment_type.slot_inventory_until)
+        self.assertFalse(future_slots.exists())
+
+    def test_slot_inventory_links_location_bookings(self):
+        """Bookings of a location fill the generated slot of that location."""
+        room = self.env['resource.resource'].create({
+            'name': 'Inventory Room',
+            'resource_type': 'material',
+            'capacity': 2,
+        })
+        self.appointment_type.write({
+            'slot_inventory': True,
+            'max_booking_days': 7,
+            'min_booking_hours': 0,
+            'resource_ids': [(4, room.id)],
+        })
+        Slot = self.env['appointment.slot']
+        Slot._cron_generate_inventory()
+        today = fields.Date.context_today(Slot)
+        slot = Slot.search([
+            ('appointment_type_id', '=', self.appointment_type.id),
+            ('resource_id', '=', room.id),
+            ('start_datetime', '>=', fields.Datetime.to_datetime(today + timedelta(days=1))),
+        ], limit=1)
+        type_slot = Slot.search([
+            ('appointment_type_id', '=', self.appointment_type.id),
+            ('resource_id', '=', False),
+            ('start_datetime', '=', slot.start_datetime),
+        ])
+        self.assertEqual(slot.capacity, 2)
+
+        def book():
+            booking = self.env['appointment.booking'].create({
+                'appointment_type_id': self.appointment_type.id,
+                'guest_name': 'Inventory Guest',
+                'guest_email': 'inventory@test.com',
+                'guest_count': 1,
+                'resource_id': room.id,
+                'start_datetime': slot.start_datetime,
+                'end_datetime': slot.end_datetime,
+            })
+            booking.action_confirm()
+            return booking
+
+        booking = book()
+        self.assertEqual(booking.slot_id, slot)
+        self.assertEqual(slot.state, 'partial')
+        self.assertEqual(type_slot.state, 'available')
+        book()
+        self.assertEqual(slot.state, 'full')
+        self.assertNotIn(slot, Slot.get_available_slots(
+            self.appointment_type.id, slot.start_datetime, slot.end_datetime,
+            resource_id=room.id, exact=True))
+
+        # Moving the booking off the grid unlinks it
+        booking.write({'start_datetime': slot.start_datetime + timedelta(minutes=30),
+                       'end_datetime': slot.end_datetime + timedelta(minutes=30)})
+        self.assertFalse(booking.slot_id)
+        self.assertEqual(slot.state, 'partial')
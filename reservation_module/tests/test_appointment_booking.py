@@ -2,7 +2,11 @@
 from odoo.tests.common import TransactionCase
 from odoo.exceptions import UserError, ValidationError
 from datetime import datetime, timedelta
+from unittest.mock import patch
+from psycopg2.errors import ExclusionViolation
 from odoo import fields
+from odoo.tools import mute_logger
+from odoo.addons.reservation_module.models.appointment_slot_cache import PENDING_BUMPS, _pending_stats
 
 
 class TestAppointmentBooking(TransactionCase):
@@ -68,6 +72,35 @@ class TestAppointmentBooking(TransactionCase):
         booking.action_confirm()
         self.assertEqual(booking.state, 'confirmed')
 
+    def test_deferred_confirm_runs_side_effects_in_job(self):
+        """Deferred confirmation queues the side effects for the job worker."""
+        booking = self._create_booking()
+        booking.with_context(defer_booking_side_effects=True).action_confirm()
+        self.assertEqual(booking.state, 'confirmed')
+        self.assertFalse(booking.calendar_event_id)
+        self.assertEqual(booking.job_ids.mapped('state'), ['pending'])
+
+        self.env['appointment.booking.job']._cron_run_jobs()
+        self.assertEqual(booking.job_ids.state, 'done')
+        self.assertTrue(booking.calendar_event_id)
+
+    def test_failing_job_backs_off_then_fails(self):
+        """A failing job is rescheduled with backoff, then marked failed."""
+        booking = self._create_booking()
+        booking.action_confirm()
+        job = booking._enqueue_job('confirm')
+        Job = self.env['appointment.booking.job']
+        with patch.object(type(booking), '_run_confirm_side_effects', side_effect=UserError('boom')):
+            Job._cron_run_jobs()
+            self.assertEqual(job.state, 'pending')
+            self.assertEqual(job.attempts, 1)
+            self.assertGreater(job.next_run_at, fields.Datetime.now())
+
+            job.write({'next_run_at': fields.Datetime.now(), 'max_attempts': 2})
+            Job._cron_run_jobs()
+        self.assertEqual(job.state, 'failed')
+        self.assertIn('boom', job.last_error)
+
     def test_done_from_confirmed(self):
         """Confirmed booking can be marked done."""
         booking = self._create_booking()
@@ -88,6 +121,51 @@ class TestAppointmentBooking(TransactionCase):
         booking.action_cancel()
         self.assertEqual(booking.state, 'cancelled')
 
+    def test_mass_cancel_skips_past_deadline(self):
+        """Mass cancellation cancels what it can and reports bookings past the deadline."""
+        self.appointment_type.cancel_before_hours = 24
+        now = fields.Datetime.now()
+        late = self._create_booking(
+            start_datetime=now + timedelta(hours=2),
+            end_datetime=now + timedelta(hours=3),
+        )
+        early = self._create_booking(
+            start_datetime=now + timedelta(days=3),
+            end_datetime=now + timedelta(days=3, hours=1),
+        )
+        early.action_confirm()
+        event = early.calendar_event_id
+
+        action = (late | early).action_mass_cancel()
+
+        self.assertEqual(early.state, 'cancelled')
+        self.assertFalse(event.exists())
+        self.assertEqual(late.state, 'draft')
+        self.assertIn(late.name, action['params']['message'])
+        with self.assertRaises(UserError):
+            late.action_cancel()
+
+    def test_cancel_closing_day_bookings(self):
+        """Bookings on a closing day are cancelled, even past the deadline."""
+        self.appointment_type.write({'timezone': 'UTC', 'cancel_before_hours': 48})
+        start = fields.Datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        closed = self._create_booking(start_datetime=start, end_datetime=start + timedelta(hours=1))
+        closed.action_confirm()
+        other_day = self._create_booking(
+            start_datetime=start + timedelta(days=1),
+            end_datetime=start + timedelta(days=1, hours=1),
+        )
+        self.env['appointment.closing.day'].create({
+            'appointment_type_id': self.appointment_type.id,
+            'date': start.date(),
+            'name': 'Maintenance',
+        })
+
+        self.appointment_type.action_cancel_closing_day_bookings()
+
+        self.assertEqual(closed.state, 'cancelled')
+        self.assertEqual(other_day.state, 'draft')
+
     def test_draft_from_cancelled(self):
         """Cancelled booking can be reset to draft."""
         booking = self._create_booking()
@@ -228,6 +306,327 @@ class TestAppointmentBooking(TransactionCase):
         with self.assertRaises(UserError):
             b2.action_confirm()
 
+    def test_mass_confirm_skips_conflicts_within_batch(self):
+        """Mass confirmation confirms the first of two overlapping bookings and reports the other."""
+        now = fields.Datetime.now()
+        start = now + timedelta(days=7)
+        end = start + timedelta(hours=1)
+
+        b1 = self._create_booking(
+            staff_user_id=self.staff_user.id,
+            start_datetime=start,
+            end_datetime=end,
+        )
+        b2 = self._create_booking(
+            staff_user_id=self.staff_user.id,
+            start_datetime=start + timedelta(minutes=30),
+            end_datetime=end + timedelta(minutes=30),
+        )
+        b3 = self._create_booking(
+            start_datetime=start + timedelta(hours=3),
+            end_datetime=end + timedelta(hours=3),
+        )
+        action = (b1 | b2 | b3).action_mass_confirm()
+
+        self.assertEqual(b1.state, 'confirmed')
+        self.assertEqual(b2.state, 'draft')
+        self.assertEqual(b3.state, 'confirmed')
+        self.assertTrue(b1.calendar_event_id)
+        self.assertTrue(b3.calendar_event_id)
+        self.assertEqual(action['params']['type'], 'warning')
+        self.assertIn(b2.name, action['params']['message'])
+
+    def test_resource_capacity_uses_peak_occupancy(self):
+        """Back-to-back bookings do not add up against the location capacity."""
+        now = fields.Datetime.now().replace(minute=0, second=0, microsecond=0)
+        start = now + timedelta(days=7)
+        for offset in (0, 1):
+            b = self._create_booking(
+                resource_id=self.resource.id,
+                start_datetime=start + timedelta(hours=offset),
+                end_datetime=start + timedelta(hours=offset + 1),
+            )
+            b.action_confirm()
+
+        conflict = self.env['appointment.booking']._check_booking_conflict(
+            start_dt=start,
+            end_dt=start + timedelta(hours=2),
+            resource_id=self.resource.id,
+        )
+        self.assertFalse(conflict['resource_conflict'])
+        self.assertEqual(conflict['resource_remaining'], 1)
+
+    def test_staff_exclusion_constraint(self):
+        """With the constraint on, the database rejects staff overlaps and checks stop locking."""
+        Booking = self.env['appointment.booking']
+        self.env['ir.config_parameter'].sudo().set_param('reservation_module.staff_exclusion_constraint', 'True')
+        Booking._sync_staff_exclusion_constraint()
+        if not Booking._staff_exclusion_active():
+            self.skipTest("btree_gist is not available on this database")
+
+        start = fields.Datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=6)
+        b1 = self._create_booking(
+            staff_user_id=self.staff_user.id,
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=1),
+        )
+        b1.action_confirm()
+        b2 = self._create_booking(
+            staff_user_id=self.staff_user.id,
+            start_datetime=start + timedelta(minutes=30),
+            end_datetime=start + timedelta(hours=2),
+        )
+        with self.assertRaises(ExclusionViolation), mute_logger('odoo.sql_db'), self.env.cr.savepoint():
+            b2.write({'state': 'confirmed'})
+            b2.flush_recordset(['state'])
+        b2.invalidate_recordset()
+
+        # A batch refused by the database confirms the bookings that do not overlap
+        b3 = self._create_booking(
+            staff_user_id=self.staff_user.id,
+            start_datetime=start + timedelta(hours=3),
+            end_datetime=start + timedelta(hours=4),
+        )
+        with mute_logger('odoo.sql_db'):
+            refused = (b2 | b3)._write_confirmed_state()
+        self.assertEqual(refused, b2)
+        self.assertEqual((b2.state, b3.state), ('draft', 'confirmed'))
+
+        with patch.object(self.env.cr, 'execute', wraps=self.env.cr.execute) as execute:
+            conflict = Booking._check_booking_conflict(
+                start_dt=start, end_dt=start + timedelta(hours=1),
+                staff_user_id=self.staff_user.id, lock=True,
+            )
+        self.assertTrue(conflict['staff_conflict'])
+        self.assertFalse([
+            call for call in execute.call_args_list
+            if 'staff_user_id' in str(call.args[0]) and 'FOR UPDATE' in str(call.args[0])
+        ])
+
+        self.env['ir.config_parameter'].sudo().set_param('reservation_module.staff_exclusion_constraint', 'False')
+        Booking._sync_staff_exclusion_constraint()
+        self.assertFalse(Booking._staff_exclusion_active())
+
+        # Without it, a batch confirmation locks the staff members' bookings
+        with patch.object(self.env.cr, 'execute', wraps=self.env.cr.execute) as execute:
+            self.assertEqual(list(b2._get_batch_conflicts()), [b2.id])
+        self.assertTrue([
+            call for call in execute.call_args_list if 'FOR UPDATE OF b' in str(call.args[0])
+        ])
+
+    # ── Capacity ledger ──────────────────────────────────────────
+
+    def _ledger_snapshot(self):
+        self.env.cr.execute(
+            "SELECT bucket_start, booked_guests FROM appointment_capacity_ledger "
+            "WHERE resource_id = %s AND booked_guests > 0 ORDER BY bucket_start",
+            [self.resource.id],
+        )
+        return self.env.cr.fetchall()
+
+    def test_capacity_ledger_follows_bookings(self):
+        """Ledger tracks confirmation, reschedule and cancellation."""
+        now = fields.Datetime.now().replace(minute=0, second=0, microsecond=0)
+        start = now + timedelta(days=8)
+        booking = self._create_booking(
+            resource_id=self.resource.id,
+            guest_count=2,
+            start_datetime=start,
+            end_datetime=start + timedelta(minutes=30),
+        )
+        self.assertFalse(self._ledger_snapshot())
+
+        booking.action_confirm()
+        self.assertEqual(len(self._ledger_snapshot()), 6)
+        self.assertEqual({guests for _b, guests in self._ledger_snapshot()}, {2})
+
+        booking.write({'end_datetime': start + timedelta(minutes=45)})
+        self.assertEqual(len(self._ledger_snapshot()), 9)
+
+        booking.action_cancel()
+        self.assertFalse(self._ledger_snapshot())
+
+    def test_capacity_ledger_rebuild(self):
+        """Rebuilding the ledger gives the incrementally maintained state."""
+        now = fields.Datetime.now().replace(minute=0, second=0, microsecond=0)
+        start = now + timedelta(days=9, minutes=7)
+        for guests in (1, 2):
+            b = self._create_booking(
+                resource_id=self.resource.id,
+                guest_count=guests,
+                start_datetime=start,
+                end_datetime=start + timedelta(minutes=50),
+            )
+            b.action_confirm()
+        expected = self._ledger_snapshot()
+        self.assertTrue(expected)
+
+        self.env['appointment.capacity.ledger']._rebuild()
+        self.assertEqual(self._ledger_snapshot(), expected)
+
+    def test_capacity_ledger_off_grid_end(self):
+        """A booking ending off the bucket grid holds the bucket of its end."""
+        now = fields.Datetime.now().replace(minute=0, second=0, microsecond=0)
+        start = now + timedelta(days=9)
+        self._create_booking(
+            resource_id=self.resource.id,
+            guest_count=2,
+            start_datetime=start,
+            end_datetime=start + timedelta(minutes=52),
+        ).action_confirm()
+        snapshot = dict(self._ledger_snapshot())
+        self.assertEqual(len(snapshot), 11)
+        self.assertEqual(snapshot[start + timedelta(minutes=50)], 2)
+
+        Booking = self.env['appointment.booking']
+        conflict = Booking._check_booking_conflict(
+            start_dt=start + timedelta(minutes=50),
+            end_dt=start + timedelta(minutes=55),
+            resource_id=self.resource.id,
+        )
+        self.assertTrue(conflict['resource_conflict'])
+        # Off the grid, a booking starting in that bucket conflicts as well
+        conflict = Booking._check_booking_conflict(
+            start_dt=start + timedelta(minutes=52),
+            end_dt=start + timedelta(minutes=90),
+            resource_id=self.resource.id,
+        )
+        self.assertEqual(conflict['resource_remaining'], 0)
+        conflict = Booking._check_booking_conflict(
+            start_dt=start + timedelta(minutes=55),
+            end_dt=start + timedelta(minutes=90),
+            resource_id=self.resource.id,
+        )
+        self.assertEqual(conflict['resource_remaining'], 2)
+
+    def test_capacity_ledger_history_read_from_bookings(self):
+        """Periods before the retention horizon are checked against the bookings."""
+        Ledger = self.env['appointment.capacity.ledger']
+        now = fields.Datetime.now().replace(minute=0, second=0, microsecond=0)
+        start = now - timedelta(days=3)
+        self._create_booking(
+            resource_id=self.resource.id,
+            guest_count=2,
+            state='confirmed',
+            start_datetime=start,
+            end_datetime=start + timedelta(minutes=52),
+        )
+        Ledger._prune()
+        self.assertFalse(self._ledger_snapshot())
+
+        booked = Ledger._get_booked_by_bucket(
+            self.resource.id, start + timedelta(minutes=45), start + timedelta(hours=1), lock=True)
+        self.assertEqual(booked, {start + timedelta(minutes=45): 2, start + timedelta(minutes=50): 2})
+        conflict = self.env['appointment.booking']._check_booking_conflict(
+            start_dt=start + timedelta(minutes=50),
+            end_dt=start + timedelta(minutes=55),
+            resource_id=self.resource.id,
+        )
+        self.assertTrue(conflict['resource_conflict'])
+
+    def test_capacity_ledger_prune(self):
+        """Pruning drops past buckets and the empty ones left by locked reads."""
+        Ledger = self.env['appointment.capacity.ledger']
+        now = fields.Datetime.now().replace(minute=0, second=0, microsecond=0)
+        Ledger._get_booked_by_bucket(self.resource.id, now + timedelta(days=9), now + timedelta(days=9, hours=1), lock=True)
+        Ledger._add(self.resource.id, now - timedelta(days=3), now - timedelta(days=3, minutes=-30), 1)
+        future = now + timedelta(days=10)
+        Ledger._add(self.resource.id, future, future + timedelta(minutes=30), 1)
+
+        Ledger._prune()
+        self.env.cr.execute(
+            "SELECT MIN(bucket_start), COUNT(*) FROM appointment_capacity_ledger WHERE resource_id = %s",
+            [self.resource.id],
+        )
+        self.assertEqual(self.env.cr.fetchone(), (future, 6))
+
+    # ── Auto-assignment ──────────────────────────────────────────
+
+    def test_auto_assign_staff_skips_conflicts_and_balances_load(self):
+        """Auto-assignment skips busy staff and picks the least loaded one."""
+        staff_2, staff_3 = self.env['res.users'].create([
+            {'name': 'Staff Two', 'login': 'test_staff_appt_2'},
+            {'name': 'Staff Three', 'login': 'test_staff_appt_3'},
+        ])
+        self.appointment_type.staff_user_ids = [(4, staff_2.id), (4, staff_3.id)]
+        start = fields.Datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=10)
+        end = start + timedelta(hours=1)
+
+        # staff_user is busy at that time, staff_2 has another booking later on
+        self._create_booking(
+            staff_user_id=self.staff_user.id, start_datetime=start, end_datetime=end,
+        ).action_confirm()
+        self._create_booking(
+            staff_user_id=staff_2.id,
+            start_datetime=start + timedelta(hours=3),
+            end_datetime=end + timedelta(hours=3),
+        ).action_confirm()
+
+        booking = self._create_booking(start_datetime=start, end_datetime=end)
+        booking._auto_assign_staff()
+        self.assertEqual(booking.staff_user_id, staff_3)
+
+    def test_auto_assign_staff_round_robin(self):
+        """Round robin picks the staff member assigned the longest ago."""
+        staff_2 = self.env['res.users'].create({'name': 'Staff Two', 'login': 'test_staff_appt_rr'})
+        self.appointment_type.write({
+            'staff_user_ids': [(4, staff_2.id)],
+            'staff_assignment_policy': 'round_robin',
+        })
+        start = fields.Datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=11)
+        self._create_booking(
+            staff_user_id=self.staff_user.id,
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=1),
+        ).action_confirm()
+
+        booking = self._create_booking(
+            start_datetime=start + timedelta(hours=2),
+            end_datetime=start + timedelta(hours=3),
+        )
+        booking._auto_assign_staff()
+        self.assertEqual(booking.staff_user_id, staff_2)
+
+    def test_auto_assign_location_best_fit(self):
+        """Best fit seats the party at the smallest location that fits it."""
+        hall = self.env['resource.resource'].create({
+            'name': 'Test Hall',
+            'resource_type': 'material',
+            'capacity': 6,
+        })
+        self.appointment_type.write({
+            'resource_ids': [(6, 0, [hall.id, self.resource.id])],
+            'location_assignment_policy': 'best_fit',
+        })
+        start = fields.Datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=12)
+        end = start + timedelta(hours=1)
+
+        couple = self._create_booking(guest_count=2, start_datetime=start, end_datetime=end)
+        couple._auto_assign_location()
+        self.assertEqual(couple.resource_id, self.resource)
+        couple.action_confirm()
+
+        # The room is now full, the next party goes to the hall
+        party = self._create_booking(guest_count=2, start_datetime=start, end_datetime=end)
+        party._auto_assign_location()
+        self.assertEqual(party.resource_id, hall)
+
+    # ── Soft-coupled integrations ────────────────────────────────
+
+    def test_module_capabilities_cached(self):
+        """Capabilities are resolved once and follow module state changes."""
+        Module = self.env['ir.module.module']
+        capabilities = Module._get_appointment_capabilities()
+        self.assertIsInstance(capabilities, frozenset)
+        with self.assertQueryCount(0):
+            Module._has_appointment_capability('portal_discuss')
+
+        # Parameter writes clear the cache, the payment flow sees the switch
+        self.env['ir.config_parameter'].sudo().set_param('sale.automatic_invoice', True)
+        self.assertTrue(Module._has_appointment_capability('automatic_invoice'))
+        self.env['ir.config_parameter'].sudo().set_param('sale.automatic_invoice', False)
+        self.assertFalse(Module._has_appointment_capability('automatic_invoice'))
+
     # ── Payment status on cancellation ───────────────────────────
 
     def test_cancel_pending_payment_resets_status(self):
@@ -316,6 +715,65 @@ class TestAppointmentBooking(TransactionCase):
         booking.invalidate_recordset()
         self.assertFalse(booking.reminder_sent)
 
+    def test_cron_reminders_in_batches(self):
+        """Each cron call claims at most one batch, the next call continues."""
+        self.appointment_type.reminder_hours = 24
+        now = fields.Datetime.now()
+        bookings = self.env['appointment.booking']
+        for hours in (2, 3, 4):
+            booking = self._create_booking(
+                start_datetime=now + timedelta(hours=hours),
+                end_datetime=now + timedelta(hours=hours, minutes=30),
+            )
+            booking.action_confirm()
+            bookings |= booking
+
+        self.env['appointment.booking']._cron_send_reminders(batch_size=2)
+        self.assertEqual(bookings.mapped('reminder_sent'), [True, True, False])
+
+        self.env['appointment.booking']._cron_send_reminders(batch_size=2)
+        self.assertTrue(all(bookings.mapped('reminder_sent')))
+
+    def test_reminder_due_at_follows_reschedule(self):
+        """Rescheduling moves the reminder due time and re-arms the reminder."""
+        self.appointment_type.reminder_hours = 24
+        now = fields.Datetime.now()
+        booking = self._create_booking(
+            start_datetime=now + timedelta(hours=12),
+            end_datetime=now + timedelta(hours=13),
+        )
+        booking.action_confirm()
+        self.assertEqual(booking.reminder_due_at, booking.start_datetime - timedelta(hours=24))
+        self.env['appointment.booking']._cron_send_reminders()
+        self.assertTrue(booking.reminder_sent)
+
+        new_start = now + timedelta(days=3)
+        booking.write({'start_datetime': new_start, 'end_datetime': new_start + timedelta(hours=1)})
+        self.assertFalse(booking.reminder_sent)
+        self.assertEqual(booking.reminder_due_at, new_start - timedelta(hours=24))
+
+        self.env['appointment.booking']._cron_send_reminders()
+        self.assertFalse(booking.reminder_sent)
+
+    def test_reminder_hours_only_move_pending_reminders(self):
+        """Changing the reminder delay of a type leaves past bookings alone."""
+        self.appointment_type.reminder_hours = 24
+        now = fields.Datetime.now()
+        pending = self._create_booking(
+            start_datetime=now + timedelta(days=3),
+            end_datetime=now + timedelta(days=3, hours=1),
+        )
+        pending.action_confirm()
+        past = self._create_booking(
+            start_datetime=now - timedelta(days=3),
+            end_datetime=now - timedelta(days=3, hours=-1),
+        )
+        past_due_at = past.reminder_due_at
+
+        self.appointment_type.reminder_hours = 2
+        self.assertEqual(pending.reminder_due_at, pending.start_datetime - timedelta(hours=2))
+        self.assertEqual(past.reminder_due_at, past_due_at)
+
     # ── Duration compute ─────────────────────────────────────────
 
     def test_duration_computed(self):
@@ -326,3 +784,192 @@ class TestAppointmentBooking(TransactionCase):
             end_datetime=now + timedelta(days=1, hours=2),
         )
         self.assertAlmostEqual(booking.duration, 2.0, places=1)
+
+    # ── Booking counters ─────────────────────────────────────────
+
+    def test_type_booking_counts(self):
+        """Type counters ignore cancelled bookings and split out upcoming ones."""
+        now = fields.Datetime.now()
+        self._create_booking()
+        self._create_booking(start_datetime=now - timedelta(days=2), end_datetime=now - timedelta(days=2, hours=-1))
+        self._create_booking().action_cancel()
+        self.appointment_type.invalidate_recordset(['booking_count', 'upcoming_booking_count'])
+        self.assertEqual(self.appointment_type.booking_count, 2)
+        self.assertEqual(self.appointment_type.upcoming_booking_count, 1)
+
+    # ── Location statistics ──────────────────────────────────────
+
+    def test_resource_booking_stats(self):
+        """Resource counters and weekly occupancy come from grouped queries."""
+        self.env['appointment.availability'].create([{
+            'appointment_type_id': self.appointment_type.id,
+            'dayofweek': str(day),
+            'hour_from': 8.0,
+            'hour_to': 18.0,
+        } for day in range(7)])
+        week_start = self.resource._get_utilization_periods()['week'][2]
+        booking = self._create_booking(
+            resource_id=self.resource.id,
+            start_datetime=week_start + timedelta(hours=9),
+            end_datetime=week_start + timedelta(hours=11),
+        )
+        booking.action_confirm()
+        self._create_booking(resource_id=self.resource.id)
+
+        # A location with a line of its own, computed in the same batch
+        other = self.env['resource.resource'].create({
+            'name': 'Other Room',
+            'resource_type': 'material',
+            'appointment_type_ids': [(4, self.appointment_type.id)],
+        })
+        self.env['appointment.availability'].create({
+            'appointment_type_id': self.appointment_type.id,
+            'dayofweek': '0',
+            'hour_from': 18.0,
+            'hour_to': 20.0,
+            'resource_id': other.id,
+        })
+
+        resources = self.resource | other
+        resources.invalidate_recordset()
+        self.assertEqual(self.resource.booking_count, 2)
+        self.assertAlmostEqual(self.resource.week_booked_hours, 2.0)
+        # 2 guest-hours over capacity 2 x 70 open hours
+        self.assertAlmostEqual(self.resource.week_utilization, 100.0 * 2 / 140)
+        self.assertEqual(resources._get_open_minutes_by_resource()[other.id][0], 720)
+        self.assertEqual(resources._get_open_minutes_by_resource()[self.resource.id][0], 600)
+        self.assertEqual(other.week_utilization, 0.0)
+
+    # ── Slot occupancy ───────────────────────────────────────────
+
+    def test_slot_occupancy(self):
+        """Slot occupancy follows booking states and can be rebuilt in chunks."""
+        now = fields.Datetime.now()
+        slot = self.env['appointment.slot'].create({
+            'appointment_type_id': self.appointment_type.id,
+            'start_datetime': now + timedelta(days=4),
+            'end_datetime': now + timedelta(days=4, hours=1),
+            'capacity': 3,
+        })
+        booking = self._create_booking(
+            slot_id=slot.id, guest_count=2,
+            start_datetime=slot.start_datetime, end_datetime=slot.end_datetime,
+        )
+        self.assertEqual(slot.state, 'available')
+        booking.action_confirm()
+        self.assertEqual((slot.booked_count, slot.available_count, slot.state), (2, 1, 'partial'))
+
+        self.env.cr.execute("UPDATE appointment_slot SET booked_count = 0, state = 'available' WHERE id = %s", [slot.id])
+        slot.invalidate_recordset()
+        self.env['appointment.slot']._recompute_occupancy([('id', '=', slot.id)], chunk_size=1)
+        self.assertEqual((slot.booked_count, slot.state), (2, 'partial'))
+
+    # ── Rate limiting ────────────────────────────────────────────
+
+    def test_rate_limit_counts_attempts_per_key(self):
+        """The limiter counts every attempt of a key within its window."""
+        RateLimit = self.env['appointment.rate.limit']
+        self.assertTrue(RateLimit._hit('test:ip:10.0.0.1', 2, 60))
+        self.assertTrue(RateLimit._hit('test:ip:10.0.0.1', 2, 60))
+        self.assertFalse(RateLimit._hit('test:ip:10.0.0.1', 2, 60))
+        self.assertTrue(RateLimit._hit('test:ip:10.0.0.2', 2, 60))
+
+        # Earlier minutes count while they are in the window
+        self.env.cr.execute(
+            "UPDATE appointment_rate_limit SET bucket_start = bucket_start - interval '2 minutes' WHERE key = %s",
+            ['test:ip:10.0.0.2'],
+        )
+        self.assertTrue(RateLimit._hit('test:ip:10.0.0.2', 1, 1))
+        self.assertFalse(RateLimit._hit('test:ip:10.0.0.2', 2, 3))
+
+        # Hits spread over the shards of a bucket add up
+        with patch('odoo.addons.reservation_module.models.appointment_rate_limit.random.randrange',
+                   side_effect=[0, 1, 1]):
+            self.assertTrue(RateLimit._hit('json:ip:10.0.0.3', 2, 1))
+            self.assertTrue(RateLimit._hit('json:ip:10.0.0.3', 2, 1))
+            self.assertFalse(RateLimit._hit('json:ip:10.0.0.3', 2, 1))
+        self.assertEqual(RateLimit.search_count([('key', '=', 'json:ip:10.0.0.3')]), 2)
+
+        self.env['ir.config_parameter'].sudo().set_param('reservation_module.rate_limit.json_ip', '30/5')
+        self.assertEqual(RateLimit._get_limit('json_ip'), (30, 5))
+        self.assertEqual(RateLimit._get_limit('booking_ip'), (20, 60))
+
+    # ── Slot cache versions ──────────────────────────────────────
+
+    def _commit_slot_versions(self):
+        """Run the version bumps the test transaction would do after its commit."""
+        pending = self.env.cr.postcommit.data.pop(PENDING_BUMPS, set())
+        self.env['appointment.slot.version']._increment(pending)
+
+    def test_slot_versions_follow_bookings(self):
+        """Confirming, moving and cancelling a booking bump the slot cache versions after commit."""
+        SlotVersion = self.env['appointment.slot.version']
+        start = datetime.combine(fields.Date.today() + timedelta(days=3), datetime.min.time()) + timedelta(hours=10)
+        day = start.date()
+        booking = self._create_booking(
+            resource_id=self.resource.id, staff_user_id=self.staff_user.id,
+            start_datetime=start, end_datetime=start + timedelta(hours=1),
+        )
+        # Draft bookings do not hold slots
+        self._commit_slot_versions()
+        self.assertEqual(SlotVersion._get_versions(self.resource.id, self.staff_user.id, day, day), {})
+
+        booking.action_confirm()
+        # Nothing is written in the booking transaction itself
+        self.assertEqual(SlotVersion._get_versions(self.resource.id, self.staff_user.id, day, day), {})
+        self._commit_slot_versions()
+        self.assertEqual(
+            SlotVersion._get_versions(self.resource.id, self.staff_user.id, day, day),
+            {('resource', day): 1, ('staff', day): 1},
+        )
+
+        booking.write({'start_datetime': start + timedelta(days=1), 'end_datetime': start + timedelta(days=1, hours=1)})
+        self._commit_slot_versions()
+        next_day = day + timedelta(days=1)
+        versions = SlotVersion._get_versions(self.resource.id, False, day, next_day)
+        self.assertEqual(versions, {('resource', day): 2, ('resource', next_day): 1})
+
+        booking.write({'guest_name': 'Renamed Guest'})
+        self._commit_slot_versions()
+        self.assertEqual(SlotVersion._get_versions(self.resource.id, False, day, next_day), versions)
+
+        booking.action_cancel()
+        self._commit_slot_versions()
+        self.assertEqual(SlotVersion._get_versions(self.resource.id, False, next_day, next_day),
+                         {('resource', next_day): 2})
+
+    def test_slot_cache_stats_flush(self):
+        """Cache statistics are written apart and stay pending when the write fails."""
+        SlotVersion = self.env['appointment.slot.version']
+        Stat = self.env['appointment.slot.cache.stat']
+
+        def written_misses():
+            Stat.invalidate_model()
+            return sum(Stat.search([]).mapped('misses'))
+
+        SlotVersion._flush_stats(force=True)
+        SlotVersion._cache_get((self.env.cr.dbname, 'no such key'))
+        before, pending = written_misses(), _pending_stats['misses']
+        self.assertGreaterEqual(pending, 1)
+
+        with patch.object(type(Stat), '_add', side_effect=Exception('write failed')), \
+                mute_logger('odoo.addons.reservation_module.models.appointment_slot_cache'):
+            SlotVersion._flush_stats(force=True)
+        self.assertEqual(written_misses(), before)
+        self.assertEqual(_pending_stats['misses'], pending)
+
+        SlotVersion._flush_stats(force=True)
+        self.assertEqual(written_misses(), before + pending)
+        self.assertEqual(_pending_stats['misses'], 0)
+
+    # ── Guest partners ───────────────────────────────────────────
+
+    def test_guest_partner_matched_on_normalized_email(self):
+        """Guest bookings reuse the partner of an address whatever its case."""
+        Partner = self.env['res.partner']
+        partner = Partner._appointment_get_guest_partner('Walk.In@Example.com', 'Walk In', '0912345678')
+        self.assertEqual(partner.email, 'Walk.In@Example.com')
+        self.assertEqual(Partner._appointment_get_guest_partner('walk.in@example.com', 'Walk In'), partner)
+        self.assertEqual(Partner._appointment_get_guest_partner(' WALK.IN@EXAMPLE.COM ', 'Walk In'), partner)
+        self.assertEqual(
+            self.env['appointment.guest.claim'].search_count([('email_normalized', '=', 'walk.in@example.com')]), 1)
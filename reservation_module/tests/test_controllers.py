@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tests.common import HttpCase
+from odoo.addons.reservation_module.controllers.main import CSRF_PLACEHOLDER, MAX_SLOT_RANGE_DAYS, _page_cache
+
+
+@tagged('post_install', '-at_install')
+class TestAppointmentControllers(HttpCase):
+    """Test suite for the public appointment routes."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.appointment_type = cls.env['appointment.type'].create({
+            'name': 'Controller Test',
+            'slot_duration': 1.0,
+            'min_booking_hours': 0,
+            'is_published': True,
+            'availability_ids': [
+                (0, 0, {'dayofweek': str(weekday), 'hour_from': 9.0, 'hour_to': 12.0})
+                for weekday in range(7)
+            ],
+        })
+
+    def _json_call(self, route, **params):
+        response = self.url_open(
+            route,
+            data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params}),
+            headers={'Content-Type': 'application/json'},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['result']
+
+    # ── /slots_range ─────────────────────────────────────────────
+
+    def test_slots_range_days_and_closing_reason(self):
+        """Every day of the range is returned, closing days with their reason."""
+        date_from = fields.Date.today() + timedelta(days=2)
+        self.env['appointment.closing.day'].create({
+            'appointment_type_id': self.appointment_type.id,
+            'date': date_from + timedelta(days=1),
+            'name': 'Inventory',
+        })
+        days = self._json_call(
+            f'/appointment/{self.appointment_type.id}/slots_range',
+            date_from=str(date_from), date_to=str(date_from + timedelta(days=2)),
+        )['days']
+
+        self.assertEqual(sorted(days), [str(date_from + timedelta(days=offset)) for offset in range(3)])
+        self.assertEqual(len(days[str(date_from)]['slots']), 3)
+        closed = days[str(date_from + timedelta(days=1))]
+        self.assertEqual((closed['slots'], closed['closing_reason']), ([], 'Inventory'))
+
+    def test_slots_range_is_capped(self):
+        """A single call computes at most MAX_SLOT_RANGE_DAYS days."""
+        date_from = fields.Date.today() + timedelta(days=1)
+        days = self._json_call(
+            f'/appointment/{self.appointment_type.id}/slots_range',
+            date_from=str(date_from), date_to=str(date_from + timedelta(days=365)),
+        )['days']
+        self.assertEqual(len(days), MAX_SLOT_RANGE_DAYS)
+        self.assertEqual(max(days), str(date_from + timedelta(days=MAX_SLOT_RANGE_DAYS - 1)))
+
+    def test_slots_range_invalid_dates(self):
+        """Malformed and reversed ranges are rejected."""
+        route = f'/appointment/{self.appointment_type.id}/slots_range'
+        self.assertEqual(self._json_call(route, date_from='2026-13-01', date_to='2026-12-31'),
+                         {'error': 'Invalid date format'})
+        self.assertEqual(self._json_call(route, date_from=None, date_to='2026-12-31'),
+                         {'error': 'Invalid date format'})
+        self.assertEqual(self._json_call(route, date_from='2026-12-31', date_to='2026-12-01'),
+                         {'error': 'Invalid date range'})
+        self.assertEqual(self._json_call('/appointment/0/slots_range', date_from='2026-12-01', date_to='2026-12-31'),
+                         {'error': 'Appointment type not found'})
+
+    # ── Conditional GET ──────────────────────────────────────────
+
+    def _get_etag(self, url):
+        response = self.url_open(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response.headers['Cache-Control'])
+        return response.headers['ETag']
+
+    def test_type_page_not_modified(self):
+        """A revalidation with the current ETag gets a 304 without a body."""
+        url = f'/appointment/{self.appointment_type.id}'
+        etag = self._get_etag(url)
+
+        response = self.url_open(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+        response = self.url_open(url, headers={'If-None-Match': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_type_page_shared_by_anonymous_visitors(self):
+        """Anonymous visitors share the ETag and the cached body, not the CSRF token."""
+        url = f'/appointment/{self.appointment_type.id}/schedule'
+        _page_cache.clear()
+        first = self.url_open(url)
+        self.assertEqual(len(_page_cache), 1)
+        self.assertNotIn(CSRF_PLACEHOLDER, first.text)
+
+        # A new visitor session, served from the worker cache
+        self.opener.cookies.clear()
+        second = self.url_open(url)
+        self.assertEqual(len(_page_cache), 1)
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+        self.assertNotIn(CSRF_PLACEHOLDER, second.text)
+
+        # Closing days are part of the fingerprint
+        self.env['appointment.closing.day'].create({
+            'appointment_type_id': self.appointment_type.id,
+            'date': fields.Date.today() + timedelta(days=5),
+        })
+        self.env.flush_all()
+        self.assertNotEqual(self._get_etag(url), first.headers['ETag'])
+
+    def test_type_page_etag_follows_changes(self):
+        """Configuration changes give a new ETag, bookings do not show on the page."""
+        url = f'/appointment/{self.appointment_type.id}'
+        etag = self._get_etag(url)
+
+        start = fields.Datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=3)
+        self.env['appointment.booking'].create({
+            'appointment_type_id': self.appointment_type.id,
+            'guest_name': 'ETag Guest',
+            'guest_email': 'etag@test.com',
+            'start_datetime': start,
+            'end_datetime': start + timedelta(hours=1),
+        }).action_confirm()
+        self.assertEqual(self._get_etag(url), etag)
+
+        self.appointment_type.availability_ids[:1].hour_to = 11.0
+        self.env.flush_all()
+        new_etag = self._get_etag(url)
+        self.assertNotEqual(new_etag, etag)
+
+        # A later transaction: the test one writes every record at the same time
+        self.appointment_type.name = 'Controller Test Renamed'
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE appointment_type SET write_date = write_date + interval '1 minute' WHERE id = %s",
+            [self.appointment_type.id],
+        )
+        self.assertNotEqual(self._get_etag(url), new_etag)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.reservation_module.tools.intervals import IntervalIndex, to_epoch
+
+
+class TestIntervalEngine(TransactionCase):
+    """Test suite for the slot overlap engine."""
+
+    def test_overlap_counts_and_weights(self):
+        """Overlap returns the number and summed weight of overlapping intervals."""
+        index = IntervalIndex([(0, 10, 2), (5, 15, 3), (20, 30, 1)])
+        self.assertEqual(index.overlap(0, 5), (1, 2))
+        self.assertEqual(index.overlap(5, 10), (2, 5))
+        self.assertEqual(index.overlap(10, 20), (1, 3))
+        self.assertEqual(index.overlap(15, 20), (0, 0))
+
+    def test_touching_intervals_do_not_overlap(self):
+        """Half-open intervals that only touch are not conflicts."""
+        index = IntervalIndex([(10, 20, 1)])
+        self.assertEqual(index.overlap(0, 10), (0, 0))
+        self.assertEqual(index.overlap(20, 30), (0, 0))
+
+    def test_sweep_matches_brute_force(self):
+        """Sweeping a grid gives the same answer as checking every interval."""
+        intervals = [(3, 9, 1), (4, 6, 2), (8, 20, 1), (15, 16, 4), (30, 31, 1)]
+        index = IntervalIndex(intervals)
+        grid = [(start, start + 5) for start in range(0, 35, 2)]
+        expected = []
+        for start, end in grid:
+            hits = [w for s, e, w in intervals if s < end and e > start]
+            expected.append((len(hits), sum(hits)))
+        self.assertEqual(index.sweep(grid), expected)
+        # Unsorted input must not break the forward pass
+        self.assertEqual(index.sweep(grid[::-1]), expected[::-1])
+
+    def test_ignores_empty_intervals(self):
+        """Zero-length or inverted intervals are dropped."""
+        index = IntervalIndex([(5, 5, 1), (9, 3, 1)])
+        self.assertFalse(index)
+        self.assertEqual(index.overlap(0, 100), (0, 0))
+
+    def test_to_epoch_naive_is_utc(self):
+        """Naive datetimes are interpreted as UTC like stored Odoo datetimes."""
+        start = datetime(2026, 1, 1, 10, 0)
+        self.assertEqual(to_epoch(start + timedelta(hours=1)) - to_epoch(start), 3600)
+        self.assertEqual(to_epoch(datetime(1970, 1, 1)), 0)
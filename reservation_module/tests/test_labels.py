@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.reservation_module.tools.labels import LABELS, LABEL_CATALOGS, get_labels
+
+
+class TestLabels(TransactionCase):
+    """Test suite for the compiled website label catalogs."""
+
+    def test_catalogs_cover_every_label(self):
+        """Each shipped language translates every label."""
+        self.assertIn('zh_TW', LABEL_CATALOGS)
+        self.assertIn('zh_CN', LABEL_CATALOGS)
+        for lang, catalog in LABEL_CATALOGS.items():
+            self.assertEqual(set(catalog), set(LABELS), lang)
+
+    def test_lookup_by_language(self):
+        """Labels follow the exact language, with fallbacks and English otherwise."""
+        self.assertEqual(get_labels('zh_TW')['book_now'], '立即預約')
+        self.assertEqual(get_labels('zh_CN')['book_now'], '立即预约')
+        self.assertIs(get_labels('zh_HK'), get_labels('zh_TW'))
+        self.assertEqual(get_labels('fr_FR')['book_now'], 'Book Now')
+        self.assertEqual(get_labels(None)['book_now'], 'Book Now')
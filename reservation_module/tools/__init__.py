@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+from . import intervals
+from . import labels
+from . import migration
+from . import transaction
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Overlap engine for slot availability.
+
+Works on plain tuples of epoch seconds so that slot generation never has to
+read ORM fields inside its inner loop. Booking intervals are sorted once;
+the overlap count (and the summed weight, e.g. guest count) of any query
+interval is then a difference of two prefix sums.
+"""
+
+import calendar
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+
+def to_epoch(dt):
+    """Convert a datetime (naive UTC or tz-aware) to integer epoch seconds."""
+    return calendar.timegm(dt.utctimetuple())
+
+
+class IntervalIndex:
+    """Immutable index over half-open intervals [start, end) with a weight.
+
+    An interval overlaps [qs, qe) iff start < qe and end > qs. Since every
+    interval has start < end, the overlapping ones are exactly those with
+    start < qe minus those with end <= qs, which two sorted arrays and their
+    prefix sums answer without looking at individual intervals.
+    """
+
+    __slots__ = ('_starts', '_ends', '_start_weights', '_end_weights')
+
+    def __init__(self, intervals=()):
+        """intervals: iterable of (start, end, weight) with epoch-second bounds.
+
+        Empty or inverted intervals are ignored.
+        """
+        by_start = []
+        by_end = []
+        for start, end, weight in intervals:
+            if end > start:
+                by_start.append((start, weight))
+                by_end.append((end, weight))
+        by_start.sort()
+        by_end.sort()
+        self._starts = [start for start, _weight in by_start]
+        self._ends = [end for end, _weight in by_end]
+        self._start_weights = list(accumulate((weight for _start, weight in by_start), initial=0))
+        self._end_weights = list(accumulate((weight for _end, weight in by_end), initial=0))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def overlap(self, start, end):
+        """Return (count, weight) of the intervals overlapping [start, end)."""
+        started = bisect_left(self._starts, end)
+        ended = bisect_right(self._ends, start)
+        return (
+            started - ended,
+            self._start_weights[started] - self._end_weights[ended],
+        )
+
+    def sweep(self, slots):
+        """Return [(count, weight), ...] for each (start, end) of slots.
+
+        A slot grid sorted by start and end is answered in a single forward
+        pass over the sorted intervals; any step backwards simply restarts
+        the corresponding pointer, so unsorted input stays correct.
+        """
+        starts, ends = self._starts, self._ends
+        total = len(starts)
+        started = ended = 0
+        prev_start = prev_end = None
+        result = []
+        for start, end in slots:
+            if prev_end is not None and end < prev_end:
+                started = 0
+            if prev_start is not None and start < prev_start:
+                ended = 0
+            while started < total and starts[started] < end:
+                started += 1
+            while ended < total and ends[ended] <= start:
+                ended += 1
+            result.append((
+                started - ended,
+                self._start_weights[started] - self._end_weights[ended],
+            ))
+            prev_start, prev_end = start, end
+        return result
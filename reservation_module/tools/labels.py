@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Labels of the public booking and portal pages.
+
+English labels live here; their translations are entries of the shipped
+``i18n/<lang>.po`` files with ``msgctxt "website_label:<key>"``. Every
+catalog is compiled once when the module is loaded, into an immutable
+mapping per language, so a page render only does one keyed lookup.
+Supporting a language means shipping its .po file with these entries.
+
+The entries carry no source reference, the ORM translation import skips
+them; they are not regenerated by a translation export either, keep them
+in the .pot and .po files by hand.
+"""
+
+import logging
+import os
+
+import polib
+
+from odoo.tools import frozendict
+
+_logger = logging.getLogger(__name__)
+
+LABEL_CONTEXT_PREFIX = 'website_label:'
+
+I18N_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'i18n')
+
+# Languages served with the catalog of a close one when none is shipped
+LANGUAGE_FALLBACKS = {
+    'zh_HK': 'zh_TW',
+}
+
+LABELS = frozendict({
+    'book_an_appointment': 'Book an Appointment',
+    'book_now': 'Book Now',
+    'hours': 'hour(s)',
+    'no_appointment_types': 'No appointment types available at the moment.',
+    'appointments': 'Appointments',
+    'select_date_time': 'Select Date & Time',
+    'select_location': 'Select Location',
+    'select_staff': 'Select Staff',
+    'seats': 'seats',
+    'loading_slots': 'Loading available slots...',
+    'available_times': 'Available Times',
+    'book': 'Book',
+    'complete_booking': 'Complete Your Booking',
+    'name': 'Name',
+    'email': 'Email',
+    'phone': 'Phone',
+    'number_of_guests': 'Number of Guests',
+    'select_option': '-- Select --',
+    'notes': 'Notes',
+    'payment_of': 'Payment of',
+    'per_person': 'per person',
+    'payment_required': 'will be required to confirm your booking.',
+    'continue_to_payment': 'Continue to Payment',
+    'confirm_booking': 'Confirm Booking',
+    'booking_confirmed': 'Booking Confirmed!',
+    'booking_reference': 'Your booking reference is:',
+    'appointment_label': 'Appointment:',
+    'date_time': 'Date & Time:',
+    'location_label': 'Location:',
+    'staff_label': 'Staff:',
+    'guests_label': 'Guests:',
+    'confirmation_email_sent': 'A confirmation email has been sent to',
+    'book_another': 'Book Another Appointment',
+    'booking': 'Booking',
+    'appointment_details': 'Appointment Details',
+    'type_label': 'Type:',
+    'guest_information': 'Guest Information',
+    'name_label': 'Name:',
+    'email_label': 'Email:',
+    'phone_label': 'Phone:',
+    'guests_count_label': 'Number of Guests:',
+    'cancel_booking': 'Cancel Booking',
+    'cancel_booking_question': 'Cancel Booking?',
+    'cancel_confirm_msg': 'Are you sure you want to cancel your booking?',
+    'booking_reference_label': 'Booking Reference:',
+    'yes_cancel': 'Yes, Cancel Booking',
+    'no_keep': 'No, Keep Booking',
+    'booking_cancelled': 'Booking Cancelled',
+    'your_booking': 'Your booking',
+    'has_been_cancelled': 'has been cancelled.',
+    'book_new_appointment': 'Book a New Appointment',
+    'payment': 'Payment',
+    'booking_summary': 'Booking Summary',
+    'amount_due': 'Amount Due',
+    'select_payment_method': 'Select a payment method to complete your booking.',
+    'pay_with': 'Pay with',
+    'no_payment_methods': 'No payment methods available. Please contact us to complete your booking.',
+    'faq_title': 'Frequently Asked Questions',
+    'auto_assign': 'Auto-Assign',
+    'special_event': 'Special Event',
+    'scheduled_appointment': 'Scheduled Appointment',
+    'join_meeting': 'Join Meeting',
+    'online_meeting': 'Online Meeting',
+    'online_meeting_label': 'This is an online meeting. Use the link below to join at the scheduled time:',
+    'meeting_link_available': 'Meeting link will be available after booking confirmation.',
+    'pending_payment': 'Pending Payment',
+    'pending_payment_msg': 'Your booking is waiting for payment confirmation.',
+    'go_to_payment': 'Go to Payment',
+    # Portal booking list
+    'my_bookings': 'My Bookings',
+    'view_my_bookings': 'View My Bookings',
+    'booking_info_sent_email': 'Booking confirmation details have been sent to your email',
+    'meeting_link_in_email': '(The meeting link is included in the email)',
+    'upcoming_bookings': 'Upcoming Bookings',
+    'completed_bookings': 'Completed Bookings',
+    'all_bookings': 'Active',
+    'no_bookings_yet': 'You have no bookings yet',
+    'booking_status': 'Status',
+    'view_details': 'View Details',
+    'status_confirmed': 'Confirmed',
+    'status_done': 'Completed',
+    'status_cancelled': 'Cancelled',
+    'status_draft': 'Draft',
+    'status_pending_payment': 'Pending Payment',
+    'incl_tax': '(incl. tax)',
+    # Portal detail page (wt-* card design)
+    'booking_info': 'Booking Information',
+    'meeting_info': 'Meeting',
+    'notes_label': 'Notes',
+    'payment_paid': 'Paid',
+    'comments': 'Comments & Discussion',
+})
+
+
+def _compile_catalogs():
+    """{lang: frozendict(key: label)} from every shipped .po file."""
+    catalogs = {}
+    for filename in sorted(os.listdir(I18N_PATH)):
+        lang, ext = os.path.splitext(filename)
+        if ext != '.po':
+            continue
+        translations = {}
+        for entry in polib.pofile(os.path.join(I18N_PATH, filename)):
+            if entry.msgctxt and entry.msgctxt.startswith(LABEL_CONTEXT_PREFIX) and entry.msgstr:
+                translations[entry.msgctxt[len(LABEL_CONTEXT_PREFIX):]] = entry.msgstr
+        missing = LABELS.keys() - translations.keys()
+        if missing:
+            _logger.warning("%s: %d website labels not translated, using English", filename, len(missing))
+        catalogs[lang] = frozendict({key: translations.get(key, label) for key, label in LABELS.items()})
+    for lang, fallback in LANGUAGE_FALLBACKS.items():
+        if lang not in catalogs and fallback in catalogs:
+            catalogs[lang] = catalogs[fallback]
+    return catalogs
+
+
+LABEL_CATALOGS = _compile_catalogs()
+
+
+def get_labels(lang):
+    """Labels of the public pages in ``lang``, English when not shipped."""
+    return LABEL_CATALOGS.get(lang, LABELS)
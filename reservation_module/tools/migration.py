@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Helpers shared by the migration scripts."""
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def create_indexes(cr, table, indexes):
+    """Build ``indexes``, a list of (name, definition), on ``table`` if missing.
+
+    Runs in the upgrade transaction, so a failing upgrade leaves no index
+    behind and nothing is committed half-way. CREATE INDEX CONCURRENTLY is
+    not an option there: it cannot run in a transaction block, and from
+    another connection it would wait for the upgrade transaction forever.
+    Writes to ``table`` wait during the build, which only happens while the
+    module is upgraded. Invalid leftovers of an interrupted concurrent build
+    are replaced.
+    """
+    for index_name, definition in indexes:
+        cr.execute("""
+            SELECT i.indisvalid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s
+        """, (index_name,))
+        row = cr.fetchone()
+        if row and row[0]:
+            continue
+        if row:
+            _logger.info("Dropping invalid index %s", index_name)
+            cr.execute(f"DROP INDEX IF EXISTS {index_name}")
+        _logger.info("Creating index %s", index_name)
+        cr.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} {definition}")
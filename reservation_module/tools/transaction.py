@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Short transactions run next to the request's own one."""
+
+from contextlib import contextmanager
+
+
+@contextmanager
+def autonomous_cursor(registry):
+    """Cursor of a transaction of its own, committed when the block exits.
+
+    Meant for shared counter rows (rate limits, cache versions, statistics)
+    that must neither wait for nor roll back with the request transaction.
+    It runs at READ COMMITTED, so concurrent upserts of one row wait for
+    each other instead of failing with a serialization error. Test cursors
+    share the test transaction, whose isolation level is already set.
+    """
+    with registry.cursor() as cr:
+        if not registry.in_test_mode():
+            cr.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        yield cr
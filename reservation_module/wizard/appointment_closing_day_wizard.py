@@ -2,22 +2,52 @@
 
 from datetime import timedelta
 
+import pytz
+
 from odoo import api, fields, models, _
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
+
+WEEKDAY_FIELDS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
 
 
 class AppointmentClosingDayWizard(models.TransientModel):
     _name = 'appointment.closing.day.wizard'
     _description = 'Add Closing Days Wizard'
 
-    appointment_type_id = fields.Many2one(
+    def _default_appointment_type_ids(self):
+        if self.env.context.get('active_model') == 'appointment.type':
+            return self.env.context.get('active_ids')
+        return False
+
+    appointment_type_ids = fields.Many2many(
         'appointment.type',
-        string='Appointment Type',
+        string='Appointment Types',
         required=True,
+        default=_default_appointment_type_ids,
     )
     date_from = fields.Date('From Date', required=True, default=fields.Date.today)
     date_to = fields.Date('To Date', required=True, default=fields.Date.today)
     reason = fields.Char('Reason')
+    recurrence = fields.Selection([
+        ('daily', 'Every Day'),
+        ('weekdays', 'Specific Weekdays'),
+        ('public_holidays', 'Public Holidays'),
+    ], string='Repeat', required=True, default='daily',
+        help='Public Holidays takes the global time off of the working schedule '
+             'within the date range.')
+    mon = fields.Boolean('Mon')
+    tue = fields.Boolean('Tue')
+    wed = fields.Boolean('Wed')
+    thu = fields.Boolean('Thu')
+    fri = fields.Boolean('Fri')
+    sat = fields.Boolean('Sat')
+    sun = fields.Boolean('Sun')
+    calendar_id = fields.Many2one(
+        'resource.calendar',
+        string='Working Schedule',
+        default=lambda self: self.env.company.resource_calendar_id,
+        help='Schedule whose public holidays are added',
+    )
 
     @api.constrains('date_from', 'date_to')
     def _check_dates(self):
@@ -25,33 +55,79 @@ class AppointmentClosingDayWizard(models.TransientModel):
             if record.date_from > record.date_to:
                 raise ValidationError(_('From Date must be before or equal to To Date.'))
 
-    def action_confirm(self):
-        """Create closing day records for the selected date range."""
+    def _get_closing_dates(self):
+        """{date: reason} of the days to close, following the recurrence."""
         self.ensure_one()
-        ClosingDay = self.env['appointment.closing.day']
-        current_date = self.date_from
-        created = 0
+        if self.recurrence == 'public_holidays':
+            return self._get_public_holidays()
 
+        weekdays = set(range(7))
+        if self.recurrence == 'weekdays':
+            weekdays = {i for i, fname in enumerate(WEEKDAY_FIELDS) if self[fname]}
+            if not weekdays:
+                raise UserError(_('Select at least one weekday.'))
+        dates = {}
+        current_date = self.date_from
         while current_date <= self.date_to:
-            existing = ClosingDay.search([
-                ('appointment_type_id', '=', self.appointment_type_id.id),
-                ('date', '=', current_date),
-            ], limit=1)
-            if not existing:
-                ClosingDay.create({
-                    'appointment_type_id': self.appointment_type_id.id,
-                    'date': current_date,
-                    'name': self.reason,
-                })
-                created += 1
+            if current_date.weekday() in weekdays:
+                dates[current_date] = self.reason
             current_date += timedelta(days=1)
+        return dates
+
+    def _get_public_holidays(self):
+        """Dates of the global time off overlapping the range, with their name as reason."""
+        tz = pytz.timezone(self.calendar_id.tz or self.env.user.tz or 'UTC')
+        leaves = self.env['resource.calendar.leaves'].search([
+            ('resource_id', '=', False),
+            ('calendar_id', 'in', [self.calendar_id.id, False]),
+            ('date_from', '<', fields.Datetime.to_datetime(self.date_to) + timedelta(days=1)),
+            ('date_to', '>=', fields.Datetime.to_datetime(self.date_from)),
+        ])
+        dates = {}
+        for leave in leaves:
+            current_date = max(pytz.utc.localize(leave.date_from).astimezone(tz).date(), self.date_from)
+            last_date = min(pytz.utc.localize(leave.date_to).astimezone(tz).date(), self.date_to)
+            while current_date <= last_date:
+                dates.setdefault(current_date, self.reason or leave.name)
+                current_date += timedelta(days=1)
+        return dates
+
+    def action_confirm(self):
+        """Create closing day records for the selected types and dates in one batch."""
+        self.ensure_one()
+        ClosingDay = self.env['appointment.closing.day']
+        dates = self._get_closing_dates()
+
+        existing = set()
+        if dates:
+            existing = {
+                (closing.appointment_type_id.id, closing.date)
+                for closing in ClosingDay.search([
+                    ('appointment_type_id', 'in', self.appointment_type_ids.ids),
+                    ('date', 'in', list(dates)),
+                ])
+            }
+        vals_list = [
+            {
+                'appointment_type_id': appointment_type.id,
+                'date': date,
+                'name': reason,
+            }
+            for appointment_type in self.appointment_type_ids
+            for date, reason in sorted(dates.items())
+            if (appointment_type.id, date) not in existing
+        ]
+        ClosingDay.create(vals_list)
 
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
                 'title': _('Closing Days Added'),
-                'message': _('%d closing day(s) added.') % created,
+                'message': _(
+                    '%(created)d closing day(s) added, %(skipped)d already existed.',
+                    created=len(vals_list), skipped=len(existing),
+                ),
                 'sticky': False,
                 'type': 'success',
             }